@@ -29,6 +29,9 @@ LORA_NODE_ADDR  = 0               # gateway node-address
 LORA_QOS        = 2               # quality of service (0-7)
 LORA_TX_POWER   = 23              # transmit power (max: 23)
 LORA_GW_RECEIVE_TIMEOUT  = 1.0    # single receive wait-time
+#LORA_ADR_QOS   = None             # adaptive data rate, e.g. "0 2 4 5"
+#LORA_ADR_SLOT  = 10               # ADR slot length (same as loggers)
+#LORA_DUTY_CYCLE = 0.01            # default: 0.01 for 868MHz, else 0
 
 # ----------------------------------------------------------------------------
 # gw_tx_blues specific configuration
@@ -36,8 +39,13 @@ LORA_GW_RECEIVE_TIMEOUT  = 1.0    # single receive wait-time
 # action to perform when receiving data
 #   None:  no action, just print to log
 #   False: buffer data to notecard, sync after active window
-#   True:  don't buffer data, sync to Notehub immediately
+#   True:  sync to Notehub according to BLUES_SYNC_BYTES/_INTERVAL
+#          (both 0: sync immediately)
 BLUES_SYNC_ACTION = True
+BLUES_SYNC_BYTES    = 2048        # sync once pending notes exceed n bytes
+BLUES_SYNC_INTERVAL = 900         # ... or the last sync is older than n s
+BLUES_TEMPLATES     = True        # compact templated notes
+#BLUES_BULK_SIZE    = 8192        # chunk size for upload of buffered data
 BLUES_GET_TIME_RETRIES = 3        # how many times card.time() is executed
 BLUES_MAX_SYNC_TIME    = 300      # number of seconds to wait for a sync
 
@@ -46,6 +54,16 @@ BLUES_MAX_SYNC_TIME    = 300      # number of seconds to wait for a sync
 #
 #UDP_HOST =
 #UDP_PORT =
+#UDP_COALESCE    = 0               # pack records arriving within n seconds
+#UDP_MAX_PAYLOAD = 1400            # maximal size of a datagram
+
+# ----------------------------------------------------------------------------
+# gw_tx_tcp specific configuration
+#
+#TCP_HOST =
+#TCP_PORT =
+#TCP_COALESCE  = 2                 # send records arriving within 2s at once
+#TCP_MAX_BATCH = 20                # maximal number of records per send
 
 # --- tasks to execute after receiving data  - -------------------------------
 # See the docs for a complete list of tasks and for special task configuration.
@@ -55,6 +73,10 @@ TASKS = "save_data update_oled tx_send"
 #CSV_FILENAME = "/sd/data_{GW_ID}_{ID}.csv"    # GW_ID and LOGGER_ID in name
 #CSV_FIELDNR_ID = 1                            # 0-based fieldnr for LOGGER_ID
 
+#NODE_STATS = True                             # per-node statistics
+#NODE_STATS_FILE = "/sd/node_stats_{GW_ID}.csv"
+#NODE_STATS_INTERVAL = 300                     # save every 300s
+
 # ----------------------------------------------------------------------------
 # uptime configuration. The template values configure a single active window
 # (from hours 7 to 7 at minutes 0 to 0 every day). On duration is 10 hours.
@@ -60,6 +60,8 @@ def get_tx_noop():
   from gw_tx_noop import NoopSender
   return NoopSender
 
+GC_THRESHOLD = 20000     # run gc.collect() below this amount of free memory
+
 RX_MAP = {
   'Noop': get_rx_noop,
   'Lora': get_rx_lora
@@ -111,6 +113,8 @@ class Gateway:
     self.receiver.setup(self.i2c,self.spi)
     self.transmitter.setup(self.i2c,self.spi)
     self._update_time()
+    self._load_tasks()
+    self._init_node_stats()
 
     # configure active window
     if g_config.ON_DURATION:
@@ -123,6 +127,24 @@ class Gateway:
 
     g_logger.print(f"gateway: initialized")
 
+  # --- per-node statistics   ------------------------------------------------
+
+  def _init_node_stats(self):
+    """ create table of per-node statistics """
+
+    if not getattr(g_config,"NODE_STATS",True):
+      self.node_stats = None
+      return
+    from node_stats import NodeStats
+    fname = getattr(g_config,"NODE_STATS_FILE","/sd/node_stats_{GW_ID}.csv")
+    if not getattr(g_config,"HAVE_SD",False) and fname[:7] != "/saves/":
+      fname = None
+    else:
+      fname = fname.format(GW_ID=g_config.GW_ID)
+    self.node_stats = NodeStats(fname,
+                                getattr(g_config,"NODE_STATS_INTERVAL",300),
+                                getattr(g_config,"CSV_FIELDNR_ID",1))
+
   # --- query time (internal or from upstream)   -----------------------------
 
   def _update_time(self):
@@ -181,29 +203,79 @@ class Gateway:
     start = time.monotonic()
     rc = self.receiver.handle_data(msg_type, values, node_sender)
 
-    # post process data
-    self._process_data(msg_type, values)
+    # update per-node statistics
+    if self.node_stats:
+      if hasattr(self.receiver,"link_quality"):
+        snr, rssi = self.receiver.link_quality()
+      else:
+        snr, rssi = None, None
+      self.node_stats.update(node_sender,
+                             values if msg_type == "M" else [values],
+                             snr,rssi)
+
+    # post process data (records of M- and D-messages like single records)
+    if msg_type == "M":
+      for record in values:
+        self._process_data("S", record)
+    elif msg_type == "D":
+      self._process_data("S", values)
+    else:
+      self._process_data(msg_type, values)
+
+  # --- load tasks   ---------------------------------------------------------
+
+  def _load_tasks(self):
+    """ import tasks once and keep their run-functions """
+
+    self._gc_threshold = getattr(g_config,"GC_THRESHOLD",GC_THRESHOLD)
+    self._pipelines  = {}         # tasks-variable -> [(task,run),...]
+    self._task_stats = {}         # task -> [count,total,max]
+    for tasks in ["TASKS", "B_TASKS", "S_TASKS"]:
+      pipeline = []
+      for task in getattr(g_config,tasks,"").split():
+        try:
+          g_logger.print(f"{task}: loading")
+          task_module = builtins.__import__("tasks."+task,None,None,["run"],0)
+          pipeline.append((task,task_module.run))
+          self._task_stats[task] = [0,0,0]
+        except Exception as ex:
+          g_logger.print(f"{task}: loading failed: exception: {ex}")
+      self._pipelines[tasks] = pipeline
+    task_module = None
+    gc.collect()
 
   # --- process data   -------------------------------------------------------
 
   def _process_data(self, msg_type, values, tasks="TASKS"):
     """ process data """
 
-    if not hasattr(g_config,tasks):
-      return
-
-    for task in getattr(g_config,tasks).split(" "):
+    for task, run in self._pipelines.get(tasks,[]):
+      start = time.monotonic()
       try:
-        g_logger.print(f"{task}: loading")
-        task_module = builtins.__import__("tasks."+task,None,None,["run"],0)
-        g_logger.print(f"{task} starting")
-        task_module.run(g_config, self, msg_type, values)
-        g_logger.print(f"{task} ended")
+        run(g_config, self, msg_type, values)
       except Exception as ex:
         g_logger.print(f"{task} failed: exception: {ex}")
-      task_module = None
+      duration = time.monotonic() - start
+      stats = self._task_stats[task]
+      stats[0] += 1
+      stats[1] += duration
+      stats[2] = max(stats[2],duration)
+      g_logger.print(f"{task} ended: {duration:0.3f}s")
+
+    # full collection only if memory gets low
+    if gc.mem_free() < self._gc_threshold:
       gc.collect()
 
+  # --- print task statistics   ----------------------------------------------
+
+  def _print_task_stats(self):
+    """ print count, mean and maximum duration of tasks """
+
+    for task, (count,total,max_duration) in self._task_stats.items():
+      if count:
+        g_logger.print(f"{task}: runs: {count}, " +
+                       f"mean: {total/count:0.3f}s, max: {max_duration:0.3f}s")
+
   # --- update OLED   --------------------------------------------------------
 
   def update_oled(self,values):
@@ -246,6 +318,14 @@ class Gateway:
 
     # process pre-shutdown tasks
     self._process_data(None,[wakeup],tasks="S_TASKS")
+    self._print_task_stats()
+    if hasattr(self.receiver,"airtime_stats"):
+      g_logger.print(f"gateway: airtime: {self.receiver.airtime_stats()}")
+    if self.node_stats:
+      try:
+        self.node_stats.save()
+      except Exception as ex:
+        g_logger.print(f"gateway: could not save node-statistics: {ex}")
 
     # notify sender/receiver to disable power until sleep-time expires
     # Note: calls to shutdown should not return if successful
@@ -312,6 +392,13 @@ class Gateway:
       # check for packet
       data, node_sender = self.receiver.receive_data()
       if data is None:
+        # give the transmitter a chance to send pending data
+        if hasattr(self.transmitter,"flush"):
+          try:
+            self.transmitter.flush()
+          except Exception as ex:
+            g_logger.print(f"gateway: sender.flush() failed: {ex}")
+
         # check active time period
         if g_config.ON_DURATION and time.time() > self._active_until:
           g_logger.print("gateway: active time ended: starting shutdown")
@@ -15,6 +15,7 @@ from log_writer import Logger
 g_logger = Logger()
 
 from lora import LORA
+from lora_codec import Decoder, MAGIC, ACK, RESYNC
 import hw_helper
 import pins
 
@@ -29,6 +30,9 @@ class LoraReceiver:
     """ constructor """
     self._config = config
     self._timeout = getattr(config,'LORA_GW_RECEIVE_TIMEOUT',1.0)
+    self._decoder = Decoder()
+    self._snr     = None
+    self._rssi    = None
 
   # --- hardware-setup   -----------------------------------------------------
 
@@ -45,12 +49,55 @@ class LoraReceiver:
 
   def receive_data(self):
     """ receive data """
+    timeout = self._timeout
+    if self._lora.adr:
+      # listen on the QOS-level of the current slot of the ADR-schedule
+      timeout = min(timeout,max(self._lora.adr_listen(),0.1))
     data, node_sender, self._snr, self._rssi = (
-      self._lora.receive(timeout=self._timeout))
+      self._lora.receive(decode=False,timeout=timeout))
     if self._snr:
       self._snr = round(self._snr,1)
       self._rssi = round(self._rssi,0)
-    return (data, node_sender)
+    if data is None:
+      return (None, node_sender)
+    if data[0] == MAGIC:
+      return (self._decode(data, node_sender), node_sender)
+    try:
+      return (data.decode(), node_sender)
+    except Exception as ex:
+      g_logger.print(f"exception while decoding packet: {ex}")
+      return (None, None)
+
+  # --- link quality of last packet   ----------------------------------------
+
+  def link_quality(self):
+    """ return (snr,rssi) of the last received packet """
+    return (self._snr, self._rssi)
+
+  # --- airtime metrics   ----------------------------------------------------
+
+  def airtime_stats(self):
+    """ return airtime and duty-cycle metrics """
+    return self._lora.airtime_stats()
+
+  # --- decode encoded records   ---------------------------------------------
+
+  def _decode(self, data, node_sender):
+    """ decode encoded record (D-message) """
+
+    try:
+      record = self._decoder.decode(node_sender, data)
+    except Exception as ex:
+      g_logger.print(f"LoraReceiver: could not decode D-msg: {ex}")
+      record = None
+    if record:
+      return f"D,{record}"
+
+    # unknown dictionary or timestamp: ask for resync
+    self._lora.set_destination(node_sender)
+    g_logger.print(f"LoraReceiver: D-msg: requesting resync")
+    self._lora.transmit(bytes([RESYNC]),keep_listening=True)
+    return None
 
   # --- reply to broadcast-messages   ----------------------------------------
 
@@ -61,7 +108,7 @@ class LoraReceiver:
     resp = f"{values[2]},{self._snr},{self._rssi}"        # 2: packet-nr
     self._lora.set_destination(node_sender)               # 3: LoRa-node
     g_logger.print(f"LoraReceiver: sending '{resp}' to {node_sender}...")
-    rc = self._lora.transmit(resp,keep_listening=True)
+    rc = self._lora.transmit(resp,keep_listening=True,urgent=False)
     g_logger.print(f"LoraReceiver: rc: {rc}")
 
     # update values for further processing:
@@ -102,9 +149,38 @@ class LoraReceiver:
         f"LoraReceiver: S-msg: returning content length: {ord(resp)}")
       rc = self._lora.transmit(resp,keep_listening=True)
       return rc
+    elif msg_type == "D":
+      self._lora.set_destination(node_sender)
+      g_logger.print(f"LoraReceiver: D-msg: acknowledging")
+      return self._lora.transmit(bytes([ACK]),keep_listening=True)
+    elif msg_type == "M":
+      return self._handle_multi(values, node_sender)
     else:
       raise RuntimeError(f"unsupported msg-type {msg_type}")
 
+  # --- reply to multi-record messages   ------------------------------------
+
+  def _handle_multi(self, values, node_sender):
+    """ acknowledge records of a M-message with a bitmap and replace
+    values with a list of the values of the accepted records
+    """
+
+    records = ','.join(values).split('\n')
+    bitmap = bytearray((len(records)+7)//8)
+    accepted = []
+    for i,record in enumerate(records):
+      fields = record.split(',')
+      if len(fields) > 1 and fields[0]:
+        bitmap[i//8] |= 1 << (i%8)
+        accepted.append(fields)
+    self._lora.set_destination(node_sender)
+    resp = bytes([len(records)]) + bitmap
+    g_logger.print(
+      f"LoraReceiver: M-msg: acknowledging {len(accepted)}/{len(records)}")
+    rc = self._lora.transmit(resp,keep_listening=True)
+    values[:] = accepted
+    return rc
+
   # --- cleanup   ------------------------------------------------------------
 
   def cleanup(self):
@@ -1,11 +1,28 @@
 #-----------------------------------------------------------------------------
 # GatewaySender subclass using Blues.io as TX-technology.
 #
+# With BLUES_TEMPLATES = True, records are added as templated notes: the
+# Notecard stores and sends them in a compact binary format. Every layout
+# (dcode and number of fields) uses its own notefile dl_<hash>.qo with a
+# template derived from the dcode. Records without a valid dcode are
+# added as JSON-notes ({"data": "<csv>"}) to dl_data.qo.
+#
+# With BLUES_SYNC_ACTION = True, the sync is triggered once the pending
+# notes exceed BLUES_SYNC_BYTES or the last sync is older than
+# BLUES_SYNC_INTERVAL seconds (both 0: sync after every record).
+#
+# Buffered records (see task buffer_data) are uploaded during shutdown in
+# chunks: every chunk is transferred to the binary store of the Notecard
+# and sent with a single note.add to dl_bulk.qo. The chunk is only removed
+# from the buffer after the note.add succeeded, so an interrupted upload
+# resumes with the first unsent chunk.
+#
 # Author: Bernhard Bablok
 #
 # Website: https://github.com/bablokb/cp-datalogger
 #-----------------------------------------------------------------------------
 
+import os
 import time
 import busio
 
@@ -18,6 +35,15 @@ import pins
 
 import notecard
 from notecard import hub, card, note, file
+from sensor_meta import get_types
+from durable_queue import DurableQueue
+
+# template hints (see Notecard documentation of note.template)
+HINT_INT   = 14                   # int32
+HINT_FLOAT = 14.1                 # float32
+HINT_STR   = "x"*16               # string, max. length is a hint
+NOTE_SIZE  = 8                    # estimated overhead of a templated note
+BULK_FILE  = "dl_bulk.qo"
 
 # --- BluesSender class   ----------------------------------------------------
 
@@ -29,6 +55,19 @@ class BluesSender:
   def __init__(self,config):
     """ constructor """
     self._config = config
+    self._templates = {}          # layout -> (file,types)
+    self._sync_bytes    = getattr(config,"BLUES_SYNC_BYTES",0)
+    self._sync_interval = getattr(config,"BLUES_SYNC_INTERVAL",0)
+    self._pending   = 0           # estimated bytes of unsynced notes
+    self._last_sync = time.monotonic()
+    if getattr(config,"HAVE_SD",False):
+      self._buffer_file = "/sd/tx_buffer.csv"
+    else:
+      try:
+        os.listdir("/saves")
+        self._buffer_file = "/saves/tx_buffer.csv"
+      except:
+        self._buffer_file = None
 
   # --- hardware-setup   -----------------------------------------------------
 
@@ -40,7 +79,7 @@ class BluesSender:
     self._i2c = i2c[bus_id]
     g_logger.print(f"BluesSender: using I2C{bus_id} for Blues")
     self._init_notecard()
-    if gettattr(self._config,"DEV_MODE",False):
+    if getattr(self._config,"DEV_MODE",False):
       self._config_notecard({
         "io": {"req":"card.io","mode":"+busy"}, # LED on/off in wake/sleep state
         })
@@ -118,6 +157,74 @@ class BluesSender:
           g_logger.print("BluesSender: could not set time")
           return None
 
+  # --- return epoch of a timestamp   ----------------------------------------
+
+  def _epoch(self,ts):
+    """ convert timestamp-string to seconds since 1970 """
+    return int(time.mktime((int(ts[0:4]),int(ts[5:7]),int(ts[8:10]),
+                            int(ts[11:13]),int(ts[14:16]),int(ts[17:19]),
+                            0,-1,-1)))
+
+  # --- query (and create) template for a record   ---------------------------
+
+  def _get_template(self,values):
+    """ return (file,types) for the layout of the record, or None """
+
+    dcode = values[2]
+    layout = f"{dcode}/{len(values)}"
+    if layout in self._templates:
+      return self._templates[layout]
+
+    if dcode[:2] != "01":                 # record must start with ts,id,dcode
+      raise ValueError(f"invalid dcode {dcode}")
+    types = get_types(dcode,len(values)-1)
+    h = 0
+    for b in layout.encode('utf-8'):
+      h = (h*31 + b) & 0xFFFF
+    nfile = f"dl_{h:04x}.qo"
+
+    body = {"ts": HINT_INT, "missing": HINT_STR}
+    for i,t in enumerate(types):
+      if t == 's':
+        body[f"f{i+1}"] = HINT_STR
+      elif t == 'i':
+        body[f"f{i+1}"] = HINT_INT
+      else:
+        body[f"f{i+1}"] = HINT_FLOAT
+    g_logger.print(f"BluesSender: creating template for {nfile} ({layout})")
+    resp = note.template(self._card,file=nfile,body=body)
+    if "err" in resp:
+      raise RuntimeError(resp["err"])
+    self._templates[layout] = (nfile,types)
+    return self._templates[layout]
+
+  # --- add templated note   -------------------------------------------------
+
+  def _add_templated(self,values,sync):
+    """ add record as templated note, return (response,size) """
+
+    nfile,types = self._get_template(values)
+    body = {"ts": self._epoch(values[0])}
+    missing = []
+    size = NOTE_SIZE + 4
+    for i,(t,value) in enumerate(zip(types,values[1:])):
+      try:
+        if t == 's':
+          body[f"f{i+1}"] = value
+          size += len(value)+1
+        elif t == 'i':
+          body[f"f{i+1}"] = int(value)
+          size += 4
+        else:
+          body[f"f{i+1}"] = float(value)
+          size += 4
+      except ValueError:
+        missing.append(str(i+1))     # omitted fields are zero in Notehub
+    if missing:
+      body["missing"] = ",".join(missing)
+      size += len(body["missing"])+1
+    return note.add(self._card,file=nfile,body=body,sync=sync),size
+
   # --- process data   -------------------------------------------------------
 
   def process_data(self, msg_type, values):
@@ -125,24 +232,119 @@ class BluesSender:
 
     g_logger.print("processing sensor-data...")
     start = time.monotonic()
-    if self._config.BLUES_SYNC_ACTION is not None:
-      resp = note.add(self._card,
-                      file=f"dl_data.qo",
-                      body={"data":','.join(values)},
-                      sync=self._config.BLUES_SYNC_ACTION)
+    action = self._config.BLUES_SYNC_ACTION
+    if action is not None:
+      # sync immediately only without sync-policy
+      sync = action and not (self._sync_bytes or self._sync_interval)
+      resp = None
+      if getattr(self._config,"BLUES_TEMPLATES",False):
+        try:
+          resp,size = self._add_templated(values,sync)
+        except Exception as ex:
+          g_logger.print(f"BluesSender: no template for record: {ex}")
+      if resp is None:
+        data = ','.join(values)
+        resp = note.add(self._card,
+                        file=f"dl_data.qo",
+                        body={"data":data},
+                        sync=sync)
+        size = NOTE_SIZE + len(data) + 10
+      if action and not sync:
+        self._pending += size
+        self.flush()
     else:
       resp = "action: noop"
     duration = time.monotonic()-start
     g_logger.print(f"BluesSender: action: {self._config.BLUES_SYNC_ACTION}, {resp=}")
     g_logger.print(f"BluesSender: duration: {duration}s")
 
+  # --- sync notes according to sync-policy   --------------------------------
+
+  def flush(self):
+    """ trigger a sync if pending notes exceed the configured size or
+    age (called by the gateway while idle) """
+
+    if not self._pending:
+      return
+    if ((self._sync_bytes and self._pending >= self._sync_bytes) or
+        (self._sync_interval and
+         time.monotonic() - self._last_sync >= self._sync_interval)):
+      g_logger.print(f"BluesSender: syncing {self._pending} bytes")
+      self._sync_notecard(wait=False)
+      self._pending   = 0
+      self._last_sync = time.monotonic()
+
+  # --- compress chunk   -----------------------------------------------------
+
+  def _compress(self,data):
+    """ compress data if supported, return (encoding,data) """
+
+    try:
+      import zlib
+      return "zlib",zlib.compress(data)
+    except:
+      return "csv",data               # CircuitPython: no zlib.compress()
+
+  # --- send buffered data   -------------------------------------------------
+
+  def _send_buffered_data(self):
+    """ upload buffered records in chunks using the binary store """
+
+    if not self._buffer_file:
+      return
+    from notecard.binary_helpers import (binary_store_transmit,
+                                         binary_store_reset)
+    queue = DurableQueue(self._buffer_file)
+    max_size = getattr(self._config,"BLUES_BULK_SIZE",8192)
+    while True:
+      records = queue.peek(max_size//32)
+      if not records:
+        return True
+      data = bytearray()
+      n = 0
+      for record in records:
+        if n and len(data) + len(record) + 1 > max_size:
+          break
+        data.extend(bytes(record+'\n',"UTF-8"))
+        n += 1
+
+      enc,data = self._compress(data)
+      g_logger.print(
+        f"BluesSender: uploading {n} records ({len(data)} bytes, {enc})")
+      start = time.monotonic()
+      try:
+        binary_store_reset(self._card)
+        binary_store_transmit(self._card,data,0)
+        resp = self._card.Transaction({"req": "note.add",
+                                       "file": BULK_FILE,
+                                       "body": {"records": n, "enc": enc},
+                                       "binary": True,
+                                       "live": True,
+                                       "sync": True})
+        if "err" in resp:
+          raise RuntimeError(resp["err"])
+      except Exception as ex:
+        g_logger.print(f"BluesSender: upload failed: {ex}")
+        return False
+      queue.commit(n)
+      binary_store_reset(self._card)
+      duration = time.monotonic()-start
+      g_logger.print(f"BluesSender: duration: {duration}s")
+
   # --- shutdown   -----------------------------------------------------------
 
   def shutdown(self,wakeup):
     """ Shutdown system. In our case, send an attn-request to the notecard """
 
+    # upload buffered records
+    if self._config.BLUES_SYNC_ACTION is not None:
+      try:
+        self._send_buffered_data()
+      except Exception as ex:
+        g_logger.print(f"BluesSender: exception while sending data: {ex}")
+
     # if necessary, sync notes before shutdown
-    if self._config.BLUES_SYNC_ACTION == False:
+    if self._config.BLUES_SYNC_ACTION == False or self._pending:
       self._sync_notecard(wait=False)
 
     # turn off some settings
@@ -1,6 +1,13 @@
 #-----------------------------------------------------------------------------
 # TCP gateway sender class. This sender relays data to a central TCP-receiver.
 #
+# The connection is kept open during the active window. Records arriving
+# within TCP_COALESCE seconds are sent with a single send. After a failed
+# send, records are buffered (like the buffer_data task) and the sender
+# waits with increasing backoff before it reconnects. Once a send succeeds
+# again, buffered records are sent in batches while the gateway is idle.
+# Remaining buffered records are sent during shutdown.
+#
 # Author: Bernhard Bablok
 #
 # Website: https://github.com/bablokb/cp-datalogger
@@ -14,6 +21,11 @@ import time
 from log_writer import Logger
 g_logger = Logger()
 from wifi_impl_builtin import WifiImpl
+from durable_queue import DurableQueue
+
+BATCH_SIZE  = 10        # records per commit of the buffer-queue
+BACKOFF_MIN = 5         # backoff after first failed send (seconds)
+BACKOFF_MAX = 300       # maximal backoff
 
 # --- TCPSender class   ------------------------------------------------------
 
@@ -34,6 +46,15 @@ class TCPSender:
       except:
         self._buffer_file = None
     g_logger.print(f"TCPSender: using buffer file: {self._buffer_file}")
+    self._coalesce  = getattr(config,"TCP_COALESCE",2)
+    self._max_batch = getattr(config,"TCP_MAX_BATCH",20)
+    self._socket    = None
+    self._pending   = []
+    self._since     = 0           # arrival of first pending record
+    self._backoff   = 0
+    self._retry_at  = 0
+    self._buffered  = bool(self._buffer_file)   # check buffer for records
+    self._queue     = None        # buffer-queue of _buffer() and _drain()
 
   # --- hardware-setup   -----------------------------------------------------
 
@@ -57,78 +78,100 @@ class TCPSender:
       g_logger.print("TCPSender: no buffer file")
       return
 
-    # check if buffer file exists
+    # new instance: sees records of the task buffer_data too
+    queue = DurableQueue(self._buffer_file)
+    self._queue = None
+    if queue.empty():
+      g_logger.print(f"TCPSender: no buffered data in {self._buffer_file}")
+      return
+
+    # send buffered records in batches, commit after every batch
+    g_logger.print(f"TCPSender: sending buffered data...")
+    while True:
+      records = queue.peek(BATCH_SIZE)
+      if not records:
+        return True
+      if not self._send(records):
+        return False
+      queue.commit(len(records))
+
+  # --- send records   -------------------------------------------------------
+
+  def _send(self,records):
+    """ send records with a single send, reuse open connection """
+
+    data = bytes('\n'.join(records)+'\n',"UTF-8")
+    g_logger.print(f"TCPSender: sending {len(records)} record(s)...")
+    start = time.monotonic()
     try:
-      status = os.stat(self._buffer_file)
-      size = status[6]
-      if size == 0:
-        g_logger.print(f"TCPSender: empty file {self._buffer_file}")
-        os.remove(self._buffer_file)
-        os.sync()
-        return
-      else:
-        g_logger.print(f"TCPSender: size of buffered data: {size}")
-    except:
-      # file does not exist
-      g_logger.print(f"TCPSender: no data file {self._buffer_file}")
+      self._socket, n = self._wifi.send(
+        data,self._config.TCP_HOST,self._config.TCP_PORT,socket=self._socket)
+      rc = n == len(data)
+      g_logger.print(f"TCPSender: ... sent {n} bytes")
+    except Exception as ex:
+      g_logger.print(f"TCPSender: ... failed with exception: {ex}")
+      rc = False
+    duration = time.monotonic()-start
+    g_logger.print(f"TCPSender: duration: {duration}s")
+
+    if rc:
+      self._backoff = 0
+    else:
+      self._close()
+      self._backoff = min(2*self._backoff or BACKOFF_MIN,BACKOFF_MAX)
+      self._retry_at = time.monotonic() + self._backoff
+      g_logger.print(f"TCPSender: next connect in {self._backoff}s")
+    return rc
+
+  # --- buffer records   -----------------------------------------------------
+
+  def _buffer(self,records):
+    """ save records for later transmission """
+
+    if not self._buffer_file:
+      g_logger.print(
+        f"TCPSender: no buffer file, dropping {len(records)} records")
+      return
+    g_logger.print(f"TCPSender: buffering {len(records)} records")
+    queue = self._get_queue()
+    for record in records:
+      queue.append(record)
+    self._buffered = True
+
+  # --- buffer-queue   -------------------------------------------------------
+
+  def _get_queue(self):
+    """ return buffer-queue (created once) """
+
+    if not self._queue:
+      self._queue = DurableQueue(self._buffer_file)
+    return self._queue
+
+  # --- send a batch of buffered records   -----------------------------------
+
+  def _drain(self):
+    """ send a batch of buffered records over the open connection """
+
+    queue = self._get_queue()
+    records = queue.peek(BATCH_SIZE)
+    if not records:
+      self._buffered = False
       return
+    g_logger.print(f"TCPSender: sending buffered data...")
+    if self._send(records):
+      queue.commit(len(records))
 
-    # send buffer file in line mode
-    host = self._config.TCP_HOST
-    port = self._config.TCP_PORT
-    g_logger.print(f"TCPSender: sending buffered data to {host}:{port}...")
-    socket = None
-    buffer_file_new = None
-    rc_all = True
-
-    i = 0
-    with open(self._buffer_file,"rt") as file:
-      for record in file:
-        if not rc_all:
-          # we failed already, # so move records to BUFFER_FILE_NEW
-          if not buffer_file_new:
-            buffer_file_new = open(self._buffer_file+"new","at")
-          buffer_file_new.write(record)
-          continue
-
-        # convert values to bytes and send them
-        g_logger.print(f"TCPSender: sending: {record} ...")
-        try:
-          socket, n = self._wifi.send(
-            bytes(record,"UTF-8"),
-            self._config.TCP_HOST,self._config.TCP_PORT,
-            socket=socket)
-          g_logger.print(f"TCPSender: ... sent {n} bytes")
-          rc = n == len(record)
-        except Exception as ex:
-          g_logger.print(f"TCPSender: ... failed with exception: {ex}")
-          rc = False
-
-        # check result
-        rc_all = rc and rc_all
-        if not rc:
-          if i == 0:
-            # failed at the first record, bail out
-            return False
-          elif not buffer_file_new:
-            buffer_file_new = open(self._buffer_file+"new","at")
-          # keep this record in buffer_file_new
-          buffer_file_new.write(record)
-        i += 1
-
-    # at this stage, BUFFER_FILE is processed
-    if socket:
-      socket.close()
-    os.remove(self._buffer_file)
-    if buffer_file_new:
-      # move failed records to BUFFER_FILE, will be processed next time
-      buffer_file_new.flush()
-      buffer_file_new.close()
-      os.rename(self._buffer_file+"new",self._buffer_file)
-      os.sync()
-
-    # return send-status
-    return rc_all
+  # --- close connection   ---------------------------------------------------
+
+  def _close(self):
+    """ close connection """
+
+    if self._socket:
+      try:
+        self._socket.close()
+      except:
+        pass
+      self._socket = None
 
   # --- process data   -------------------------------------------------------
 
@@ -136,15 +179,31 @@ class TCPSender:
     """ process data, single record  """
 
     g_logger.print("TCPSender: processing sensor-data...")
-    start = time.monotonic()
-    g_logger.print("TCPSender: sending data...")
-    # convert values to bytes and send them
-    socket, n = self._wifi.send(bytes(','.join(values)+'\n',"UTF-8"),
-                                self._config.TCP_HOST,self._config.TCP_PORT)
-    # ignore n, since we can't do anything about an error anyway
-    socket.close()
-    duration = time.monotonic()-start
-    g_logger.print(f"TCPSender: duration: {duration}s")
+    if not self._pending:
+      self._since = time.monotonic()
+    self._pending.append(','.join(values))
+    self.flush()
+
+  # --- flush pending records   ----------------------------------------------
+
+  def flush(self,force=False):
+    """ send pending records once the coalesce-window expired and
+    buffered records after the connection recovered (called by the
+    gateway while idle) """
+
+    now = time.monotonic()
+    if self._pending and (force or len(self._pending) >= self._max_batch or
+                          now - self._since >= self._coalesce):
+      records = self._pending
+      self._pending = []
+      if now < self._retry_at and not force:
+        self._buffer(records)                # still waiting for reconnect
+      elif not self._send(records):
+        self._buffer(records)
+
+    # connection is up: send one batch of buffered records
+    if self._buffered and self._socket and not self._backoff and not force:
+      self._drain()
 
   # --- shutdown   -----------------------------------------------------------
 
@@ -154,7 +213,9 @@ class TCPSender:
 
     g_logger.print(f"TCPSender: shutdown(): sending buffered data")
     try:
+      self.flush(force=True)
       self._send_buffered_data()
     except Exception as ex:
       g_logger.print(f"TCPSender: exception while sending data: {ex}")
+    self._close()
     return False
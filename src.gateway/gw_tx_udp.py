@@ -1,6 +1,9 @@
 #-----------------------------------------------------------------------------
 # UDP gateway sender class. This sender relays data to a central UDP-receiver.
 #
+# With UDP_COALESCE > 0, records arriving within UDP_COALESCE seconds are
+# packed into a single datagram (up to UDP_MAX_PAYLOAD bytes).
+#
 # Author: Bernhard Bablok
 #
 # Website: https://github.com/bablokb/cp-datalogger
@@ -13,6 +16,7 @@ import time
 from log_writer import Logger
 g_logger = Logger()
 from wifi_impl_builtin import WifiImpl
+from udp_batch import UDPBatch, MAX_PAYLOAD
 
 # --- UDPSender class   ------------------------------------------------------
 
@@ -23,7 +27,8 @@ class UDPSender:
 
   def __init__(self,config):
     """ constructor """
-    self._config = config
+    self._config   = config
+    self._coalesce = getattr(config,"UDP_COALESCE",0)
 
   # --- hardware-setup   -----------------------------------------------------
 
@@ -31,6 +36,9 @@ class UDPSender:
     """ initialize hardware """
     g_logger.print(f"UDPSender: initializing")
     self._wifi = WifiImpl()
+    self._batch = UDPBatch(self._wifi,
+                           self._config.UDP_HOST,self._config.UDP_PORT,
+                           getattr(self._config,"UDP_MAX_PAYLOAD",MAX_PAYLOAD))
 
   # --- get time from upstream   ---------------------------------------------
 
@@ -44,17 +52,32 @@ class UDPSender:
     """ process data  """
 
     g_logger.print("UDPSender: processing sensor-data...")
+    self._batch.add(','.join(values))
+    self.flush()
+
+  # --- flush pending records   ----------------------------------------------
+
+  def flush(self,force=False):
+    """ send pending records once the coalesce-window expired (called
+    by the gateway while idle) """
+
+    if self._batch.empty():
+      return
+    if not force and self._batch.age() < self._coalesce:
+      return
     start = time.monotonic()
-    g_logger.print("UDPSender: sending data...")
-    self._wifi.sendto(bytes(','.join(values)+'\n',"UTF-8"),
-                self._config.UDP_HOST,self._config.UDP_PORT)
+    self._batch.flush()
     duration = time.monotonic()-start
     g_logger.print(f"UDPSender: duration: {duration}s")
 
   # --- shutdown   -----------------------------------------------------------
 
   def shutdown(self,wakeup):
-    """ Shutdown system. Ignore request """
+    """ Shutdown system. Send pending records """
 
-    g_logger.print(f"UDPSender: ignoring shutdown-request")
+    g_logger.print(f"UDPSender: shutdown(): sending pending records")
+    try:
+      self.flush(force=True)
+    except Exception as ex:
+      g_logger.print(f"UDPSender: exception while sending data: {ex}")
     return False
@@ -0,0 +1,169 @@
+#-----------------------------------------------------------------------------
+# Per-node link-quality and traffic statistics of the gateway.
+#
+# For every logger (LOGGER_ID of the records), the table holds the
+# LoRa-address of the node, the number of packets and records, duplicate
+# records (same timestamp as the last record), gaps (missing intervals,
+# the interval is the smallest difference of timestamps seen so far) and
+# the exponentially weighted moving average, minimum and maximum of SNR
+# and RSSI. Every update is O(1).
+#
+# The table is saved as csv-file and restored during startup.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import time
+
+from log_writer import Logger
+g_logger = Logger()
+
+ALPHA  = 0.125           # weight of a new value for the EWMA
+HEADER = ("#id,node,packets,records,dups,gaps,last_ts,interval," +
+          "snr,snr_min,snr_max,rssi,rssi_min,rssi_max")
+
+# index of values within a row of the table
+NODE     = 0
+PACKETS  = 1
+RECORDS  = 2
+DUPS     = 3
+GAPS     = 4
+LAST_TS  = 5
+INTERVAL = 6
+SNR      = 7             # SNR, SNR_MIN, SNR_MAX
+RSSI     = 10            # RSSI, RSSI_MIN, RSSI_MAX
+
+# --- helper   ---------------------------------------------------------------
+
+def _epoch(ts):
+  """ convert timestamp-string to seconds since 1970 """
+  return int(time.mktime((int(ts[0:4]),int(ts[5:7]),int(ts[8:10]),
+                          int(ts[11:13]),int(ts[14:16]),int(ts[17:19]),
+                          0,-1,-1)))
+
+def _ewma(row,index,value):
+  """ update average, minimum and maximum of a value """
+  if row[index] is None:
+    row[index:index+3] = [value,value,value]
+  else:
+    row[index]   = round(row[index] + ALPHA*(value-row[index]),1)
+    row[index+1] = min(row[index+1],value)
+    row[index+2] = max(row[index+2],value)
+
+# --- class NodeStats   ------------------------------------------------------
+
+class NodeStats:
+  """ per-node statistics """
+
+  def __init__(self,filename=None,interval=300,id_index=1):
+    """ constructor """
+
+    self._filename = filename
+    self._id_index = id_index
+    self._interval = interval
+    self._saved    = time.monotonic()
+    self.table     = {}            # logger-id -> row
+    if filename:
+      self._load()
+
+  # --- load table   ---------------------------------------------------------
+
+  def _load(self):
+    """ restore table from csv-file """
+
+    try:
+      with open(self._filename,"rt") as f:
+        for line in f:
+          if line[0] == '#':
+            continue
+          fields = line.rstrip('\n').split(',')
+          row = [int(v) if v else None for v in fields[1:8]]
+          row += [float(v) if v else None for v in fields[8:]]
+          self.table[fields[0]] = row
+      g_logger.print(f"NodeStats: restored {len(self.table)} nodes")
+    except Exception as ex:
+      g_logger.print(f"NodeStats: could not restore {self._filename}: {ex}")
+
+  # --- save table   ---------------------------------------------------------
+
+  def save(self):
+    """ save table to csv-file """
+
+    self._saved = time.monotonic()
+    if not self._filename:
+      return
+    with open(self._filename,"wt") as f:
+      f.write(f"{HEADER}\n")
+      for lid,row in self.table.items():
+        f.write(f"{lid}," +
+                ",".join(["" if v is None else str(v) for v in row]) + "\n")
+
+  # --- update statistics   --------------------------------------------------
+
+  def update(self,node,records,snr=None,rssi=None):
+    """ update statistics with the records (lists of fields) of a packet """
+
+    row = None
+    for values in records:
+      try:
+        lid = values[self._id_index]
+        ts  = _epoch(values[0])
+      except:
+        continue                          # not a data-record
+      row = self.table.get(lid)
+      if not row:
+        row = [node,0,0,0,0,None,None,None,None,None,None,None,None]
+        self.table[lid] = row
+      row[NODE] = node
+      row[RECORDS] += 1
+
+      last = row[LAST_TS]
+      if last is None:
+        row[LAST_TS] = ts
+      elif ts == last:
+        row[DUPS] += 1
+      elif ts > last:
+        delta = ts - last
+        interval = row[INTERVAL]
+        if interval and delta > 1.5*interval:
+          row[GAPS] += round(delta/interval) - 1
+        if not interval or delta < interval:
+          row[INTERVAL] = delta
+        row[LAST_TS] = ts
+      # ts < last: late record (e.g. resent from the buffer of the logger)
+
+    if row:
+      row[PACKETS] += 1
+      if snr is not None:
+        _ewma(row,SNR,snr)
+        _ewma(row,RSSI,rssi)
+    if self._interval and time.monotonic() - self._saved > self._interval:
+      try:
+        self.save()
+      except Exception as ex:
+        g_logger.print(f"NodeStats: could not save {self._filename}: {ex}")
+
+  # --- format statistics of a node   ----------------------------------------
+
+  def lines(self,lid):
+    """ return statistics of a node as short lines (e.g. for the OLED) """
+
+    row = self.table.get(lid)
+    if not row:
+      return [f"{lid}: no data"]
+    return [f"{lid} @ {row[NODE]}",
+            f"P/R: {row[PACKETS]}/{row[RECORDS]}",
+            f"D/G: {row[DUPS]}/{row[GAPS]}",
+            f"SNR: {row[SNR]} ({row[SNR+1]})",
+            f"RSSI: {row[RSSI]} ({row[RSSI+1]})"]
+
+  # --- summary records   ----------------------------------------------------
+
+  def summary(self,ts):
+    """ return summary records (ts,id,...), one per node """
+
+    return [f"{ts},{lid}," + ",".join(["" if v is None else str(v)
+                                       for v in row])
+            for lid,row in self.table.items()]
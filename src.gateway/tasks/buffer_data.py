@@ -8,6 +8,7 @@
 
 import time
 
+from durable_queue import DurableQueue
 from log_writer import Logger
 g_logger = Logger()
 
@@ -30,5 +31,4 @@ def run(config, app, msg_type, values):
     return
 
   g_logger.print(f"gateway: buffering data to {buffer_file}...")
-  with open(buffer_file, "a") as f:
-    f.write(f"{','.join(values)}\n")
+  DurableQueue(buffer_file).append(','.join(values))
@@ -0,0 +1,67 @@
+#-----------------------------------------------------------------------------
+# Gateway-task: show and save per-node statistics
+#
+# As post-data task (TASKS), show the statistics of the sending node on
+# the OLED. As pre-shutdown task (S_TASKS), append one summary record per
+# node to a csv-file and show the number of nodes and the node with the
+# worst SNR on the OLED.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import os
+import time
+
+from log_writer import Logger
+g_logger = Logger()
+
+from node_stats import HEADER, SNR
+
+def run(config, app, msg_type, values):
+  """ show and save per-node statistics """
+
+  stats = app.node_stats
+  if not stats:
+    return
+
+  # post-data: show statistics of the node
+  if msg_type:
+    record = values[0] if msg_type == "M" else values
+    lid_index = getattr(config,"CSV_FIELDNR_ID",1)
+    if len(record) > lid_index:
+      app.update_oled(stats.lines(record[lid_index]))
+    return
+
+  # pre-shutdown: save summary records
+  ts = time.localtime()
+  ymd = f"{ts.tm_year}-{ts.tm_mon:02d}-{ts.tm_mday:02d}"
+  ts_str = f"{ymd}T{ts.tm_hour:02d}:{ts.tm_min:02d}:{ts.tm_sec:02d}"
+  fname = getattr(config,"NODE_STATS_CSV_FILENAME",
+                  "/sd/node_stats_{GW_ID}_{YMD}.csv")
+  if getattr(config,"HAVE_SD",False) or fname[:7] == "/saves/":
+    y,m,d = ymd.split("-")
+    csv_file = fname.format(GW_ID=config.GW_ID,YMD=ymd,Y=y,M=m,D=d)
+    g_logger.print(f"gateway: saving node-statistics to {csv_file}...")
+    try:
+      os.stat(csv_file)
+      new_file = False
+    except OSError:
+      new_file = True
+    with open(csv_file, "a") as f:
+      if new_file:
+        f.write(f"#ts,{HEADER[1:]}\n")
+      for record in stats.summary(ts_str):
+        f.write(f"{record}\n")
+
+  # show number of nodes and node with worst SNR
+  worst = None
+  for lid,row in stats.table.items():
+    if row[SNR] is not None and (worst is None or
+                                 row[SNR] < stats.table[worst][SNR]):
+      worst = lid
+  lines = [f"nodes: {len(stats.table)}"]
+  if worst:
+    lines.extend(stats.lines(worst)[:4])
+  app.update_oled(lines)
@@ -1,18 +1,19 @@
 """Helper methods for doing binary transfers to/from a Notecard."""
 
-import sys
 from .cobs import cobs_encode, cobs_decode
 from .notecard import Notecard, CARD_INTRA_TRANSACTION_TIMEOUT_SEC
 
 BINARY_RETRIES = 2
 
-if sys.implementation.name == 'cpython':
-    import hashlib
+try:
+    # CPython and firmware builds with MD5 support in hashlib
+    from hashlib import md5 as _md5
+    from binascii import hexlify
 
     def _md5_hash(data):
         """Create an MD5 digest of the given data."""
-        return hashlib.md5(data).hexdigest()
-else:
+        return hexlify(_md5(data).digest()).decode()
+except ImportError:
     from .md5 import digest as _md5_hash
 
 
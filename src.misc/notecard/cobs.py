@@ -1,53 +1,70 @@
-"""Methods for COBS encoding and decoding arbitrary bytearrays."""
+"""Methods for COBS encoding and decoding arbitrary bytearrays.
+
+Blocks are located with `find()` and copied with slices instead of
+processing the data byte by byte. The XOR with the end of packet marker
+uses `translate()` where available.
+"""
+
+_xor_tables = {}
+
+
+def _xor(buf: bytearray, eop: int) -> bytearray:
+    """XOR all bytes of buf with eop."""
+    if not eop:
+        return buf
+    if hasattr(buf, 'translate'):
+        table = _xor_tables.get(eop)
+        if table is None:
+            table = bytes([b ^ eop for b in range(256)])
+            _xor_tables[eop] = table
+        return buf.translate(table)
+
+    mv = memoryview(buf)
+    for idx in range(len(mv)):
+        mv[idx] ^= eop
+    return buf
 
 
 def cobs_encode(data: bytearray, eop: int) -> bytearray:
     """COBS encode an array of bytes, using eop as the end of packet marker."""
-    cobs_overhead = 1 + (len(data) // 254)
-    encoded = bytearray(len(data) + cobs_overhead)
-    code = 1
+    data = bytes(data)
+    length = len(data)
+    encoded = bytearray()
     idx = 0
-    code_idx = idx
-    idx += 1
 
-    for byte in data:
-        if byte != 0:
-            encoded[idx] = byte ^ eop
-            idx += 1
-            code += 1
-        if byte == 0 or code == 0xFF:
-            encoded[code_idx] = code ^ eop
-            code = 1
-            code_idx = idx
-            idx += 1
+    while True:
+        end = min(idx + 254, length)
+        zero = data.find(b'\x00', idx, end)
+        if zero >= 0:
+            # block ends with a zero byte
+            encoded.append(zero - idx + 1)
+            encoded.extend(data[idx:zero])
+            idx = zero + 1
+            continue
 
-    encoded[code_idx] = code ^ eop
+        encoded.append(end - idx + 1)
+        encoded.extend(data[idx:end])
+        if end - idx < 254:
+            break
+        idx = end                      # full block (code 0xFF)
 
-    return encoded[:idx]
+    return _xor(encoded, eop)
 
 
 def cobs_decode(encoded: bytes, eop: int) -> bytearray:
     """COBS decode an array of bytes, using eop as the end of packet marker."""
-    decoded = bytearray(len(encoded))
+    encoded = _xor(bytearray(encoded), eop)
+    decoded = bytearray()
     idx = 0
-    copy = 0
     code = 0xFF
 
-    for byte in encoded:
-        if copy != 0:
-            decoded[idx] = byte ^ eop
-            idx += 1
-        else:
-            if code != 0xFF:
-                decoded[idx] = 0
-                idx += 1
-
-            copy = byte ^ eop
-            code = copy
-
-            if code == 0:
-                break
-
-        copy -= 1
+    while idx < len(encoded):
+        if code != 0xFF:
+            decoded.append(0)
+        code = encoded[idx]
+        if code == 0:
+            break
+        decoded.extend(encoded[idx + 1:idx + code])
+        idx += code
 
-    return decoded[:idx]
+    return decoded
@@ -1,33 +1,43 @@
-"""Module for computing the CRC32 of arbitrary data."""
+"""Module for computing the CRC32 of arbitrary data.
 
-crc32_lookup_table = [
-    0x00000000, 0x1DB71064, 0x3B6E20C8, 0x26D930AC, 0x76DC4190, 0x6B6B51F4,
-    0x4DB26158, 0x5005713C, 0xEDB88320, 0xF00F9344, 0xD6D6A3E8, 0xCB61B38C,
-    0x9B64C2B0, 0x86D3D2D4, 0xA00AE278, 0xBDBDF21C
-]
+Uses `binascii.crc32` if available, otherwise a pure Python implementation
+with a 256-entry lookup table (one table lookup per byte).
+"""
 
 
-def _logical_rshift(val, shift_amount, num_bits=32):
-    """Logcally right shift `val` by `shift_amount` bits.
+def _make_table():
+    """Create the 256-entry lookup table of the reflected CRC32."""
+    table = []
+    for n in range(256):
+        crc = n
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xEDB88320 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
 
-    Logical right shift (i.e. right shift that fills with 0s instead of the
-    sign bit) isn't supported natively in Python. This is a simple
-    implementation. See:
-    https://realpython.com/python-bitwise-operators/#arithmetic-vs-logical-shift
-    """
-    unsigned_val = val % (1 << num_bits)
-    return unsigned_val >> shift_amount
+
+crc32_lookup_table = _make_table()
 
 
-def crc32(data):
-    """Compute CRC32 of the given data.
+def _crc32_py(data):
+    """Compute CRC32 of the given data (pure Python).
 
-    Small lookup-table half-byte CRC32 algorithm based on:
-    https://create.stephan-brumme.com/crc32/#half-byte
+    Byte-wise lookup-table CRC32 algorithm based on:
+    https://create.stephan-brumme.com/crc32/#bitwise
     """
-    crc = ~0
-    for idx in range(len(data)):
-        crc = crc32_lookup_table[(crc ^ data[idx]) & 0x0F] ^ _logical_rshift(crc, 4)
-        crc = crc32_lookup_table[(crc ^ _logical_rshift(data[idx], 4)) & 0x0F] ^ _logical_rshift(crc, 4)
+    table = crc32_lookup_table
+    crc = 0xFFFFFFFF
+    for byte in memoryview(data):
+        crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+
+    return crc ^ 0xFFFFFFFF
+
+
+try:
+    from binascii import crc32 as _crc32_native
 
-    return ~crc & 0xffffffff
+    def crc32(data):
+        """Compute CRC32 of the given data."""
+        return _crc32_native(data) & 0xFFFFFFFF
+except ImportError:
+    crc32 = _crc32_py
@@ -63,13 +63,10 @@ class DataParser:
   def run(self):
     """ main processing loop """
 
-    with open(self._filename,"rt") as file:
-      for record in file:
-        if not record or record[0] == "#":  # skip empty lines and comments
-          continue
-        # parse single record
-        data = sensor_meta.split_csv(record.strip("\n"))
-        print(json.dumps(data))
+    # records are parsed lazily, so memory usage is independent of file-size
+    for data in sensor_meta.iter_files([self._filename],
+                                       dcode_index=DCODE_COLUMN):
+      print(json.dumps(data))
 
 # --- main program   ---------------------------------------------------------
 
@@ -4,7 +4,12 @@
 # This program should run as a central server, either serving dataloggers
 # directly, or via a relaying gateway using an UDP/TCP-sender component.
 #
-# Code taken and adapted from:
+# The default engine uses asyncio. TCP-streams are split into records at
+# newline boundaries, UDP-datagrams contain one or more records (one per
+# line). The legacy select()-engine is still available (engine: select),
+# it also splits TCP-streams at newline boundaries.
+#
+# Code for the select()-engine taken and adapted from:
 # https://stackoverflow.com/questions/5160980/use-select-to-listen-on-both-tcp-and-udp-message
 #
 # Author: Bernhard Bablok
@@ -13,11 +18,205 @@
 #-----------------------------------------------------------------------------
 
 import sys
+import os
+import time
+import codecs
+import signal
 import argparse
+import asyncio
 import configparser
+import sqlite3
+from collections import OrderedDict
 from socket import *
 from select import select
 
+import sensor_meta
+
+TICK_INTERVAL = 1.0     # interval for time-based flushes of buffered data
+
+# --- buffered writer with group-commit   ------------------------------------
+
+class RecordWriter:
+  """ Append records to a file. Records are buffered and written in a
+  single write() once a record-count, a byte-size or a time-interval is
+  reached.
+  """
+
+  def __init__(self,filename,endl=b'\n',
+               max_records=100,max_bytes=65536,interval=5.0,fsync=False):
+    """ constructor """
+    self.filename     = filename
+    self._endl        = endl
+    self._max_records = max_records
+    self._max_bytes   = max_bytes
+    self._interval    = interval
+    self._fsync       = fsync
+    self._file        = open(filename,"ab")
+    self._buffer      = []
+    self._records     = 0
+    self._bytes       = 0
+    self._last_flush  = time.monotonic()
+
+  def write(self,record):
+    """ buffer a single record, flush if necessary """
+    self._buffer.append(record)
+    self._bytes += len(record)
+    if self._endl and record[-1:] != self._endl[-1:]:
+      self._buffer.append(self._endl)
+      self._bytes += len(self._endl)
+    self._records += 1
+    if self._records >= self._max_records or self._bytes >= self._max_bytes:
+      self.flush()
+
+  def check(self,now):
+    """ flush if the flush-interval expired """
+    if self._records and now - self._last_flush >= self._interval:
+      self.flush()
+
+  def flush(self):
+    """ write buffered records """
+    if self._buffer:
+      self._file.write(b''.join(self._buffer))
+      self._file.flush()
+      if self._fsync:
+        os.fsync(self._file.fileno())
+      self._buffer  = []
+      self._records = 0
+      self._bytes   = 0
+    self._last_flush = time.monotonic()
+
+  def close(self):
+    """ flush and close file """
+    try:
+      self.flush()
+    finally:
+      self._file.close()
+
+# --- LRU-cache of RecordWriters for sharded output   ------------------------
+
+class ShardWriter:
+  """ Route records to <root>/<LOGGER_ID>/<YYYY-MM-DD>.csv. At most
+  max_open files are kept open, the least recently used file is closed
+  first.
+  """
+
+  def __init__(self,root,max_open=64,**kwargs):
+    """ constructor. kwargs are passed to RecordWriter """
+    self._root     = root
+    self._max_open = max_open
+    self._kwargs   = kwargs
+    self._writers  = OrderedDict()
+
+  def _get_writer(self,logger_id,ymd):
+    """ return (cached) writer for the given shard """
+    key = (logger_id,ymd)
+    writer = self._writers.get(key)
+    if writer:
+      self._writers.move_to_end(key)
+      return writer
+
+    if len(self._writers) >= self._max_open:
+      _, lru = self._writers.popitem(last=False)
+      lru.close()
+    directory = os.path.join(self._root,logger_id)
+    os.makedirs(directory,exist_ok=True)
+    writer = RecordWriter(os.path.join(directory,f"{ymd}.csv"),
+                          **self._kwargs)
+    self._writers[key] = writer
+    return writer
+
+  def write(self,logger_id,ymd,record):
+    """ write record to the shard of the given logger and day """
+    self._get_writer(logger_id,ymd).write(record)
+
+  def check(self,now):
+    """ flush writers if the flush-interval expired """
+    for writer in self._writers.values():
+      writer.check(now)
+
+  def close(self):
+    """ flush and close all open files """
+    while self._writers:
+      _, writer = self._writers.popitem(last=False)
+      writer.close()
+
+# --- batched writer for SQLite   -------------------------------------------
+
+class SQLiteWriter:
+  """ Save decoded records to a SQLite database. Rows are inserted in
+  batched transactions.
+
+  Schema: data(id,ts,sensor,field,value) with an index on (id,ts). ts is
+  the timestamp of the record (ISO-format), field is the 0-based index of
+  the value within the sensor-data.
+  """
+
+  SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS data (
+         id     TEXT    NOT NULL,
+         ts     TEXT    NOT NULL,
+         sensor TEXT    NOT NULL,
+         field  INTEGER NOT NULL,
+         value)""",
+    "CREATE INDEX IF NOT EXISTS data_id_ts ON data(id,ts)",
+    ]
+  INSERT = "INSERT INTO data (id,ts,sensor,field,value) VALUES (?,?,?,?,?)"
+
+  def __init__(self,database,batch_size=500,interval=5.0,
+               synchronous="NORMAL"):
+    """ constructor """
+    self._batch_size = batch_size
+    self._interval   = interval
+    self._db = sqlite3.connect(database,isolation_level=None)
+    self._db.execute("PRAGMA journal_mode=WAL")
+    self._db.execute(f"PRAGMA synchronous={synchronous}")
+    for stmt in SQLiteWriter.SCHEMA:
+      self._db.execute(stmt)
+    self._rows       = []
+    self._records    = 0
+    self._last_flush = time.monotonic()
+
+  def write(self,data):
+    """ add a decoded record (see sensor_meta.split_csv_fast()) """
+    lid = data["id"]
+    ts  = data["ts"]
+    for item in data["record:"]:
+      sensor = item["sensor"]
+      for nr,value in enumerate(item["data"]):
+        self._rows.append((lid,ts,sensor,nr,value))
+    self._records += 1
+    if self._records >= self._batch_size:
+      self.flush()
+
+  def check(self,now):
+    """ flush if the flush-interval expired """
+    if self._records and now - self._last_flush >= self._interval:
+      self.flush()
+
+  def flush(self):
+    """ insert all pending rows within a single transaction """
+    if self._rows:
+      self._db.execute("BEGIN")
+      try:
+        self._db.executemany(SQLiteWriter.INSERT,self._rows)
+        self._db.execute("COMMIT")
+      except:
+        self._db.execute("ROLLBACK")
+        raise
+      finally:
+        self._rows    = []
+        self._records = 0
+    self._last_flush = time.monotonic()
+
+  def close(self):
+    """ flush and close database """
+    try:
+      self.flush()
+    finally:
+      self._db.close()
+
+# --- main receiver class   --------------------------------------------------
+
 class SocketReceiver:
   def __init__(self,args):
     """ constructor """
@@ -44,11 +243,25 @@ class SocketReceiver:
     bufsize = int(self._get_value(
       self._config,
       "RECEIVER",
-      "bufsize",1024))
-    self.debug(f"receiver settings: {port=}, {backlog=}, {bufsize=}")
+      "bufsize",2048))
+    self._maxline = int(self._get_value(
+      self._config,
+      "RECEIVER",
+      "maxline",65536))
+    self._engine = self._get_value(
+      self._config,
+      "RECEIVER",
+      "engine",args.engine if args.engine else "asyncio")
+    if self._engine not in ["asyncio","select"]:
+      raise ValueError(f"error: engine {self._engine} not implemented!")
+    self.debug(f"receiver settings: {port=}, {backlog=}, {bufsize=}, " +
+               f"maxline={self._maxline}, engine={self._engine}")
+    self._port    = port
+    self._backlog = backlog
     self._data = bytearray(bufsize)
 
     # action settings
+    self._buffers = []       # objects with buffered data: check(), close()
     action =  self._get_value(
       self._config,
       "RECEIVER",
@@ -60,16 +273,27 @@ class SocketReceiver:
       self._action(init=True)
       self.debug(f"using action: '{action}' for data-processing")
 
+    self._tcp_socket = None
+    self._udp_socket = None
+    self._carry      = {}   # select-engine: partial record per TCP-socket
+    self._server     = None
+    self._transport  = None
+
+  # --- create sockets for select-engine   ------------------------------------
+
+  def _create_sockets(self):
+    """ create server sockets for the select-engine """
+
     # create tcp socket
     self._tcp_socket = socket(AF_INET, SOCK_STREAM)
     self._tcp_socket.setsockopt(SOL_SOCKET,SO_REUSEADDR,1)
-    self._tcp_socket.bind(('',port))
-    self._tcp_socket.listen(backlog)
+    self._tcp_socket.bind(('',self._port))
+    self._tcp_socket.listen(self._backlog)
 
     # create udp socket
     self._udp_socket = socket(AF_INET, SOCK_DGRAM)
     #self._udp_socket.settimeout(0.5)
-    self._udp_socket.bind(('',port))
+    self._udp_socket.bind(('',self._port))
 
     self._input = [self._tcp_socket,self._udp_socket]
 
@@ -87,6 +311,24 @@ class SocketReceiver:
       value = default
     return value
 
+  # --- register a buffered sink   ------------------------------------------
+
+  def add_buffer(self,buffer):
+    """ register an object with buffered data (check(now), close()) """
+    self._buffers.append(buffer)
+    return buffer
+
+  # --- time-based flush of buffered data   ----------------------------------
+
+  def check_buffers(self):
+    """ give all buffers the chance to flush data """
+    now = time.monotonic()
+    for buffer in self._buffers:
+      try:
+        buffer.check(now)
+      except Exception as ex:
+        self.debug(f"check_buffers: failed for {buffer}: {ex}")
+
   # --- noop action   --------------------------------------------------------
 
   def noop(self, init=False, record=None):
@@ -98,8 +340,8 @@ class SocketReceiver:
   def print(self, init=False, record=None):
     """ print record """
     if init:
-      self._printfile = self._get_value(self._config, "PRINT",
-                                        "filename","/dev/stderr")
+      self._printfile = open(self._get_value(self._config, "PRINT",
+                                             "filename","/dev/stderr"),"wt")
     else:
       print(record.decode(),file=self._printfile,flush=True)
 
@@ -108,27 +350,112 @@ class SocketReceiver:
   def save(self, init=False, record=None):
     """ save record to file in binary mode """
     if init:
-      self._outfile = self._get_value(self._config, "SAVE",
-                                      "filename","/dev/stderr")
-      self._endl = bytes(self._get_value(self._config, "SAVE",
-                                         "endl",'\n'),'utf-8')
+      outfile = self._get_value(self._config, "SAVE",
+                                "filename","/dev/stderr")
+      endl = codecs.decode(self._get_value(self._config, "SAVE",
+                                           "endl",'\n'),'unicode_escape')
+      self._writer = self.add_buffer(RecordWriter(
+        outfile,endl=bytes(endl,'utf-8'),
+        max_records=int(self._get_value(self._config, "SAVE",
+                                        "flush_records",100)),
+        max_bytes=int(self._get_value(self._config, "SAVE",
+                                      "flush_bytes",65536)),
+        interval=float(self._get_value(self._config, "SAVE",
+                                       "flush_interval",5.0)),
+        fsync=self._get_value(self._config, "SAVE", "fsync","0") == "1"))
+      return
+
+    self._writer.write(record)
+
+  # --- shard action   -------------------------------------------------------
+
+  def shard(self, init=False, record=None):
+    """ save record to a file per logger and day """
+    if init:
+      root = self._get_value(self._config, "SHARD",
+                             "root","/var/lib/datalogger")
+      endl = codecs.decode(self._get_value(self._config, "SHARD",
+                                           "endl",'\n'),'unicode_escape')
+      self._shards = self.add_buffer(ShardWriter(
+        root,
+        max_open=int(self._get_value(self._config, "SHARD",
+                                     "max_open",64)),
+        endl=bytes(endl,'utf-8'),
+        max_records=int(self._get_value(self._config, "SHARD",
+                                        "flush_records",100)),
+        max_bytes=int(self._get_value(self._config, "SHARD",
+                                      "flush_bytes",65536)),
+        interval=float(self._get_value(self._config, "SHARD",
+                                       "flush_interval",5.0)),
+        fsync=self._get_value(self._config, "SHARD", "fsync","0") == "1"))
+      self._shard_fallback = self._get_value(self._config, "SHARD",
+                                             "fallback","_unknown")
       return
 
-    with open(self._outfile, "ab") as file:
-      file.write(record)
-      if self._endl and record[-1] != ord(self._endl):
-        file.write(self._endl)
+    logger_id, ymd = self._get_shard(record)
+    self._shards.write(logger_id,ymd,record)
+
+  def _get_shard(self,record):
+    """ parse record and return (LOGGER_ID,YYYY-MM-DD) """
+    try:
+      # only the position of the id is needed, so don't convert values
+      fields = record.decode().rstrip('\r\n').split(',')
+      id_index, _ = sensor_meta.compile_layout(fields[2])
+      logger_id = fields[id_index]
+      ymd = fields[0].split('T')[0]
+    except Exception as ex:
+      # no dcode: assume ts,id,... as in the gateway (CSV_FIELDNR_ID)
+      self.debug(f"shard: could not parse record {record}: {ex}")
+      fields = record.decode(errors='replace').split(',')
+      logger_id = fields[1] if len(fields) > 1 else None
+      ymd = fields[0].split('T')[0]
+
+    # sanitize: id and date are used as path-components
+    if (not logger_id or '/' in logger_id or logger_id[0] == '.'):
+      logger_id = self._shard_fallback
+    if (len(ymd) != 10 or ymd[4] != '-' or ymd[7] != '-' or
+        not (ymd[:4]+ymd[5:7]+ymd[8:]).isdigit()):
+      ymd = "unknown"
+    return logger_id, ymd
+
+  # --- sqlite action   ------------------------------------------------------
+
+  def sqlite(self, init=False, record=None):
+    """ decode record and save it to a SQLite database """
+    if init:
+      self._sqlite = self.add_buffer(SQLiteWriter(
+        self._get_value(self._config, "SQLITE",
+                        "database","/var/lib/datalogger/datalogger.sqlite"),
+        batch_size=int(self._get_value(self._config, "SQLITE",
+                                       "batch_size",500)),
+        interval=float(self._get_value(self._config, "SQLITE",
+                                       "batch_interval",5.0)),
+        synchronous=self._get_value(self._config, "SQLITE",
+                                    "synchronous","NORMAL")))
+      return
+
+    try:
+      data = sensor_meta.split_csv_fast(record.decode().rstrip('\r\n'))
+    except Exception as ex:
+      self.debug(f"sqlite: could not parse record {record}: {ex}")
+      return
+    self._sqlite.write(data)
 
   # --- cleanup   ------------------------------------------------------------
 
   def cleanup(self):
     """ cleanup ressources """
-    try:
+    for buffer in self._buffers:
+      try:
+        buffer.close()
+      except Exception as ex:
+        self.debug(f"cleanup: could not close {buffer}: {ex}")
+    self._buffers = []
+    if self._tcp_socket:
       self._tcp_socket.shutdown(SHUT_RDWR)
       self._tcp_socket.close()
+    if self._udp_socket:
       self._udp_socket.close()
-    except:
-      raise
 
   # --- print debug messages to stderr   -------------------------------------
 
@@ -148,42 +475,141 @@ class SocketReceiver:
   # --- read from TCP-socket   -----------------------------------------------
 
   def read_tcp(self,sock):
-    """ read from TCP-socket """
+    """ read from TCP-socket and split the stream into records. Returns
+    True if the socket was closed. """
     self.debug(f"read_tcp: reading from {sock}")
     try:
       n = sock.recv_into(self._data)
       self.debug(
-        f"read_tcp: {n} bytes from {sock.getpeername()}: {self._data[:n].decode()}")
-      if n == 0:
-        self.debug(f"read_tcp: socket closed")
-        return True
-      elif n < 0:
-        self.debug(f"read_tcp: socket failure")
-        return True
+        f"read_tcp: {n} bytes from {sock.getpeername()}: {self._data[:n].decode(errors='replace')}")
+      if n <= 0:
+        self.debug(f"read_tcp: socket closed" if n == 0 else
+                   f"read_tcp: socket failure")
     except:
-      self.debug(
-        f"read_tcp: failed to read from {sock.getpeername()}")
+      self.debug(f"read_tcp: failed to read from {sock}")
+      n = 0
+    if n <= 0:
+      # EOF: a final record without newline is still a record
+      carry = self._carry.pop(sock,None)
+      if carry and carry.strip():
+        self._action(record=bytes(carry).rstrip(b'\r'))
       return True
-    self._action(record=self._data[:n])
+
+    # partial record of the last read (None: discard up to next newline)
+    carry = self._carry.get(sock,bytearray())
+    lines = self._data[:n].split(b'\n')
+    for line in lines[:-1]:
+      if carry is None:
+        carry = bytearray()                # end of discarded record
+        continue
+      record = bytes(carry + line).rstrip(b'\r')
+      carry = bytearray()
+      if record:
+        self._action(record=record)
+    if carry is not None:
+      carry += lines[-1]
+      if len(carry) > self._maxline:
+        self.debug(f"read_tcp: record exceeds {self._maxline} bytes")
+        carry = None
+    self._carry[sock] = carry
     return False
 
-  # --- read from TCP-socket   -----------------------------------------------
+  # --- read from UDP-socket   -----------------------------------------------
 
   def read_udp(self,sock):
     """ read from UDP-socket """
     self.debug(f"read_udp: reading from {sock}")
     n,*addr = sock.recvfrom_into(self._data)
-    self._action(record=self._data[:n].decode())
     self.debug(f"read_udp: {n} bytes from {addr}: {self._data[:n].decode()}")
+    self.process_datagram(bytes(self._data[:n]))
 
-  # --- main processing loop   -----------------------------------------------
+  # --- process a datagram   -------------------------------------------------
 
-  def run(self):
-    """ main processing loop """
+  def process_datagram(self,data):
+    """ split datagram into records (one or more lines) """
+    for record in data.split(b'\n'):
+      record = record.rstrip(b'\r')
+      if record:
+        self._action(record=record)
+
+  # --- handle a single TCP-connection (asyncio-engine)   ---------------------
+
+  async def handle_tcp(self,reader,writer):
+    """ read newline-delimited records from a TCP-stream """
+
+    peer = writer.get_extra_info('peername')
+    self.debug(f"handle_tcp: connect from {peer}")
+    discard = False
+    try:
+      while True:
+        try:
+          line = await reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError as ex:
+          # EOF: a final record without newline is still a record
+          if ex.partial.strip() and not discard:
+            self._action(record=ex.partial.rstrip(b'\r'))
+          break
+        except asyncio.LimitOverrunError as ex:
+          # record longer than maxline: discard up to the next newline
+          self.debug(f"handle_tcp: record from {peer} exceeds {self._maxline} bytes")
+          await reader.readexactly(ex.consumed)
+          discard = True
+          continue
+        if discard:
+          discard = False
+          continue
+        record = line.rstrip(b'\r\n')
+        self.debug(f"handle_tcp: {len(line)} bytes from {peer}: {record}")
+        if record:
+          self._action(record=record)
+    except ConnectionError as ex:
+      self.debug(f"handle_tcp: connection from {peer} failed: {ex}")
+    finally:
+      self.debug(f"handle_tcp: closing connection from {peer}")
+      writer.close()
+      try:
+        await writer.wait_closed()
+      except ConnectionError:
+        pass
+
+  # --- periodic flush of buffered data (asyncio-engine)   -------------------
+
+  async def flush_timer(self):
+    """ check buffers periodically """
+    while True:
+      await asyncio.sleep(TICK_INTERVAL)
+      self.check_buffers()
+
+  # --- main processing loop (asyncio-engine)   ------------------------------
+
+  async def run_async(self):
+    """ main processing loop using asyncio """
+
+    loop = asyncio.get_running_loop()
+    self._server = await asyncio.start_server(
+      self.handle_tcp,port=self._port,backlog=self._backlog,
+      limit=self._maxline,reuse_address=True)
+    self._transport, _ = await loop.create_datagram_endpoint(
+      lambda: UDPProtocol(self),local_addr=('0.0.0.0',self._port))
+    self.debug(f"run_async: listening on port {self._port}")
+    timer = asyncio.create_task(self.flush_timer())
+    try:
+      async with self._server:
+        await self._server.serve_forever()
+    finally:
+      timer.cancel()
+      self._transport.close()
+
+  # --- main processing loop (select-engine)   -------------------------------
 
+  def run_select(self):
+    """ main processing loop using select """
+
+    self._create_sockets()
     while True:
-      inputready,outputready,exceptready = select(self._input,[],[])
-  
+      inputready,outputready,exceptready = select(self._input,[],[],
+                                                  TICK_INTERVAL)
+      self.check_buffers()
       for sock in inputready:
         if sock == self._tcp_socket:
           csock = self.connect_tcp(sock)
@@ -193,6 +619,35 @@ class SocketReceiver:
         else:
           if self.read_tcp(sock):
             self._input.remove(sock)
+            sock.close()
+
+  # --- main processing loop   -----------------------------------------------
+
+  def run(self):
+    """ main processing loop """
+
+    if self._engine == "select":
+      self.run_select()
+    else:
+      asyncio.run(self.run_async())
+
+# --- UDP-protocol for the asyncio-engine   ----------------------------------
+
+class UDPProtocol(asyncio.DatagramProtocol):
+  """ pass received datagrams to the receiver-action """
+
+  def __init__(self,receiver):
+    """ constructor """
+    self._receiver = receiver
+
+  def datagram_received(self,data,addr):
+    """ process a single datagram """
+    self._receiver.debug(f"datagram_received: {len(data)} bytes from {addr}")
+    self._receiver.process_datagram(data)
+
+  def error_received(self,ex):
+    """ log errors """
+    self._receiver.debug(f"error_received: {ex}")
 
 # --- main program   ---------------------------------------------------------
 
@@ -202,12 +657,18 @@ if __name__ == '__main__':
                       help="UDP/TCP receiver port (default: 8888)")
   parser.add_argument("-a", "--action", type=str, default=None,
                       help="action for received data")
+  parser.add_argument("-e", "--engine", type=str, default=None,
+                      help="receiver engine: asyncio (default) or select")
   parser.add_argument('-d', '--debug', action='store_true',
                       dest='debug', default=None,
                       help="debug-mode (writes to stderr)")
 
   args = parser.parse_args()    
   receiver = SocketReceiver(args)
+
+  # convert SIGTERM (systemctl stop) to a normal exit, so that the cleanup
+  # below flushes all buffered data
+  signal.signal(signal.SIGTERM, lambda signum,frame: sys.exit(0))
   try:
     receiver.run()
   except BaseException as ex:
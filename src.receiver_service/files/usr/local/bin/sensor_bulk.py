@@ -0,0 +1,185 @@
+#!/usr/bin/python3
+#-----------------------------------------------------------------------------
+# Bulk decoder for datalogger records (host only, needs NumPy).
+#
+# This module reads complete log-files (or streams), groups the records
+# by dcode and decodes every group into a NumPy structured array in one
+# pass. Column names are taken from the "#ts,..." header lines written
+# by the datalogger. Without header, names are derived from the
+# sensor metadata ("<sensor>_<n>").
+#
+# Missing values are decoded as MISSING (integer columns, same value as
+# in binary log-files), nan (float columns) or "" (string columns).
+#
+# Usage as a module:
+#
+#   import sensor_bulk
+#   groups = sensor_bulk.read_bulk("log_042_2024-01-09.csv")
+#   for (dcode,n),arr in groups.items():
+#     print(dcode,arr.dtype.names,arr.shape)
+#
+# Usage from the commandline: see "sensor_bulk.py -h".
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import sys
+import argparse
+import numpy as np
+
+import sensor_meta
+
+# mapping of field types (see sensor_meta.DCODE_MAP) to NumPy dtypes
+DTYPES = {"s": "U32", "i": "i4", "1": "f4", "2": "f4", "3": "f4"}
+DTYPE_TS      = "datetime64[s]"
+DTYPE_GENERIC = "f8"
+MISSING       = -2147483648      # missing value of integer columns
+
+# --- create structured dtype for a dcode   ----------------------------------
+
+def get_dtype(dcode,n_fields,names=None):
+  """ return structured dtype for records with the given dcode and
+  number of fields. names is an optional list of column names.
+  """
+
+  # types of all fields in record-order (first column is the timestamp)
+  types = [DTYPE_TS]
+  default_names = ["ts"]
+  last = len(dcode)-1
+  for i,dc in enumerate(dcode):
+    sensor, count, ftypes = sensor_meta.DCODE_MAP[dc]
+    if i == last:
+      # last sensor consumes all remaining fields
+      count = n_fields - len(types)
+      if count != len(ftypes):
+        if sensor in sensor_meta.VARIABLE_SENSORS:
+          ftypes = (count*ftypes)[:count]
+        else:
+          # extra fields (test-mode): no type information
+          ftypes = count*"g"
+    for nr in range(count):
+      types.append(DTYPES.get(ftypes[nr],DTYPE_GENERIC))
+      default_names.append(sensor if sensor in ["id","dcode"] else
+                           f"{sensor}_{nr}")
+
+  if not names or len(names) != len(types):
+    names = default_names
+
+  # names must be unique
+  unique = []
+  for name in names:
+    name = name.strip() or "col"
+    candidate, nr = name, 1
+    while candidate in unique:
+      candidate = f"{name}_{nr}"
+      nr += 1
+    unique.append(candidate)
+  return np.dtype(list(zip(unique,types)))
+
+# --- decode a group of records   --------------------------------------------
+
+def decode_group(lines,dtype):
+  """ decode a list of csv-lines into a structured array """
+
+  try:
+    return np.loadtxt(lines,dtype=dtype,delimiter=',',comments=None,ndmin=1)
+  except ValueError:
+    # missing or invalid values: slower, fills in explicit sentinels
+    fill = {}
+    for i,name in enumerate(dtype.names):
+      kind = dtype[name].kind
+      if kind == 'i':
+        fill[i] = MISSING
+      elif kind == 'f':
+        fill[i] = np.nan
+      elif kind == 'U':
+        fill[i] = ""
+    return np.genfromtxt(lines,dtype=dtype,delimiter=',',comments=None,
+                         invalid_raise=False,ndmin=1,filling_values=fill)
+
+# --- read and group records   -----------------------------------------------
+
+def group_records(fileobjs,dcode_index=2):
+  """ group records by (dcode,n_fields). Returns a dict with
+  (dcode,n_fields) -> (names,lines) """
+
+  groups = {}
+  names  = None
+  for fileobj in fileobjs:
+    for line in fileobj:
+      if not line or line[0] == "#":
+        if line.startswith("#ts,"):
+          names = line[1:].rstrip('\r\n').split(',')
+        continue
+      line = line.rstrip('\r\n')
+      if not line:
+        continue
+      fields = line.split(',')
+      try:
+        key = (fields[dcode_index],len(fields))
+      except IndexError:
+        continue
+      group = groups.get(key)
+      if not group:
+        group = [None,[]]
+        groups[key] = group
+      if names:
+        # a header line describes the records following it
+        if len(names) == key[1]:
+          group[0] = names
+        names = None
+      group[1].append(line)
+  return groups
+
+# --- read files and decode all records   ------------------------------------
+
+def _open_all(sources):
+  """ open files one after another """
+  for source in sources:
+    if isinstance(source,str):
+      with open(source,"rt") as fileobj:
+        yield fileobj
+    else:
+      yield source
+
+def read_bulk(sources,dcode_index=2):
+  """ Read records from files (names or file-objects) and return a
+  dict (dcode,n_fields) -> structured array.
+  """
+
+  if isinstance(sources,str) or hasattr(sources,"read"):
+    sources = [sources]
+  groups = group_records(_open_all(sources),dcode_index)
+
+  result = {}
+  for (dcode,n_fields),(names,lines) in groups.items():
+    try:
+      dtype = get_dtype(dcode,n_fields,names)
+    except KeyError:
+      # unknown dcode (or no dcode at all)
+      continue
+    result[(dcode,n_fields)] = decode_group(lines,dtype)
+  return result
+
+# --- main program   ---------------------------------------------------------
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="DL Bulk-Decoder")
+  parser.add_argument('-i', '--dcode-index', type=int, default=2,
+                      dest='dcode_index',
+                      help="column of the dcode (default: 2)")
+  parser.add_argument('-o', '--output', default=None,
+                      help="save arrays to the given .npz-file")
+  parser.add_argument('infile', nargs='+', help='input-file(s)')
+
+  args = parser.parse_args()
+  arrays = read_bulk(args.infile,dcode_index=args.dcode_index)
+  for (dcode,n_fields),arr in arrays.items():
+    print(f"{dcode} ({n_fields} fields): {arr.shape[0]} records, " +
+          f"columns: {','.join(arr.dtype.names)}",file=sys.stderr)
+  if args.output:
+    np.savez(args.output,
+             **{f"{dcode}_{n_fields}": arr
+                for (dcode,n_fields),arr in arrays.items()})
@@ -0,0 +1,192 @@
+#-----------------------------------------------------------------------------
+# Durable queue of text-records (lines) for transmit-buffers.
+#
+# Records are appended to segment files <filename>.<nr>. A separate small
+# file <filename>.ofs holds the committed position (segment,offset).
+# Readers peek at a batch of records and commit the number of records
+# they processed. Segments are only removed after they are fully
+# consumed, so a drain never copies data.
+#
+# An existing buffer-file <filename> (old format) is adopted as the
+# newest segment. If the newest segment ends with a partial record (write
+# torn by a power-loss), new records go to a new segment, so they are not
+# merged with the partial record. Readers skip the partial record.
+#
+# Usage:
+#
+#   queue = DurableQueue("/sd/tx_buffer.csv")
+#   queue.append(record)
+#   records = queue.peek(10)
+#   ... process records ...
+#   queue.commit(n)       # n <= len(records)
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import os
+
+SEGMENT_SIZE = 65536
+
+# --- class DurableQueue   ---------------------------------------------------
+
+class DurableQueue:
+  """ append-only queue with committed read-position """
+
+  def __init__(self,filename,segment_size=SEGMENT_SIZE):
+    """ constructor """
+
+    self._filename = filename
+    self._segment_size = segment_size
+    self._dir,_,self._prefix = filename.rpartition('/')
+    self._prefix += '.'
+
+    # list of existing segment numbers
+    self._segments = []
+    for name in os.listdir(self._dir or '.'):
+      if name.startswith(self._prefix):
+        try:
+          self._segments.append(int(name[len(self._prefix):]))
+        except ValueError:
+          pass
+    self._segments.sort()
+
+    # adopt buffer-file of old format
+    try:
+      os.stat(filename)
+      nr = self._segments[-1]+1 if self._segments else 0
+      os.rename(filename,self._segment(nr))
+      self._segments.append(nr)
+    except OSError:
+      pass
+
+    # committed position
+    self._pos = (self._segments[0],0) if self._segments else (0,0)
+    try:
+      with open(filename+".ofs","rt") as f:
+        seg,offset = f.readline().split(',')
+        if int(seg) in self._segments:
+          self._pos = (int(seg),int(offset))
+    except:
+      pass
+    self._peeked  = []
+    self._checked = False           # tail of newest segment checked
+
+  # --- name of segment   ----------------------------------------------------
+
+  def _segment(self,nr):
+    """ return filename of segment """
+    return f"{self._filename}.{nr}"
+
+  # --- append record   ------------------------------------------------------
+
+  def append(self,record):
+    """ append a record (a line without newline) """
+
+    if not self._segments:
+      self._segments.append(self._pos[0])
+    name = self._segment(self._segments[-1])
+    try:
+      size = os.stat(name)[6]
+      new_segment = size >= self._segment_size
+      if not new_segment and size and not self._checked:
+        with open(name,"rb") as f:
+          f.seek(size-1)
+          new_segment = f.read(1) != b'\n'   # partial record
+      if new_segment:
+        self._segments.append(self._segments[-1]+1)
+        name = self._segment(self._segments[-1])
+    except OSError:
+      pass
+    self._checked = True
+    with open(name,"ab") as f:
+      f.write(f"{record}\n".encode('utf-8'))
+
+  # --- peek at records   ----------------------------------------------------
+
+  def peek(self,n):
+    """ return up to n records, starting at the committed position """
+
+    records = []
+    self._peeked = []
+    seg,offset = self._pos
+    for nr in self._segments:
+      if nr < seg:
+        continue
+      if nr > seg:
+        offset = 0
+      try:
+        with open(self._segment(nr),"rb") as f:
+          f.seek(offset)
+          while len(records) < n:
+            line = f.readline()
+            if not line or line[-1:] != b'\n':
+              break                         # end or partial record
+            offset += len(line)
+            line = line.rstrip(b'\r\n')
+            if line:
+              records.append(str(line,'utf-8'))
+              self._peeked.append((nr,offset))
+      except OSError:
+        pass
+      if len(records) >= n:
+        break
+    return records
+
+  # --- commit processed records   -------------------------------------------
+
+  def commit(self,n):
+    """ commit the first n records of the last peek """
+
+    if n <= 0 or not self._peeked:
+      return
+    self._pos = self._peeked[min(n,len(self._peeked))-1]
+    self._peeked = []
+
+    # remove fully consumed segments (all but the last one)
+    while len(self._segments) > 1 and self._segments[0] < self._pos[0]:
+      self._remove(self._segments.pop(0))
+    if len(self._segments) > 1:
+      try:
+        if self._pos[1] >= os.stat(self._segment(self._pos[0]))[6]:
+          self._remove(self._segments.pop(0))
+          self._pos = (self._segments[0],0)
+      except OSError:
+        pass
+
+    # last segment fully consumed: remove queue
+    seg,offset = self._pos
+    if len(self._segments) == 1:
+      try:
+        if offset >= os.stat(self._segment(seg))[6]:
+          self._remove(self._segments.pop(0))
+          self._remove_file(self._filename+".ofs")
+          self._pos = (seg+1,0)
+          os.sync()
+          return
+      except OSError:
+        pass
+
+    with open(self._filename+".ofs","wt") as f:
+      f.write(f"{self._pos[0]},{self._pos[1]}\n")
+    os.sync()
+
+  # --- check for pending records   ------------------------------------------
+
+  def empty(self):
+    """ return True if there are no pending records """
+    return not self.peek(1)
+
+  # --- remove files   -------------------------------------------------------
+
+  def _remove(self,nr):
+    """ remove segment """
+    self._remove_file(self._segment(nr))
+
+  def _remove_file(self,name):
+    """ remove file, ignore errors """
+    try:
+      os.remove(name)
+    except OSError:
+      pass
@@ -11,6 +11,7 @@ from log_writer import Logger
 g_logger = Logger()
 
 from singleton import singleton
+from sleep import TimeSleep
 
 from digitalio import DigitalInOut, Direction, Pull
 import struct
@@ -34,6 +35,108 @@ _LORA_QOS = [
   ]
 _LORA_QOS_DEF = 2  # 0 is library default
 
+MAX_PAYLOAD = 252  # maximum payload of the rfm9x
+MAX_RECORDS = 32   # maximum number of records in a M-message
+
+# --- adaptive data rate (ADR)   ---------------------------------------------
+
+# minimum SNR for demodulation per spreading-factor
+_SNR_REQUIRED = {7: -7.5, 8: -10.0, 9: -12.5, 10: -15.0, 11: -17.5, 12: -20.0}
+_ADR_HISTORY  = 8     # number of SNR-values in the history
+_ADR_MIN      = 3     # minimum number of values before speeding up
+_ADR_GUARD    = 1.0   # guard time at the start and end of a slot
+_ADR_TURN     = 0.5   # turnaround time between transmit and response
+_ADR_ACK_LEN  = 1+MAX_RECORDS//8   # maximum length of a response
+
+# --- airtime and duty-cycle   -----------------------------------------------
+
+_HEADER_LEN   = 4     # header of the RadioHead protocol
+_DUTY_WINDOW  = 3600  # length of the sliding window in seconds
+_DUTY_SLOTS   = 60    # number of slots of the sliding window
+_DUTY_RESERVE = 0.2   # part of the budget reserved for urgent transmissions
+
+def airtime(length,sf,cr,bw,preamble=8,de=0,crc=True):
+  """ time on air in seconds of a packet with the given payload length
+  (Semtech formula, explicit header, cr is 5-8)
+  """
+
+  t_sym = (1 << sf)/bw
+  n     = 8*length - 4*sf + 28 + (16 if crc else 0)
+  n     = max(-(-n // (4*(sf-2*de))),0)*cr      # ceil(n/..)*cr
+  return (preamble + 4.25 + 8 + n)*t_sym
+
+def _ldro(sf,cr,bw):
+  """ return low-datarate-optimize setting """
+  return 1 if (cr/4)* 1000 / (bw/(1 << sf)) > 16 else 0
+
+# --- sliding-window airtime budget   ----------------------------------------
+
+class AirtimeBudget:
+  """ airtime used within a sliding window (slots of window/_DUTY_SLOTS
+  seconds) and the budget of the window
+  """
+
+  def __init__(self,duty,window=_DUTY_WINDOW):
+    """ constructor """
+
+    self.budget = duty*window
+    self._len   = max(int(window)//_DUTY_SLOTS,1)  # int: CP-floats are short
+    self._slots = [0.0]*_DUTY_SLOTS
+    self._nr    = None              # absolute number of the current slot
+    self.used   = 0.0
+
+  def _advance(self,now):
+    """ expire slots older than the window """
+
+    nr = int(now) // self._len
+    if self._nr is None or nr - self._nr >= _DUTY_SLOTS:
+      self._slots = [0.0]*_DUTY_SLOTS
+    elif nr > self._nr:
+      for i in range(self._nr+1,nr+1):
+        self._slots[i % _DUTY_SLOTS] = 0.0
+    else:
+      return
+    self._nr  = nr
+    self.used = sum(self._slots)
+
+  def wait(self,duration,limit,now):
+    """ return time until a transmission of the given duration fits
+    into the limit (0: now, None: never)
+    """
+
+    self._advance(now)
+    excess = self.used + duration - limit
+    if excess <= 0:
+      return 0
+    for i in range(1,_DUTY_SLOTS):
+      # oldest slots first: slot nr+i-_DUTY_SLOTS expires at start of nr+i
+      excess -= self._slots[(self._nr+i) % _DUTY_SLOTS]
+      if excess <= 0:
+        return (self._nr+i)*self._len - now
+    return None
+
+  def add(self,duration,now):
+    """ add airtime of a transmission """
+
+    self._advance(now)
+    self._slots[self._nr % _DUTY_SLOTS] += duration
+    self.used += duration
+
+  def load(self,line):
+    """ restore state from a line (see save) """
+
+    values = line.strip().split(',')
+    if len(values) == _DUTY_SLOTS+1:
+      self._nr    = int(values[0])
+      self._slots = [float(v) for v in values[1:]]
+      self.used   = sum(self._slots)
+
+  def save(self):
+    """ return state as a line """
+
+    return ",".join([str(self._nr)] +
+                    [f"{v:.3f}" for v in self._slots]) + "\n"
+
 # --- helper class for LoRa   ------------------------------------------------
 
 @singleton
@@ -54,11 +157,42 @@ class LORA:
     sf   = getattr(config, 'LORA_SF', _LORA_QOS[qos][0])
     cr   = getattr(config, 'LORA_CR', _LORA_QOS[qos][1])
     bw   = getattr(config, 'LORA_BW', _LORA_QOS[qos][2])
-    g_logger.print(f"LoRa: QOS-parameter: {(sf,cr,bw)}")
 
-    # calculate expected app-level byte-rate: R(B) = sf*(4/cr)*bw/2**sf/8
-    self._byte_rate = sf*4/cr*bw/(1<<(sf+3))
-    g_logger.print(f"LoRa: expected byte-rate: {self._byte_rate:0.1f} B/s")
+    # adaptive data rate: QOS-levels and slot-length of the schedule
+    self.adr = getattr(config, 'LORA_ADR_QOS', None)
+    if self.adr:
+      self.adr = [int(q) for q in self.adr.split()]
+      self._adr_slot   = getattr(config, 'LORA_ADR_SLOT', 10)
+      self._adr_margin = getattr(config, 'LORA_ADR_MARGIN', 10)
+      self._adr_index  = len(self.adr)-1
+      self._adr_snr    = []
+      self._adr_file   = None
+      self._adr_active = False           # datalogger-mode (see adr_load)
+      sf, cr, bw = _LORA_QOS[self.adr[-1]]
+
+      # a transfer of maximum size must fit into a slot at every level
+      for q in self.adr:
+        duration = self._adr_duration(MAX_PAYLOAD,*_LORA_QOS[q])
+        if duration + 2*_ADR_GUARD > self._adr_slot:
+          raise ValueError(f"LORA_ADR_SLOT too short for QOS {q}: " +
+                           f"needs {duration+2*_ADR_GUARD:0.1f}s")
+
+    # duty-cycle: default is 1% for the 868MHz band
+    duty = getattr(config, 'LORA_DUTY_CYCLE',
+                   0.01 if 863 <= config.LORA_FREQ <= 870 else 0)
+    if duty:
+      self._duty = AirtimeBudget(duty,
+                                 getattr(config,'LORA_DUTY_WINDOW',_DUTY_WINDOW))
+    else:
+      self._duty = None
+    self._duty_reserve = getattr(config, 'LORA_DUTY_RESERVE', _DUTY_RESERVE)
+    self._duty_defer   = getattr(config, 'LORA_DUTY_MAX_DEFER', 0)
+    self._duty_file    = None
+    self.duty_refused  = False           # last transmit refused (budget)
+    self._tx_count = 0
+    self._tx_time  = 0.0
+    self._deferred = 0
+    self._refused  = 0
 
     if hasattr(pins,'PIN_LORA_EN'):
       g_logger.print("LoRa: enabling rfm9x")
@@ -73,14 +207,7 @@ class LORA:
       spi, pin_cs,pin_reset,config.LORA_FREQ,baudrate=100000)
 
     g_logger.print("LoRa: configuring rfm9x")
-    self.rfm9x.spreading_factor = sf
-    self.rfm9x.coding_rate      = cr
-    self.rfm9x.signal_bandwidth = bw
-    if (cr/4)* 1000 / (bw/(1 << sf)) > 16:
-      self.rfm9x.low_datarate_optimize = 1
-    else:
-      self.rfm9x.low_datarate_optimize = 0
-
+    self._set_qos(sf,cr,bw)
     self.rfm9x.enable_crc = True
     self.rfm9x.receive_timeout = getattr(config,'LORA_RECEIVE_TIMEOUT',5.0)
     self.rfm9x.tx_power = getattr(config,"LORA_TX_POWER",13)
@@ -88,6 +215,211 @@ class LORA:
     self.rfm9x.destination = getattr(config,"LORA_BASE_ADDR",0)  # gateway
     self.rfm9x.sleep()
 
+  # --- set QOS-parameters   -------------------------------------------------
+
+  def _set_qos(self,sf,cr,bw):
+    """ configure spreading-factor, coding-rate and bandwidth """
+
+    g_logger.print(f"LoRa: QOS-parameter: {(sf,cr,bw)}")
+    self.rfm9x.spreading_factor = sf
+    self.rfm9x.coding_rate      = cr
+    self.rfm9x.signal_bandwidth = bw
+    self.rfm9x.low_datarate_optimize = _ldro(sf,cr,bw)
+
+    # calculate expected app-level byte-rate: R(B) = sf*(4/cr)*bw/2**sf/8
+    self._byte_rate = sf*4/cr*bw/(1<<(sf+3))
+    g_logger.print(f"LoRa: expected byte-rate: {self._byte_rate:0.1f} B/s")
+
+  # --- airtime of a packet   ------------------------------------------------
+
+  def airtime(self,length):
+    """ return time on air of a packet with the given payload length """
+
+    return airtime(length+_HEADER_LEN,
+                   self.rfm9x.spreading_factor,self.rfm9x.coding_rate,
+                   self.rfm9x.signal_bandwidth,
+                   getattr(self.rfm9x,'preamble_length',8),
+                   self.rfm9x.low_datarate_optimize,
+                   self.rfm9x.enable_crc)
+
+  # --- duty-cycle: check budget   -------------------------------------------
+
+  def _duty_check(self,duration,urgent):
+    """ check if a transmission fits into the budget. Non-urgent
+    transmissions must leave the reserve for urgent transmissions and
+    are deferred up to LORA_DUTY_MAX_DEFER seconds.
+    """
+
+    limit = self._duty.budget
+    if not urgent:
+      limit *= 1 - self._duty_reserve
+    wait = self._duty.wait(duration,limit,time.time())
+    if wait == 0:
+      return True
+    if not urgent and wait is not None and wait <= self._duty_defer:
+      self._deferred += 1
+      self.trace(f"LoRa: duty-cycle: deferring transmit by {wait:0.1f}s")
+      time.sleep(wait)
+      return True
+    self._refused += 1
+    g_logger.print(f"LoRa: duty-cycle: budget exhausted " +
+                   f"({self._duty.used:0.1f}s/{limit:0.1f}s), not sending")
+    return False
+
+  # --- duty-cycle: load and save state (datalogger)   -----------------------
+
+  def duty_load(self,state_file):
+    """ restore used airtime (needed with deep-sleep) """
+
+    self._duty_file = state_file
+    if not self._duty or not state_file:
+      return
+    try:
+      with open(state_file,"rt") as f:
+        self._duty.load(f.readline())
+    except:
+      pass
+
+  def duty_save(self):
+    """ save used airtime """
+
+    if not self._duty or not self._duty_file:
+      return
+    try:
+      with open(self._duty_file,"wt") as f:
+        f.write(self._duty.save())
+    except:
+      pass
+
+  # --- airtime statistics   -------------------------------------------------
+
+  def airtime_stats(self):
+    """ return airtime metrics """
+
+    stats = {"tx": self._tx_count, "airtime": round(self._tx_time,3),
+             "deferred": self._deferred, "refused": self._refused}
+    if self._duty:
+      self._duty.wait(0,0,time.time())        # expire old slots
+      stats["used"]   = round(self._duty.used,3)
+      stats["budget"] = round(self._duty.budget,3)
+    return stats
+
+  # --- ADR: QOS-level of the current slot   ---------------------------------
+
+  def adr_slot(self,now=None):
+    """ return (index of QOS-level,remaining time) of the current slot """
+
+    if now is None:
+      now = time.time()
+    slot = now // self._adr_slot
+    return (int(slot % len(self.adr)),
+            (slot+1)*self._adr_slot - now)
+
+  # --- ADR: listen on the QOS-level of the current slot (gateway)   ---------
+
+  def adr_listen(self):
+    """ configure QOS-level of the current slot, return remaining time """
+
+    index,remaining = self.adr_slot()
+    if index != self._adr_index:
+      self._adr_index = index
+      self._set_qos(*_LORA_QOS[self.adr[index]])
+    return remaining
+
+  # --- ADR: load history and select QOS-level (datalogger)   ----------------
+
+  def adr_load(self,state_file):
+    """ load SNR-history and QOS-level """
+
+    self._adr_file   = state_file
+    self._adr_active = True
+    try:
+      with open(state_file,"rt") as f:
+        values = f.readline().strip().split(',')
+      index = int(values[0])
+      if 0 <= index < len(self.adr):
+        self._adr_index = index
+        self._adr_snr   = [None if v == "-" else float(v) for v in values[1:]]
+    except:
+      pass
+    g_logger.print(f"LoRa: ADR: using QOS {self.adr[self._adr_index]}")
+    self._set_qos(*_LORA_QOS[self.adr[self._adr_index]])
+
+  # --- ADR: update history and step QOS-level (datalogger)   ----------------
+
+  def adr_update(self,ok):
+    """ add SNR of the last response (or failure) and step QOS-level """
+
+    self._adr_snr.append(self.rfm9x.last_snr if ok else None)
+    self._adr_snr = self._adr_snr[-_ADR_HISTORY:]
+
+    index = self._adr_index
+    if not ok:
+      # no response: one step more robust
+      index = min(index+1,len(self.adr)-1)
+    else:
+      # fastest level with enough margin, based on the worst recent SNR
+      recent = [snr for snr in self._adr_snr[-_ADR_MIN:] if snr is not None]
+      target = len(self.adr)-1
+      if recent:
+        snr = min(recent)
+        for i,qos in enumerate(self.adr):
+          if snr - _SNR_REQUIRED[_LORA_QOS[qos][0]] >= self._adr_margin:
+            target = i
+            break
+      if target > index:
+        index += 1
+      elif target < index and len(recent) >= _ADR_MIN:
+        index -= 1
+
+    if index != self._adr_index:
+      g_logger.print(f"LoRa: ADR: QOS {self.adr[self._adr_index]} -> " +
+                     f"{self.adr[index]}")
+      self._adr_index = index
+      self._adr_snr   = []                 # restart history at new level
+      self._set_qos(*_LORA_QOS[self.adr[index]])
+    try:
+      with open(self._adr_file,"wt") as f:
+        f.write(",".join([str(self._adr_index)] +
+                         ["-" if v is None else f"{v:.1f}"
+                          for v in self._adr_snr]) + "\n")
+    except:
+      pass
+
+  # --- ADR: duration of a transfer   ----------------------------------------
+
+  def _adr_duration(self,length,sf,cr,bw):
+    """ return duration of transmit and response of a packet """
+
+    de = _ldro(sf,cr,bw)
+    return (airtime(length+_HEADER_LEN,sf,cr,bw,8,de) + _ADR_TURN +
+            airtime(_ADR_ACK_LEN+_HEADER_LEN,sf,cr,bw,8,de))
+
+  # --- ADR: wait for a slot with the selected QOS-level (datalogger)   ------
+
+  def _adr_wait(self,duration):
+    """ wait until the current slot has the selected QOS-level and
+    enough time for a transfer of the given duration. Returns False if
+    the transfer does not fit into a slot within one schedule cycle.
+    """
+
+    if duration + 2*_ADR_GUARD > self._adr_slot:
+      g_logger.print(f"LoRa: ADR: transfer of {duration:0.1f}s does not " +
+                     "fit into a slot")
+      return False
+    for _ in range(len(self.adr)+1):
+      now = time.time()
+      index,remaining = self.adr_slot(now)
+      if (index == self._adr_index and
+          self._adr_slot-remaining >= _ADR_GUARD and
+          remaining >= duration+_ADR_GUARD):
+        return True
+      # wait until start of next slot (plus guard)
+      self.trace(f"LoRa: ADR: waiting {remaining+_ADR_GUARD:0.1f}s")
+      TimeSleep.light_sleep(duration=remaining+_ADR_GUARD)
+    g_logger.print("LoRa: ADR: no matching slot within one cycle")
+    return False
+
   # --- trace LoRa-events   --------------------------------------------------
 
   def trace(self,msg):
@@ -97,8 +429,10 @@ class LORA:
 
   # --- transmit command   ---------------------------------------------------
 
-  def transmit(self,data,msg_type=None,keep_listening=False):
-    """ send data """
+  def transmit(self,data,msg_type=None,keep_listening=False,urgent=True):
+    """ send data. Non-urgent transmissions are deferred or refused
+    if the duty-cycle budget is tight.
+    """
     if data is None or isinstance(data,str):
       if msg_type and data:
         payload = f"{msg_type},{data}"
@@ -110,14 +444,39 @@ class LORA:
     else:
       # binary data has no message-type
       payload = data
-    self.rfm9x.xmit_timeout = 2 + (len(payload)+4)/self._byte_rate
+    self.duty_refused = False
+    duration = self.airtime(len(payload))
+    self.rfm9x.xmit_timeout = 2 + duration
+    if self.adr and self._adr_active:
+      # datalogger: transmit and response must fit into the slot
+      slot_time = self._adr_duration(len(payload),
+                                     self.rfm9x.spreading_factor,
+                                     self.rfm9x.coding_rate,
+                                     self.rfm9x.signal_bandwidth)
+      if not self._adr_wait(slot_time):
+        return False
+
+    # check budget at the time of sending
+    if self._duty:
+      deferred = self._deferred
+      if not self._duty_check(duration,urgent):
+        self.duty_refused = True
+        return False
+      if self._deferred > deferred and self.adr and self._adr_active:
+        if not self._adr_wait(slot_time):    # slot might have passed
+          return False
     if self._trace:
       g_logger.print(f"LoRa: sending data: {payload}")
       g_logger.print(f"LoRa:   xmit_timeout: {self.rfm9x.xmit_timeout: 0.1f}")
       start = time.monotonic()
     rc = self.rfm9x.send(payload,keep_listening=keep_listening)
+    self._tx_count += 1
+    self._tx_time  += duration
+    if self._duty:
+      self._duty.add(duration,time.time())
     if self._trace:
       g_logger.print(f"LoRa:   elapsed: {time.monotonic()-start:0.3f}s")
+      g_logger.print(f"LoRa:   airtime: {duration:0.3f}s")
     return rc
 
   # --- receive command   ----------------------------------------------------
@@ -170,7 +529,7 @@ class LORA:
     start = time.monotonic()
     if self.transmit(
       f"{ts_str},{self._config.LOGGER_ID},{nr}", msg_type="B",
-      keep_listening=True):
+      keep_listening=True, urgent=False):
       duration = time.monotonic()-start
       g_logger.print(f"LoRa: broadcast: packet {nr}: transfer-time: {duration}s")
     else:
@@ -213,7 +572,7 @@ class LORA:
 
     content_length = len(data)
     g_logger.print(f"LoRa: sending S-msg, length: {content_length}")
-    if self.transmit(data, msg_type="S"):
+    if self.transmit(data, msg_type="S", urgent=False):
       resp = self.receive(keep_listening=False, decode=False)
       if resp[0] and int.from_bytes(resp[0]) == content_length:
         g_logger.print("LoRa: ... successful")
@@ -224,3 +583,43 @@ class LORA:
     else:
       g_logger.print(f"LoRa: ... transmit failed")
       return False
+
+  # --- send D-message   -----------------------------------------------------
+
+  def send_encoded(self, payload):
+    """ send an encoded record (see lora_codec.py) to the gateway.
+    Returns True (acknowledged), False (resync necessary) or None (no
+    response).
+    """
+
+    g_logger.print(f"LoRa: sending D-msg, length: {len(payload)}")
+    if not self.transmit(payload, urgent=False):
+      g_logger.print(f"LoRa: ... transmit failed")
+      return None
+    resp = self.receive(keep_listening=False, decode=False)[0]
+    if not resp:
+      g_logger.print(f"LoRa: ... receive failed")
+      return None
+    g_logger.print(f"LoRa: ... response: {resp[0]}")
+    return resp[0] == 1
+
+  # --- send M-message   -----------------------------------------------------
+
+  def send_multi(self, records):
+    """ send a multi-record packet to the gateway. Returns a list with
+    the acknowledge-status of every record or None if the gateway did not
+    answer.
+    """
+
+    g_logger.print(f"LoRa: sending M-msg, records: {len(records)}")
+    if not self.transmit("\n".join(records), msg_type="M", urgent=False):
+      g_logger.print(f"LoRa: ... transmit failed")
+      return None
+    resp = self.receive(keep_listening=False, decode=False)[0]
+    if not resp or resp[0] != len(records):
+      g_logger.print(f"LoRa: ... receive failed: response: {resp}")
+      return None
+    acked = [bool(resp[1+i//8] & (1 << (i%8))) if 1+i//8 < len(resp)
+             else False for i in range(len(records))]
+    g_logger.print(f"LoRa: ... acknowledged: {sum(acked)}")
+    return acked
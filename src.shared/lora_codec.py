@@ -0,0 +1,258 @@
+#-----------------------------------------------------------------------------
+# Compact binary encoding of csv-records for LoRa (LORA_CODEC = True).
+#
+# Format of an encoded record (D-message):
+#
+#   MAGIC (B), flags (B), dictionary-id (B),
+#   [static fields: length (B), "dcode,const1,..."]   (flag F_STATIC)
+#   timestamp:      epoch (I)                         (flag F_FULL_TS)
+#              or   low byte of base (B), delta (varint)
+#   number of packed fields (B)
+#   packed fields:  's':       length (B), utf-8
+#                   'i','1'-'3': zigzag-varint of value*10^decimals,
+#                                0 for missing values
+#                   'g':       float32
+#
+# Field types are derived from the dcode (see sensor_meta.get_types()).
+# Static fields (the values of the id- and dcode-sensors) are only sent
+# until the gateway acknowledged them, the gateway saves them per node in
+# a dictionary. The datalogger compares the static fields themselves
+# (not only the one-byte dictionary-id) with the acknowledged ones.
+# Timestamps are deltas to the last acknowledged record. The gateway
+# answers with a single byte: ACK (record accepted) or RESYNC (unknown
+# dictionary, unknown or ambiguous base, resend with static fields and
+# full timestamp).
+#
+# The first byte of an encoded record is not valid utf-8, so old gateways
+# just drop these messages.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import time
+import struct
+from sensor_meta import SENSOR_MAP, get_types
+
+MAGIC     = 0xFE
+F_STATIC  = 0x01
+F_FULL_TS = 0x02
+ACK       = 1
+RESYNC    = 0
+N_BASE    = 4          # number of timestamps the decoder keeps per node
+
+# --- helper   ---------------------------------------------------------------
+
+def _put_varint(buffer,value):
+  """ append zigzag-varint """
+  value = (value << 1) ^ (value >> 63)
+  while value > 0x7F:
+    buffer.append((value & 0x7F) | 0x80)
+    value >>= 7
+  buffer.append(value)
+
+def _get_varint(data,pos):
+  """ read zigzag-varint, return (value,pos) """
+  value = 0
+  shift = 0
+  while True:
+    b = data[pos]
+    pos += 1
+    value |= (b & 0x7F) << shift
+    if not b & 0x80:
+      break
+    shift += 7
+  return (value >> 1) ^ -(value & 1),pos
+
+def _dict_id(static):
+  """ one-byte hash of the static fields """
+  h = 0
+  for b in static.encode('utf-8'):
+    h = (h*31 + b) & 0xFF
+  return h
+
+def _epoch(ts):
+  """ convert timestamp-string to seconds since 1970 """
+  return int(time.mktime((int(ts[0:4]),int(ts[5:7]),int(ts[8:10]),
+                      int(ts[11:13]),int(ts[14:16]),int(ts[17:19]),
+                      0,-1,-1)))
+
+def _fixed(value,decimals):
+  """ format fixed-point integer without float arithmetic """
+  if not decimals:
+    return str(value)
+  sign = "-" if value < 0 else ""
+  value = abs(value)
+  scale = 10**decimals
+  return f"{sign}{value//scale}.{value%scale:0{decimals}d}"
+
+# --- class Encoder   --------------------------------------------------------
+
+class Encoder:
+  """ encode csv-records (datalogger) """
+
+  def __init__(self,config,state_file=None):
+    """ constructor """
+
+    self._dcode = ""
+    for sensor in config.SENSORS.split(' '):
+      self._dcode += SENSOR_MAP[sensor.split('(')[0]]
+    self._state_file = state_file
+    self._dict_id = None         # acknowledged dictionary
+    self._static  = None         # acknowledged static fields
+    self._base    = None         # acknowledged timestamp
+    if state_file:
+      try:
+        with open(state_file,"rt") as f:
+          dict_id,base,static = f.readline().rstrip('\n').split(',',2)
+          self._dict_id = int(dict_id)
+          self._base    = int(base)
+          self._static  = static
+      except:
+        pass
+
+  # --- encode a record   ----------------------------------------------------
+
+  def encode(self,record,full=False):
+    """ encode record, with static fields and full timestamp if
+    necessary. Returns (payload,(dict_id,ts,static))
+    """
+
+    fields = record.split(',')
+    ts = _epoch(fields.pop(0))
+    types = get_types(self._dcode,len(fields),static=True)
+    static = ",".join([self._dcode] +
+                      [v for t,v in zip(types,fields) if t == 'c'])
+    dict_id = _dict_id(static)
+    key = (dict_id,ts,static)
+
+    flags = 0
+    if full or dict_id != self._dict_id or static != self._static:
+      flags |= F_STATIC
+    if full or self._base is None:
+      flags |= F_FULL_TS
+    buffer = bytearray([MAGIC,flags,dict_id])
+    if flags & F_STATIC:
+      static = static.encode('utf-8')
+      buffer.append(len(static))
+      buffer.extend(static)
+    if flags & F_FULL_TS:
+      buffer.extend(struct.pack("<I",ts))
+    else:
+      buffer.append(self._base & 0xFF)
+      _put_varint(buffer,ts-self._base)
+
+    buffer.append(len(fields)-types.count('c'))
+    for t,value in zip(types,fields):
+      if t == 'c':
+        continue
+      elif t == 's':
+        value = value.encode('utf-8')[:255]
+        buffer.append(len(value))
+        buffer.extend(value)
+      elif t == 'g':
+        try:
+          buffer.extend(struct.pack("<f",float(value)))
+        except ValueError:
+          buffer.extend(struct.pack("<f",float('nan')))
+      else:
+        try:
+          value = round(float(value)*(1 if t == 'i' else 10**int(t)))
+          _put_varint(buffer,value+1 if value >= 0 else value)
+        except (ValueError,OverflowError):
+          buffer.append(0)
+    return bytes(buffer),key
+
+  # --- update state after response of gateway   -----------------------------
+
+  def update(self,key,rc):
+    """ update state: rc is True (acknowledged) or False (resync) """
+
+    if rc:
+      self._dict_id,self._base,self._static = key
+    else:
+      self._dict_id,self._base,self._static = None,None,None
+    if self._state_file:
+      try:
+        with open(self._state_file,"wt") as f:
+          f.write(f"{self._dict_id},{self._base},{self._static}\n"
+                  if rc else "\n")
+      except:
+        pass
+
+# --- class Decoder   --------------------------------------------------------
+
+class Decoder:
+  """ decode encoded records (gateway) """
+
+  def __init__(self):
+    """ constructor """
+    self._nodes = {}             # node -> (dictionary,timestamps)
+
+  # --- decode a record   ----------------------------------------------------
+
+  def decode(self,node,data):
+    """ decode record, returns csv-record or None (resync necessary) """
+
+    if data[0] != MAGIC:
+      return None
+    if node not in self._nodes:
+      self._nodes[node] = ({},[])
+    dictionary,timestamps = self._nodes[node]
+    flags   = data[1]
+    dict_id = data[2]
+    pos     = 3
+
+    if flags & F_STATIC:
+      n = data[pos]
+      dictionary[dict_id] = str(data[pos+1:pos+1+n],'utf-8').split(',')
+      pos += 1+n
+    if dict_id not in dictionary:
+      return None
+    dcode,*consts = dictionary[dict_id]
+
+    if flags & F_FULL_TS:
+      # the datalogger has no base: older timestamps are obsolete
+      ts = struct.unpack_from("<I",data,pos)[0]
+      pos += 4
+      timestamps.clear()
+    else:
+      check = data[pos]
+      base = [t for t in timestamps if t & 0xFF == check]
+      if len(base) != 1:
+        return None                       # unknown or ambiguous base
+      delta,pos = _get_varint(data,pos+1)
+      ts = base[0] + delta
+
+    n = data[pos]
+    pos += 1
+    types = get_types(dcode,n+len(consts),static=True)
+    consts = iter(consts)
+    t = time.localtime(ts)
+    fields = [f"{t[0]}-{t[1]:02d}-{t[2]:02d}T{t[3]:02d}:{t[4]:02d}:{t[5]:02d}"]
+    for ftype in types:
+      if ftype == 'c':
+        fields.append(next(consts))
+      elif ftype == 's':
+        n = data[pos]
+        fields.append(str(data[pos+1:pos+1+n],'utf-8'))
+        pos += 1+n
+      elif ftype == 'g':
+        value = struct.unpack_from("<f",data,pos)[0]
+        fields.append("" if value != value else f"{value:.6g}")
+        pos += 4
+      else:
+        value,pos = _get_varint(data,pos)
+        if value == 0:
+          fields.append("")
+        else:
+          value = value-1 if value > 0 else value
+          fields.append(_fixed(value,0 if ftype == 'i' else int(ftype)))
+
+    if ts in timestamps:
+      timestamps.remove(ts)
+    timestamps.append(ts)
+    if len(timestamps) > N_BASE:
+      timestamps.pop(0)
+    return ",".join(fields)
@@ -40,40 +40,53 @@ SENSOR_MAP = {
   "tm_power": "P",
   }
 
-# --- mapping of DCODE to sensor properties: dcode -> (sensor,fields)   ------
+# --- mapping of DCODE to sensor properties   --------------------------------
+#     dcode -> (sensor,fields,types)
 
 # A (single) sensor with a variable field count must be last in the
 # SENSORS definition
+#
+# types: one character per field
+#   s:     string
+#   i:     integer
+#   1-3:   float with the given number of decimals
 
 DCODE_MAP = {
-  "0": ("id",1),
-  "1": ("dcode",1),
-  "2": ("battery",1),
-  "3": ("aht20",2),
-  "4": ("am2320",2),
-  "5": ("bh1750",1),
-  "6": ("bme280",4),
-  "7": ("bmp280",3),
-  "8": ("ds18b20",1),    # variable, 1-n
-  "9": ("ens160",4),     # has more fields in test-mode
-  "A": ("htu31d",2),
-  "B": ("ltr559",1),
-  "C": ("mcp9808",1),
-  "D": ("pdm",1),
-  "E": ("pms5003",9),
-  "F": ("scd40",3),      # has more fields in test-mode
-  "G": ("scd41",3),      # has more fields in test-mode
-  "H": ("sht45",2),
-  "I": ("meteo",7),
-  "J": ("location",1),
-  "K": ("cputemp",1),
-  "L": ("mhz19",2),
-  "M": ("hdc302x",2),
-  "N": ("sen6x",13),
-  "O": ("lm66200",1),
-  "P": ("tm_power",3),    # variable, 3-n*3
+  "0": ("id",1,"s"),
+  "1": ("dcode",1,"s"),
+  "2": ("battery",1,"2"),
+  "3": ("aht20",2,"1i"),
+  "4": ("am2320",2,"1i"),
+  "5": ("bh1750",1,"i"),
+  "6": ("bme280",4,"1iii"),
+  "7": ("bmp280",3,"1ii"),
+  "8": ("ds18b20",1,"1"),     # variable, 1-n
+  "9": ("ens160",4,"iiii"),   # has more fields in test-mode
+  "A": ("htu31d",2,"1i"),
+  "B": ("ltr559",1,"i"),
+  "C": ("mcp9808",1,"1"),
+  "D": ("pdm",1,"i"),
+  "E": ("pms5003",9,"iii111111"),
+  "F": ("scd40",3,"i1i"),     # has more fields in test-mode
+  "G": ("scd41",3,"i1i"),     # has more fields in test-mode
+  "H": ("sht45",2,"1i"),
+  "I": ("meteo",7,"1iii1i1"),
+  "J": ("location",1,"s"),
+  "K": ("cputemp",1,"1"),
+  "L": ("mhz19",2,"i1"),
+  "M": ("hdc302x",2,"1i"),
+  "N": ("sen6x",13,"i1iiiiiii1111"),
+  "O": ("lm66200",1,"s"),
+  "P": ("tm_power",3,"1i3"),  # variable, 3-n*3
   }
 
+# sensors with a variable number of (repeating) fields
+VARIABLE_SENSORS = ["ds18b20","tm_power"]
+
+# --- converters for field types   -------------------------------------------
+
+_CONVERTERS = {"s": str, "i": int, "1": float, "2": float, "3": float}
+
 # --- convert string data to str/float/int   ---------------------------------
 
 def _convert_data(data):
@@ -100,10 +113,11 @@ def split_csv(record, dcode_index=2):
   result = []
   index = 1
   id = None
-  for dc in fields[dcode_index]:
+  last = len(fields[dcode_index])-1
+  for i,dc in enumerate(fields[dcode_index]):
     item = {}
     item["sensor"] = DCODE_MAP[dc][0]
-    if dc == fields[dcode_index][-1]:
+    if i == last:
       # last sensor, consume all remaining fields
       item["data"] = fields[index:]
     else:
@@ -121,3 +135,122 @@ def split_csv(record, dcode_index=2):
     index += DCODE_MAP[dc][1]
 
   return {"ts": ts,"id": id, "record:": result}
+
+# --- compile dcode to a layout (memoized)   ---------------------------------
+
+_MAX_LAYOUTS = 64
+_LAYOUTS = {}
+
+def compile_layout(dcode):
+  """ Compile dcode to a layout: (id_index,plan). The plan is a tuple
+  of (sensor,start,end,converters) for every sensor (without id and dcode).
+  end is None for the last sensor (consumes all remaining fields).
+  Layouts are cached, so repeated calls for the same dcode are cheap.
+  """
+
+  layout = _LAYOUTS.get(dcode)
+  if layout:
+    return layout
+
+  id_index = None
+  plan = []
+  index = 1
+  last = len(dcode)-1
+  for i,dc in enumerate(dcode):
+    sensor, count, types = DCODE_MAP[dc]
+    if sensor == 'id':
+      id_index = index
+    elif sensor != 'dcode':
+      converters = tuple([_CONVERTERS[t] for t in types])
+      plan.append((sensor,index,None if i == last else index+count,
+                   converters))
+    index += count
+
+  layout = (id_index,tuple(plan))
+  if len(_LAYOUTS) >= _MAX_LAYOUTS:
+    _LAYOUTS.clear()
+  _LAYOUTS[dcode] = layout
+  return layout
+
+# --- field types of a record   ----------------------------------------------
+
+def get_types(dcode, n_fields, static=False):
+  """ return the types of all fields of a record (without timestamp).
+  The last sensor consumes all remaining fields: its types are repeated
+  for sensors with a variable field count, otherwise extra fields
+  (test-mode) have type 'g' (float without fixed number of decimals).
+  With static=True, the fields of id and dcode have type 'c' (constant).
+  """
+
+  types = ""
+  last = len(dcode)-1
+  for i,dc in enumerate(dcode):
+    sensor, count, ftypes = DCODE_MAP[dc]
+    if static and sensor in ["id","dcode"]:
+      ftypes = count*"c"
+    if i == last:
+      count = n_fields - len(types)
+      if count != len(ftypes):
+        if sensor in VARIABLE_SENSORS:
+          ftypes = (count*ftypes)[:count]
+        else:
+          ftypes = (ftypes + count*"g")[:count]
+    types += ftypes
+  return types
+
+# --- split csv record using the compiled layout   ---------------------------
+
+def split_csv_fast(record, dcode_index=2):
+  """ split record according to the compiled layout of the dcode.
+  The result is identical to split_csv(), but values are converted
+  according to the field types of the sensor.
+  """
+
+  fields = record.split(',')
+  id_index, plan = compile_layout(fields[dcode_index])
+  result = []
+  for sensor, start, end, converters in plan:
+    data = fields[start:end]
+    if len(data) == len(converters):
+      try:
+        data = [conv(value) for conv,value in zip(converters,data)]
+      except ValueError:
+        data = _convert_data(data)
+    else:
+      # variable field count or test-mode: no type information
+      data = _convert_data(data)
+    result.append({"sensor": sensor, "data": data})
+
+  return {"ts": fields[0],
+          "id": fields[id_index] if id_index else None,
+          "record:": result}
+
+# --- iterate over records of a file   ---------------------------------------
+
+def iter_records(fileobj, dcode_index=2, strict=False):
+  """ Parse records of an open file (or any iterable of lines) lazily.
+  Empty lines and header lines (starting with #) are skipped. Invalid
+  records are skipped unless strict is True.
+  """
+
+  for line in fileobj:
+    if not line or line[0] == "#":
+      continue
+    line = line.rstrip('\r\n')
+    if not line:
+      continue
+    try:
+      yield split_csv_fast(line, dcode_index)
+    except (KeyError, IndexError):
+      if strict:
+        raise
+
+# --- iterate over records of multiple files   -------------------------------
+
+def iter_files(paths, dcode_index=2, strict=False):
+  """ Parse records of all files lazily (one file open at a time) """
+
+  for path in paths:
+    with open(path, "rt") as fileobj:
+      for record in iter_records(fileobj, dcode_index, strict):
+        yield record
@@ -48,11 +48,21 @@ class Settings:
     # various
     self.CSV_FILENAME        = "/sd/log_{ID}_{YMD}.csv"
     self.CSV_HEADER_EXTENDED = False
+    self.CSV_FORMAT          = "csv"  # csv or bin (binary log-file)
+    self.CSV_STAGING         = 0      # number of staged records (0: off)
+    self.CSV_STAGING_VBAT    = 3.2    # flush staged records below this voltage
     self.SENSORS_CSV_ONLY    = ""
+    self.SENSORS_CONCURRENT  = False  # read sensors concurrently
+    self.SENSORS_CACHE       = None   # discovery-cache, e.g. /saves/sensors.json
     self.SHOW_UNITS          = True   # show units in dump_data
     self.SIMPLE_UI           = False  # use tabular UI
     self.FONT_DISPLAY        = 'DejaVuSansMono-Bold-18-subset'
 
+    # timing telemetry
+    self.TIMINGS_FILE    = None   # binary ring-file, e.g. /sd/timings.bin
+    self.TIMINGS_RECORDS = 512    # number of records in the ring-file
+    self.TIMINGS_CSV     = None   # csv-file, e.g. /sd/timings_{ID}_{YMD}.csv
+
     # update configuration variables from imported config.py
     for var in dir(config):
       if var[0] != '_':
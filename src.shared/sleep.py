@@ -93,3 +93,16 @@ class TimeSleep:
 
     TimeSleep._sleep_impl(duration=duration,until=ep_alarm,
                       sleep_func=alarm.exit_and_deep_sleep_until_alarms)
+
+  # --- run generator with sleeps   -------------------------------------------
+
+  @classmethod
+  def run_steps(cls,steps):
+    """ sleep through all steps of a generator (yielding durations) and
+    return the value returned by the generator """
+
+    try:
+      while True:
+        TimeSleep.light_sleep(duration=next(steps))
+    except StopIteration as ex:
+      return ex.args[0] if ex.args else None
@@ -0,0 +1,150 @@
+#-----------------------------------------------------------------------------
+# Persistent timing telemetry.
+#
+# This module saves the durations of the phases of a wake-cycle (as
+# recorded in g_ts of the datacollector) to a binary ring-file with a
+# fixed number of records. The file is self-describing: a header, a
+# table of labels and the records:
+#
+#   header:  magic "DLTM", version (B), number of labels (B),
+#            capacity (H), next sequence number (I)
+#   labels:  LABEL_AREA bytes, labels separated by "\n"
+#   records: capacity x (seq (I), ts (I), total ms (I), n (B),
+#                        MAX_ENTRIES x (label-index (B), duration ms (I)))
+#
+# All values are little-endian. The header is updated after the record
+# is written, so a record is only valid if its sequence number is
+# smaller than the sequence number in the header.
+#
+# Timings can also be appended as a separate timing-record to a csv-file:
+#
+#   ts,ID,total,label=duration,...
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import struct
+
+MAGIC       = b"DLTM"
+VERSION     = 1
+LABEL_AREA  = 256
+MAX_ENTRIES = 24
+HDR_FMT     = "<4sBBHI"
+REC_FMT     = "<IIIB" + MAX_ENTRIES*"BI"
+HDR_SIZE    = struct.calcsize(HDR_FMT)
+REC_SIZE    = struct.calcsize(REC_FMT)
+
+# --- class TimingLog   ------------------------------------------------------
+
+class TimingLog:
+  """ ring-file with timing records """
+
+  def __init__(self,filename,capacity=512):
+    """ constructor """
+    self._filename = filename
+    self._capacity = capacity
+
+  # --- create new file   ----------------------------------------------------
+
+  def _create(self):
+    """ create file with empty label-table and empty records """
+
+    with open(self._filename,"wb") as f:
+      f.write(struct.pack(HDR_FMT,MAGIC,VERSION,0,self._capacity,0))
+      f.write(bytes(LABEL_AREA))
+      empty = bytes(REC_SIZE)
+      for _ in range(self._capacity):
+        f.write(empty)
+
+  # --- read header and labels   ---------------------------------------------
+
+  def _read_header(self,f):
+    """ read header and labels. Returns False if the file is invalid """
+
+    f.seek(0)
+    hdr = f.read(HDR_SIZE+LABEL_AREA)
+    if len(hdr) < HDR_SIZE+LABEL_AREA:
+      return False
+    magic,version,n_labels,capacity,seq = struct.unpack_from(HDR_FMT,hdr)
+    if magic != MAGIC or version != VERSION:
+      return False
+    self._capacity = capacity
+    self._seq      = seq
+    labels = str(hdr[HDR_SIZE:],'utf-8').rstrip('\x00').split("\n")
+    self._labels   = labels[:n_labels]
+    return True
+
+  # --- open (and create) file   --------------------------------------------
+
+  def _open(self):
+    """ open file and read header, (re-)create invalid files """
+
+    try:
+      f = open(self._filename,"r+b")
+      if self._read_header(f):
+        return f
+      f.close()
+    except OSError:
+      pass
+    self._create()
+    f = open(self._filename,"r+b")
+    self._read_header(f)
+    return f
+
+  # --- map label to index   -------------------------------------------------
+
+  def _label_index(self,label):
+    """ return index of label, add label if necessary """
+
+    try:
+      return self._labels.index(label)
+    except ValueError:
+      pass
+    if len(self._labels) >= 255:
+      return 255
+    if len("\n".join(self._labels+[label]).encode('utf-8')) > LABEL_AREA:
+      return 255
+    self._labels.append(label)
+    self._labels_changed = True
+    return len(self._labels)-1
+
+  # --- add timing record   --------------------------------------------------
+
+  def add(self,ts,total,entries):
+    """ add a record. ts is the epoch-time of the measurement, total the
+    duration of the wake-cycle, entries a list of (label,duration).
+    Durations are in seconds.
+    """
+
+    with self._open() as f:
+      self._labels_changed = False
+      values = []
+      for label,duration in entries[:MAX_ENTRIES]:
+        values.append(self._label_index(label))
+        values.append(int(duration*1000))
+      n = len(values)//2
+      values.extend((MAX_ENTRIES-n)*[0,0])
+
+      # write record first, then labels and header
+      f.seek(HDR_SIZE+LABEL_AREA+(self._seq % self._capacity)*REC_SIZE)
+      f.write(struct.pack(REC_FMT,self._seq,int(ts),int(total*1000),n,
+                          *values))
+      if self._labels_changed:
+        f.seek(HDR_SIZE)
+        f.write("\n".join(self._labels).encode('utf-8'))
+      f.seek(0)
+      f.write(struct.pack(HDR_FMT,MAGIC,VERSION,len(self._labels),
+                          self._capacity,self._seq+1))
+
+# --- append timing record to csv-file   -------------------------------------
+
+def save_csv(filename,ts_str,logger_id,total,entries):
+  """ append timing record to csv-file """
+
+  with open(filename,"a") as f:
+    f.write(f"{ts_str},{logger_id},{total:.3f}")
+    for label,duration in entries:
+      f.write(f",{label}={duration:.3f}")
+    f.write("\n")
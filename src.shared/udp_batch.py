@@ -0,0 +1,87 @@
+#-----------------------------------------------------------------------------
+# Pack records into UDP-datagrams.
+#
+# Records are collected as newline-separated lines into a single datagram
+# up to a maximal payload size. Records that don't fit are sent with the
+# next datagram, records longer than the payload size are sent alone.
+# If sending fails, the pending records are kept and sent with the next
+# flush. After MAX_FAILED failed sends in a row, the pending records are
+# dropped, so a broken link does not block the batch forever.
+#
+# Usage:
+#
+#   batch = UDPBatch(wifi,host,port)
+#   batch.add(record)        # sends a datagram if the payload is full
+#   if batch.age() > 2:
+#     batch.flush()          # send pending records
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import time
+
+MAX_PAYLOAD = 1400       # fits into a single ethernet/wifi frame
+MAX_FAILED  = 3          # failed sends before pending records are dropped
+
+# --- class UDPBatch   -------------------------------------------------------
+
+class UDPBatch:
+  """ collect records and send them with a minimal number of datagrams """
+
+  def __init__(self,wifi,host,port,max_payload=MAX_PAYLOAD):
+    """ constructor """
+
+    self._wifi        = wifi
+    self._host        = host
+    self._port        = port
+    self._max_payload = max_payload
+    self._buffer      = bytearray()
+    self._since       = 0            # time of first pending record
+    self._failed      = 0            # failed sends of pending records
+
+  # --- add record   ---------------------------------------------------------
+
+  def add(self,record):
+    """ add a record, send the pending datagram if it is full. If this
+    send fails, the exception is passed on and the record is not added.
+    """
+
+    line = bytes(record+'\n',"UTF-8")
+    if len(self._buffer) + len(line) > self._max_payload:
+      self.flush()
+    if not self._buffer:
+      self._since = time.monotonic()
+    self._buffer.extend(line)
+
+  # --- check for pending records   ------------------------------------------
+
+  def empty(self):
+    """ return True if there are no pending records """
+    return not self._buffer
+
+  # --- age of pending records   ---------------------------------------------
+
+  def age(self):
+    """ return age of the oldest pending record in seconds """
+    return time.monotonic() - self._since if self._buffer else 0
+
+  # --- send pending records   -----------------------------------------------
+
+  def flush(self):
+    """ send pending records. Records are only removed after a
+    successful send (or after MAX_FAILED failed sends) """
+
+    if not self._buffer:
+      return
+    try:
+      self._wifi.sendto(bytes(self._buffer),self._host,self._port)
+    except:
+      self._failed += 1
+      if self._failed >= MAX_FAILED:
+        self._buffer = bytearray()         # drop records deliberately
+        self._failed = 0
+      raise
+    self._buffer = bytearray()
+    self._failed = 0
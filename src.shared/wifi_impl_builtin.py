@@ -55,6 +55,7 @@ class WifiImpl:
     if self._radio.connected and self._pool:
       return
     else:
+      self._close_socket()
       self._pool = None
       self._requests = None
 
@@ -106,12 +107,31 @@ class WifiImpl:
   # --- execute sendto-command   --------------------------------------------
 
   def sendto(self,data,udp_ip,udp_port):
-    """ send to given destination """
+    """ send to given destination, reuse the UDP-socket """
     self.connect()
     self.logger.print(f"wifi: send to {udp_ip}:{udp_port}")
-    with self._pool.socket(family=socketpool.SocketPool.AF_INET,
-                           type=socketpool.SocketPool.SOCK_DGRAM) as socket:
-      socket.sendto(data,(udp_ip,udp_port))
+    if self._socket:
+      try:
+        self._socket.sendto(data,(udp_ip,udp_port))
+        return
+      except:
+        self._close_socket()
+
+    # (re-) create socket
+    self._socket = self._pool.socket(family=socketpool.SocketPool.AF_INET,
+                                     type=socketpool.SocketPool.SOCK_DGRAM)
+    self._socket.sendto(data,(udp_ip,udp_port))
+
+  # --- close cached UDP-socket   -------------------------------------------
+
+  def _close_socket(self):
+    """ close cached UDP-socket """
+    if self._socket:
+      try:
+        self._socket.close()
+      except:
+        pass
+      self._socket = None
 
   # --- execute send-command   ----------------------------------------------
 
@@ -145,6 +165,7 @@ class WifiImpl:
   def deep_sleep(self):
     """ disable radio """
 
+    self._close_socket()
     try:                                       # wifi might not be imported
       self._radio.enabled = False
     except:
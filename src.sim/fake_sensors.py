@@ -0,0 +1,172 @@
+#-----------------------------------------------------------------------------
+# Pluggable fake sensors for the host simulation.
+#
+# Most sensor wrappers in src/sensors need device-drivers that only exist
+# for CircuitPython. For these sensors, a fake wrapper class is created
+# and installed as module "sensors.<name>". Field types and default
+# values are derived from sensor_meta.DCODE_MAP, timings from PROFILES.
+#
+# Custom fakes are registered with
+#
+#   fake_sensors.register("aht20",bus=0,addr=0x38,read_time=0.02)
+#   fake_sensors.register("mysensor",cls=MyFakeSensor)
+#
+# Pseudo-sensors that work with the CircuitPython shims (REAL_SENSORS)
+# use the original wrappers.
+#
+# Like the wrappers of SCD4X and SEN6X, fake sensors with multiple
+# samples implement read_steps() for concurrent reads.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import sys
+import types
+
+import sensor_meta
+import simclock
+from sleep import TimeSleep
+import simhw
+
+REAL_SENSORS = ["id", "dcode", "battery", "cputemp", "lm66200", "location"]
+
+# default i2c-addresses
+ADDRESSES = {
+  "aht20": 0x38, "am2320": 0x5c, "bh1750": 0x23, "bme280": 0x77,
+  "bmp280": 0x77, "ens160": 0x53, "hdc302x": 0x44, "htu31d": 0x40,
+  "ltr559": 0x23, "mcp9808": 0x18, "scd40": 0x62, "scd41": 0x62,
+  "sen6x": 0x6b, "sht45": 0x44,
+  }
+
+# timing profiles: (init_time, read_time, samples, interval) in seconds.
+# read_time is the time for a single sample, samples and interval model
+# the multi-sample loops of the real wrappers.
+PROFILES = {
+  "pms5003": (30, 1.0,  1, 0),
+  "sen6x":   (30, 0.05, 2, 5),
+  "scd40":   (5,  0.05, 2, 5),
+  "scd41":   (5,  0.05, 2, 5),
+  "ens160":  (0,  0.05, 2, 5),
+  "mhz19":   (0,  0.5,  1, 0),
+  "ds18b20": (0,  0.75, 1, 0),
+  }
+DEFAULT_PROFILE = (0, 0.01, 1, 0)
+
+# value ranges per field type
+RANGES = {"i": (0,1000), "1": (0.0,40.0), "2": (3.0,4.2), "3": (0.0,1.0)}
+
+# --- base class of fake sensors   -------------------------------------------
+
+class FakeSensor:
+  """ generic fake sensor. Subclasses set the class attributes below """
+
+  NAME      = "fake"
+  TYPES     = "1"
+  ADDR      = 0x50
+  INIT_TIME = 0
+  READ_TIME = 0.01
+  SAMPLES   = 1
+  INTERVAL  = 0
+
+  def __init__(self,config,i2c,addr=None,spi=None):
+    """ constructor: probe busses like the real wrappers """
+    self.ignore    = False
+    self.formats   = []
+    self.init_time = self.INIT_TIME
+    self.headers   = ",".join(
+      [f"{self.NAME}_{i}" for i in range(len(self.TYPES))])
+
+    addr = addr or self.ADDR
+    self.bus_nr = None
+    for nr,bus in enumerate(i2c):
+      if not bus:
+        continue
+      try:
+        bus.probe(addr)
+        self.bus_nr = nr
+        break
+      except OSError:
+        pass
+    if self.bus_nr is None:
+      raise Exception(f"no {self.NAME} detected. Check config/cabling!")
+
+  def _value(self,ftype):
+    """ create a random value for the given field-type """
+    if ftype == 's':
+      return "X"
+    low,high = RANGES.get(ftype,RANGES["1"])
+    if ftype == 'i':
+      return simhw.g_random.randint(low,high)
+    return round(simhw.g_random.uniform(low,high),int(ftype))
+
+  def read(self,data,values):
+    """ read sensor """
+    return TimeSleep.run_steps(self.read_steps(data,values))
+
+  def read_steps(self,data,values):
+    """ read sensor: advance the clock by the read-time for every sample
+    and yield the interval between samples """
+    for i in range(self.SAMPLES):
+      start = simclock.g_clock.monotonic()
+      simclock.g_clock.advance(self.READ_TIME)
+      if i < self.SAMPLES-1:
+        yield max(0,self.INTERVAL-(simclock.g_clock.monotonic()-start))
+    result = [self._value(ftype) for ftype in self.TYPES]
+    data[self.NAME] = result
+    return ",".join([str(v) for v in result])
+
+# --- register fake sensors   ------------------------------------------------
+
+def _lookup_types(name):
+  """ return field types from sensor metadata """
+  for sensor,_,ftypes in sensor_meta.DCODE_MAP.values():
+    if sensor == name:
+      return ftypes
+  return FakeSensor.TYPES
+
+def register(name,cls=None,bus=1,addr=None,init_time=None,read_time=None,
+             ftypes=None):
+  """ register a fake sensor class as module sensors.<name>. Without
+  cls, a subclass of FakeSensor is created. The device is connected to
+  the given bus (None: don't connect).
+  """
+
+  if not cls:
+    init_def,read_def,samples,interval = PROFILES.get(name,DEFAULT_PROFILE)
+    cls = type(name.upper(),(FakeSensor,),{
+      "NAME":      name,
+      "TYPES":     ftypes or _lookup_types(name),
+      "ADDR":      addr or ADDRESSES.get(name,FakeSensor.ADDR),
+      "INIT_TIME": init_def if init_time is None else init_time,
+      "READ_TIME": read_def if read_time is None else read_time,
+      "SAMPLES":   samples,
+      "INTERVAL":  interval,
+      })
+  module = types.ModuleType(f"sensors.{name}")
+  setattr(module,name.upper(),cls)
+  sys.modules[f"sensors.{name}"] = module
+  if bus is not None:
+    simhw.add_device(bus,addr or getattr(cls,"ADDR",FakeSensor.ADDR))
+  return cls
+
+def register_defaults(sensors):
+  """ register fakes for all sensors of a SENSORS-specification that
+  are not yet registered and not in REAL_SENSORS """
+
+  for spec in sensors.split():
+    spec = spec.split('(')
+    name = spec[0]
+    if name in REAL_SENSORS or f"sensors.{name}" in sys.modules:
+      continue
+    # honor (addr), (bus), (addr,bus) or (bus,addr)
+    bus  = 1
+    addr = None
+    if len(spec) > 1:
+      for para in spec[1].rstrip(')').split(','):
+        if 'X' in para.upper():
+          addr = int(para,16)
+        else:
+          bus = int(para)
+    register(name,bus=bus,addr=addr)
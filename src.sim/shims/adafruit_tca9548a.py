@@ -0,0 +1,31 @@
+#-----------------------------------------------------------------------------
+# Shim for the TCA9548A/PCA9546A I2C-multiplexer library. Every channel
+# is a separate simulated I2C-bus with the next free bus-number.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import busio
+import simhw
+
+class TCA9548A:
+  CHANNELS = 8
+
+  def __init__(self,i2c,address=0x70):
+    simhw.probe(i2c.nr,address)
+    self._channels = [busio.I2C(nr=simhw.next_mux_bus())
+                      for _ in range(self.CHANNELS)]
+
+  def __len__(self):
+    return len(self._channels)
+
+  def __getitem__(self,key):
+    return self._channels[key]
+
+  def __iter__(self):
+    return iter(self._channels)
+
+class PCA9546A(TCA9548A):
+  CHANNELS = 4
@@ -0,0 +1,33 @@
+#-----------------------------------------------------------------------------
+# Shim for the CircuitPython alarm-module.
+#
+# Light-sleep advances the virtual clock to the alarm. Deep-sleep
+# advances the clock and raises simhw.DeepSleep, which ends the
+# simulated wake-cycle.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import simclock
+import simhw
+from alarm import time
+
+sleep_memory = simhw.g_sleep_mem
+wake_alarm   = None
+
+def _sleep_until(alarms):
+  global wake_alarm
+  first = min(alarms,key=lambda a: a.monotonic_time)
+  simclock.g_clock.advance_to(monotonic=first.monotonic_time)
+  wake_alarm = first
+  return first
+
+def light_sleep_until_alarms(*alarms):
+  return _sleep_until(alarms)
+
+def exit_and_deep_sleep_until_alarms(*alarms,preserve_dios=()):
+  _sleep_until(alarms)
+  simhw.g_stats["deep_sleeps"] += 1
+  raise simhw.DeepSleep()
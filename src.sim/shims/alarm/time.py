@@ -0,0 +1,20 @@
+#-----------------------------------------------------------------------------
+# Shim for alarm.time.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import simclock
+
+class TimeAlarm:
+  def __init__(self,*,monotonic_time=None,epoch_time=None):
+    clock = simclock.g_clock
+    if epoch_time is not None:
+      monotonic_time = clock.monotonic() + (epoch_time - clock.time())
+    if monotonic_time is None:
+      raise ValueError("monotonic_time or epoch_time required")
+    if monotonic_time <= clock.monotonic():
+      raise ValueError("Time alarm time is in the past")
+    self.monotonic_time = monotonic_time
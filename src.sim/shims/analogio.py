@@ -0,0 +1,23 @@
+#-----------------------------------------------------------------------------
+# Shim for the CircuitPython analogio-module. Values are taken from
+# simhw.g_analog (keyed by pin-name).
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import simhw
+
+class AnalogIn:
+  reference_voltage = 3.3
+
+  def __init__(self,pin):
+    self._pin = str(pin)
+
+  @property
+  def value(self):
+    return simhw.g_analog.get(self._pin,simhw.ANALOG_DEFAULT)
+
+  def deinit(self):
+    pass
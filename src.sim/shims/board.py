@@ -0,0 +1,29 @@
+#-----------------------------------------------------------------------------
+# Shim for the CircuitPython board-module: every attribute is a pin.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+board_id = "simulator"
+
+class Pin:
+  """ named pin """
+  def __init__(self,name):
+    self.name = name
+  def __str__(self):
+    return self.name
+  def __repr__(self):
+    return f"board.{self.name}"
+
+_pins = {}
+
+def __getattr__(name):
+  if name.startswith('__'):
+    raise AttributeError(name)
+  pin = _pins.get(name)
+  if not pin:
+    pin = Pin(name)
+    _pins[name] = pin
+  return pin
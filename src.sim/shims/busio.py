@@ -0,0 +1,116 @@
+#-----------------------------------------------------------------------------
+# Shim for the CircuitPython busio-module.
+#
+# I2C-busses are mapped to bus-numbers via their pins (see simhw), and
+# only answer for the devices connected with simhw.add_device().
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import simclock
+import simhw
+
+# --- I2C   ------------------------------------------------------------------
+
+class I2C:
+  def __init__(self,scl=None,sda=None,*,frequency=100000,timeout=255,nr=None):
+    self.nr = simhw.get_bus_nr(scl,sda) if nr is None else nr
+    if self.nr < 0:
+      raise ValueError(f"no I2C-bus on pins {scl},{sda}")
+
+  def __repr__(self):
+    return f"<I2C{self.nr}>"
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self,*args):
+    self.deinit()
+
+  def deinit(self):
+    pass
+
+  def try_lock(self):
+    return True
+
+  def unlock(self):
+    pass
+
+  def probe(self,address):
+    """ simulator-only: raise OSError if address does not answer """
+    simhw.probe(self.nr,address)
+
+  def scan(self):
+    simclock.g_clock.advance(simhw.PROBE_TIME*112)
+    return sorted(simhw.g_devices.get(self.nr,()))
+
+  def _transfer(self,address):
+    if address not in simhw.g_devices.get(self.nr,()):
+      raise OSError(19,"No such device")
+    simclock.g_clock.advance(simhw.TRANSFER_TIME)
+
+  def writeto(self,address,buffer,*,start=0,end=None):
+    self._transfer(address)
+
+  def readfrom_into(self,address,buffer,*,start=0,end=None):
+    self._transfer(address)
+
+  def writeto_then_readfrom(self,address,out_buffer,in_buffer,*args,**kwargs):
+    self._transfer(address)
+
+# --- SPI   ------------------------------------------------------------------
+
+class SPI:
+  def __init__(self,clock,MOSI=None,MISO=None,half_duplex=False):
+    self.frequency = 1000000
+
+  def deinit(self):
+    pass
+
+  def try_lock(self):
+    return True
+
+  def unlock(self):
+    pass
+
+  def configure(self,*,baudrate=100000,polarity=0,phase=0,bits=8):
+    self.frequency = baudrate
+
+  def write(self,buffer,*,start=0,end=None):
+    pass
+
+  def readinto(self,buffer,*,start=0,end=None,write_value=0):
+    pass
+
+  def write_readinto(self,out_buffer,in_buffer,*args,**kwargs):
+    pass
+
+# --- UART   -----------------------------------------------------------------
+
+class UART:
+  def __init__(self,tx=None,rx=None,*,baudrate=9600,timeout=1,**kwargs):
+    self.baudrate   = baudrate
+    self.timeout    = timeout
+    self.in_waiting = 0
+
+  def deinit(self):
+    pass
+
+  def read(self,nbytes=None):
+    simclock.g_clock.advance(self.timeout)
+    return None
+
+  def readinto(self,buf):
+    simclock.g_clock.advance(self.timeout)
+    return None
+
+  def readline(self):
+    return self.read()
+
+  def write(self,buf):
+    return len(buf)
+
+  def reset_input_buffer(self):
+    pass
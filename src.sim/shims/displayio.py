@@ -0,0 +1,10 @@
+#-----------------------------------------------------------------------------
+# Shim for the CircuitPython displayio-module (no displays).
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+def release_displays():
+  pass
@@ -0,0 +1,36 @@
+#-----------------------------------------------------------------------------
+# Shim for the CircuitPython microcontroller-module.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import simhw
+
+class Pin:
+  pass
+
+class _Processor:
+  frequency = 125000000
+  voltage   = 3.3
+  uid       = bytearray(b'\x00SIMULA')
+
+  @property
+  def temperature(self):
+    return simhw.CPU_TEMPERATURE
+
+class RunMode:
+  NORMAL     = "NORMAL"
+  SAFE_MODE  = "SAFE_MODE"
+  UF2        = "UF2"
+  BOOTLOADER = "BOOTLOADER"
+
+cpu = _Processor()
+nvm = bytearray(4096)
+
+def on_next_reset(run_mode):
+  pass
+
+def reset():
+  raise SystemExit("microcontroller.reset()")
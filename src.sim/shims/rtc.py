@@ -0,0 +1,24 @@
+#-----------------------------------------------------------------------------
+# Shim for the CircuitPython rtc-module (internal RTC on the virtual clock).
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import time
+import simclock
+
+class RTC:
+  calibration = 0
+
+  @property
+  def datetime(self):
+    return time.localtime()
+
+  @datetime.setter
+  def datetime(self,value):
+    simclock.g_clock.set_time(time.mktime(value))
+
+def set_time_source(rtc):
+  pass
@@ -0,0 +1,14 @@
+#-----------------------------------------------------------------------------
+# Shim for the CircuitPython sdcardio-module.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+class SDCard:
+  def __init__(self,bus,cs,baudrate=8000000):
+    self._bus = bus
+
+  def deinit(self):
+    pass
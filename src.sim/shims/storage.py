@@ -0,0 +1,28 @@
+#-----------------------------------------------------------------------------
+# Shim for the CircuitPython storage-module. Mount-points are mapped to
+# directories of the simulation root (see simfs).
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import simfs
+
+class VfsFat:
+  def __init__(self,block_device):
+    self.block_device = block_device
+
+def mount(filesystem,mount_path,*,readonly=False):
+  simfs.mount(mount_path)
+
+def umount(mount):
+  simfs.umount(mount)
+
+def remount(mount_path,readonly=False,*,disable_concurrent_write_protection=False):
+  pass
+
+def getmount(mount_path):
+  if mount_path.rstrip('/') in simfs.g_mounts:
+    return VfsFat(None)
+  raise OSError(22,"Invalid argument")
@@ -0,0 +1,25 @@
+#-----------------------------------------------------------------------------
+# Shim for the CircuitPython supervisor-module.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import time
+
+class _Runtime:
+  serial_connected = True
+  usb_connected    = True
+  serial_bytes_available = 0
+
+runtime = _Runtime()
+
+def reload():
+  raise SystemExit("supervisor.reload()")
+
+def set_next_code_file(filename,**kwargs):
+  pass
+
+def ticks_ms():
+  return int(time.monotonic()*1000) & 0x3fffffff
@@ -0,0 +1,88 @@
+#-----------------------------------------------------------------------------
+# Virtual clock for the host simulation.
+#
+# The clock replaces time.monotonic(), time.sleep(), time.time(),
+# time.localtime() and time.mktime() of the running interpreter. Sleeping
+# does not wait, it just advances the clock. Time on the simulated device
+# is UTC (like CircuitPython without timezone support).
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import time
+import calendar
+
+START_EPOCH = 1704067200       # 2024-01-01 00:00:00
+
+# original functions of the time-module
+_time_time   = time.time
+_time_gmtime = time.gmtime
+
+# --- class VirtualClock   ---------------------------------------------------
+
+class VirtualClock:
+  """ virtual clock with monotonic and epoch time """
+
+  def __init__(self,epoch=START_EPOCH):
+    """ constructor """
+    self._epoch = float(epoch)
+    self._mono  = 0.0
+
+  def monotonic(self):
+    """ seconds since start of the simulation """
+    return self._mono
+
+  def time(self):
+    """ seconds since epoch (integer, like CircuitPython) """
+    return int(self._epoch)
+
+  def set_time(self,epoch):
+    """ set epoch time (used by the rtc-shim) """
+    self._epoch = float(epoch)
+
+  def advance(self,delta):
+    """ advance clock by delta seconds """
+    if delta > 0:
+      self._mono  += delta
+      self._epoch += delta
+
+  def advance_to(self,monotonic=None,epoch=None):
+    """ advance clock to the given time-point (never backwards) """
+    if monotonic is not None:
+      self.advance(monotonic-self._mono)
+    elif epoch is not None:
+      self.advance(epoch-self._epoch)
+
+  def sleep(self,duration):
+    """ sleep: just advance the clock """
+    self.advance(duration)
+
+  def localtime(self,secs=None):
+    """ return struct_time for secs (default: now) """
+    return _time_gmtime(self.time() if secs is None else int(secs))
+
+  def mktime(self,t):
+    """ inverse of localtime() """
+    return calendar.timegm(tuple(t))
+
+# --- global clock   ---------------------------------------------------------
+
+g_clock = VirtualClock()
+
+def install(clock=None):
+  """ patch the time-module to use the virtual clock """
+  global g_clock
+  if clock:
+    g_clock = clock
+  time.monotonic = g_clock.monotonic
+  time.sleep     = g_clock.sleep
+  time.time      = g_clock.time
+  time.localtime = g_clock.localtime
+  time.mktime    = g_clock.mktime
+  return g_clock
+
+def wallclock():
+  """ real wall-clock time (for benchmarking the simulation itself) """
+  return _time_time()
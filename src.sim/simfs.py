@@ -0,0 +1,96 @@
+#-----------------------------------------------------------------------------
+# Filesystem redirection for the host simulation.
+#
+# Absolute device paths (/sd/..., /saves/...) are mapped to directories
+# below a temporary root. The functions used by the datalogger code
+# (open, os.stat, os.listdir, os.remove, os.rename, os.mkdir, os.sync)
+# are patched accordingly.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import os
+import builtins
+import tempfile
+
+_orig = {
+  "open":    builtins.open,
+  "stat":    os.stat,
+  "listdir": os.listdir,
+  "remove":  os.remove,
+  "rename":  os.rename,
+  "mkdir":   os.mkdir,
+  }
+
+g_root   = None
+g_mounts = {}
+
+# --- map device path to host path   ----------------------------------------
+
+def host_path(path):
+  """ map a device path to a host path """
+  if not isinstance(path,str):
+    return path
+  for mount,target in g_mounts.items():
+    if path == mount or path.startswith(mount+'/'):
+      return target + path[len(mount):]
+  return path
+
+def mount(point):
+  """ map the given mount-point (e.g. /sd) to a directory below the root """
+  point  = point.rstrip('/')
+  target = os.path.join(g_root,point.strip('/'))
+  os.makedirs(target,exist_ok=True)
+  g_mounts[point] = target
+  return target
+
+def umount(point):
+  """ remove mapping of the given mount-point """
+  g_mounts.pop(point.rstrip('/'),None)
+
+# --- patched functions   ----------------------------------------------------
+
+def _open(file,*args,**kwargs):
+  return _orig["open"](host_path(file),*args,**kwargs)
+
+def _stat(path,*args,**kwargs):
+  return _orig["stat"](host_path(path),*args,**kwargs)
+
+def _listdir(path='.'):
+  return _orig["listdir"](host_path(path))
+
+def _remove(path,*args,**kwargs):
+  return _orig["remove"](host_path(path),*args,**kwargs)
+
+def _rename(src,dst,*args,**kwargs):
+  return _orig["rename"](host_path(src),host_path(dst),*args,**kwargs)
+
+def _mkdir(path,*args,**kwargs):
+  return _orig["mkdir"](host_path(path),*args,**kwargs)
+
+def _sync():
+  pass
+
+# --- install redirection   --------------------------------------------------
+
+def install(root=None,saves=True):
+  """ install redirection. Without root, a temporary directory is used """
+  global g_root
+  if root:
+    g_root = root
+    os.makedirs(g_root,exist_ok=True)
+  else:
+    g_root = tempfile.mkdtemp(prefix="cp-datalogger-sim-")
+  if saves:
+    mount("/saves")
+
+  builtins.open = _open
+  os.stat       = _stat
+  os.listdir    = _listdir
+  os.remove     = _remove
+  os.rename     = _rename
+  os.mkdir      = _mkdir
+  os.sync       = _sync
+  return g_root
@@ -0,0 +1,78 @@
+#-----------------------------------------------------------------------------
+# State of the simulated hardware.
+#
+# The CircuitPython shims (see shims/) use this module to look up
+# connected I2C-devices, analog values, sleep memory and the cost model
+# (virtual time) of bus transactions.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import random
+
+import simclock
+
+# cost model (virtual seconds)
+PROBE_TIME    = 0.002          # I2C-probe (successful or not)
+TRANSFER_TIME = 0.0005         # I2C read/write transaction
+
+# analog values: 3.9V at the voltage monitor (divider 1:3)
+ANALOG_DEFAULT  = int(3.9*65535/9.9)
+CPU_TEMPERATURE = 25.0
+SLEEP_MEMORY_SIZE = 4096
+
+g_devices   = {}               # bus-nr -> set of i2c addresses
+g_bus_pins  = {}               # (scl,sda) -> bus-nr
+g_analog    = {}               # pin-name -> raw value
+g_sleep_mem = bytearray(SLEEP_MEMORY_SIZE)
+g_random    = random.Random(42)
+g_stats     = {"probes": 0, "probe_errors": 0, "deep_sleeps": 0}
+g_mux_next  = 2                # next bus-number for multiplexer channels
+
+# --- exception for deep-sleep   ---------------------------------------------
+
+class DeepSleep(BaseException):
+  """ raised instead of entering deep-sleep (ends the wake-cycle). This is
+  no subclass of Exception, so it passes "except Exception"-handlers.
+  """
+  pass
+
+# --- hardware configuration   -----------------------------------------------
+
+def add_device(bus,addr):
+  """ connect an i2c-device to the given bus """
+  g_devices.setdefault(bus,set()).add(addr)
+
+def remove_device(bus,addr):
+  """ disconnect an i2c-device """
+  g_devices.get(bus,set()).discard(addr)
+
+def set_bus_pins(scl,sda,bus):
+  """ map pins (names or board-pins) of an i2c-bus to a bus-number """
+  g_bus_pins[(str(scl),str(sda))] = bus
+
+def get_bus_nr(scl,sda):
+  """ return bus-number for the given pins """
+  return g_bus_pins.get((str(scl),str(sda)),-1)
+
+def next_mux_bus():
+  """ return bus-number for the next multiplexer channel """
+  global g_mux_next
+  nr = g_mux_next
+  g_mux_next += 1
+  return nr
+
+def probe(bus,addr):
+  """ probe an address on a bus. Raises OSError if no device answers """
+  g_stats["probes"] += 1
+  simclock.g_clock.advance(PROBE_TIME)
+  if addr not in g_devices.get(bus,()):
+    g_stats["probe_errors"] += 1
+    raise OSError(19,"No such device")
+
+def reset_cycle():
+  """ reset state that does not survive a reset of the MCU """
+  global g_mux_next
+  g_mux_next = 2
@@ -0,0 +1,292 @@
+#!/usr/bin/python3
+#-----------------------------------------------------------------------------
+# Host simulation of the datalogger wake-cycle.
+#
+# This program runs the unchanged DataCollector (src/datacollector.py)
+# on CPython, using the CircuitPython shims in shims/, a virtual clock,
+# a temporary directory for /sd and /saves and fake sensors. Every
+# cycle runs
+#
+#   setup() -> collect_data() -> read_battery() -> run_tasks() ->
+#   configure_wakeup()
+#
+# and then advances the virtual clock to the next wakeup. Reported
+# durations are in virtual time, i.e. they contain all sleeps of the
+# code and the modelled bus/sensor times, but not the CPU time of the
+# host.
+#
+# Usage as a module:
+#
+#   from simulate import Simulation
+#   sim = Simulation(settings={"SENSORS": "id battery aht20"})
+#   sim.run(1000)
+#   print(sim.summary())
+#
+# Usage from the commandline: see "simulate.py -h".
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import sys
+import os
+import gc
+import ast
+import atexit
+import shutil
+import argparse
+import importlib
+import types
+
+SIM_DIR  = os.path.dirname(os.path.abspath(__file__))
+TOP_DIR  = os.path.dirname(SIM_DIR)
+SYS_PATH = [os.path.join(SIM_DIR,"shims"),
+            SIM_DIR,
+            os.path.join(TOP_DIR,"src"),
+            os.path.join(TOP_DIR,"src.shared"),
+            os.path.join(TOP_DIR,"src.misc"),
+            ]
+for _path in reversed(SYS_PATH):
+  if _path not in sys.path:
+    sys.path.insert(0,_path)
+
+import simclock
+import simfs
+import simhw
+import fake_sensors
+
+# default configuration of the simulated logger
+DEFAULT_CONFIG = {
+  "LOGGER_ID":       "SIM",
+  "LOGGER_NAME":     "Simulator",
+  "LOGGER_LOCATION": "Workstation",
+  "HAVE_PM":         False,
+  "HAVE_RTC":        None,
+  "HAVE_SD":         True,
+  "HAVE_LIPO":       False,
+  "STROBE_MODE":     True,
+  "INTERVAL":        900,
+  "SENSORS":         "id dcode battery aht20 cputemp",
+  "TASKS":           "save_data",
+  }
+
+# --- helper   ---------------------------------------------------------------
+
+_gc_collect = gc.collect
+def _gc_collect_young(generation=0):
+  """ replacement for gc.collect(): only collect youngest generation """
+  return _gc_collect(0)
+
+def percentile(values,p):
+  """ return p-th percentile (nearest rank) of a sorted list """
+  if not values:
+    return 0
+  k = max(0,min(len(values)-1,int(round(p/100*len(values)+0.5))-1))
+  return values[k]
+
+def parse_setting(setting):
+  """ parse KEY=VALUE (VALUE is a Python literal or a plain string) """
+  key,value = setting.split('=',1)
+  try:
+    value = ast.literal_eval(value)
+  except (ValueError,SyntaxError):
+    pass
+  return key.strip(),value
+
+# --- class Simulation   -----------------------------------------------------
+
+class Simulation:
+  """ run the wake-cycle of the datalogger on the host """
+
+  def __init__(self,config_file=None,settings=None,pcb="v2",root=None,
+               log=None,full_gc=False):
+    """ constructor """
+
+    self.clock = simclock.install()
+    self.root  = simfs.install(root)
+    self._tmp_root = root is None
+    if not hasattr(gc,"mem_free"):
+      gc.mem_free  = lambda: 0
+      gc.mem_alloc = lambda: 0
+    if not full_gc:
+      # a full collection of the host-heap is much more expensive than
+      # on the small heap of the MCU and would dominate the simulation
+      gc.collect = _gc_collect_young
+
+    # logger must be configured before the first import of datacollector
+    from log_writer import Logger
+    Logger(log)
+
+    # ExtBase.create() imports rtc_ext.<name> with an empty fromlist. In
+    # CircuitPython this returns the submodule, in CPython the package.
+    import rtc_ext
+    from rtc_ext.nortc import NoRTC
+    rtc_ext.NoRTC = NoRTC
+
+    self._create_config(config_file,settings)
+    self._create_pins(pcb)
+    self._connect_mux()
+    fake_sensors.register_defaults(self.config.SENSORS)
+
+    self.dc = importlib.import_module("datacollector")
+    self.cycles = 0
+    self.awake  = []
+    self.phases = {}
+
+  # --- create config-module   -----------------------------------------------
+
+  def _create_config(self,config_file,settings):
+    """ create module config from defaults, config-file and settings """
+
+    config = types.ModuleType("config")
+    for key,value in DEFAULT_CONFIG.items():
+      setattr(config,key,value)
+    if config_file:
+      with open(config_file,"rt") as f:
+        exec(compile(f.read(),config_file,"exec"),config.__dict__)
+    for key,value in (settings or {}).items():
+      setattr(config,key,value)
+    sys.modules["config"] = config
+    self.config = config
+
+  # --- create pins-module   -------------------------------------------------
+
+  def _create_pins(self,pcb):
+    """ use pins<pcb> as module pins and map the i2c-busses """
+
+    pins = importlib.import_module(f"pins{pcb}")
+    sys.modules["pins"] = pins
+    simhw.set_bus_pins(pins.PIN_SCL0,pins.PIN_SDA0,0)
+    simhw.set_bus_pins(pins.PIN_SCL1,pins.PIN_SDA1,1)
+
+  # --- connect multiplexers   -----------------------------------------------
+
+  def _connect_mux(self):
+    """ connect multiplexers of HAVE_I2C_MP to their busses """
+
+    for spec in (getattr(self.config,"HAVE_I2C_MP",None) or "").split():
+      loc = spec.rstrip(')').split('(')[1].split(',')
+      addr = int(loc[1],16) if len(loc) > 1 else 0x70
+      simhw.add_device(int(loc[0]),addr)
+
+  # --- run a single wake-cycle   --------------------------------------------
+
+  def cycle(self):
+    """ run one wake-cycle and sleep until the next wakeup """
+
+    dc = self.dc
+    simhw.reset_cycle()
+    start = self.clock.monotonic()
+    dc.g_ts = [(start,None)]
+
+    app = dc.DataCollector()
+    try:
+      app.setup()
+      app.collect_data()
+      dc.g_ts.append((self.clock.monotonic(),"collect data"))
+      app.read_battery()
+      app.run_tasks()
+      app.configure_wakeup()
+      dc.g_ts.append((self.clock.monotonic(),"configure wakeup"))
+      g_ts = dc.g_ts
+      app.save_timings()
+    except simhw.DeepSleep:
+      g_ts = dc.g_ts
+    finally:
+      # end of program: run atexit-handlers like the device would
+      atexit._run_exitfuncs()
+      atexit._clear()
+
+    # collect timings
+    awake = self.clock.monotonic() - start
+    self.awake.append(awake)
+    for i in range(1,len(g_ts)):
+      self.phases.setdefault(g_ts[i][1],[]).append(g_ts[i][0]-g_ts[i-1][0])
+    self.cycles += 1
+
+    # power off until next wakeup
+    wakeup = getattr(app,"wakeup",None)
+    if wakeup:
+      self.clock.advance_to(epoch=self.clock.mktime(wakeup))
+    return awake
+
+  # --- run multiple cycles   ------------------------------------------------
+
+  def run(self,count):
+    """ run count wake-cycles, return wall-clock time used """
+
+    start = simclock.wallclock()
+    for _ in range(count):
+      self.cycle()
+    return simclock.wallclock() - start
+
+  # --- summary of timings   -------------------------------------------------
+
+  def summary(self):
+    """ return summary of awake-times (virtual seconds) """
+
+    lines = [f"{'phase':<20} {'mean':>9} {'p50':>9} {'p95':>9} {'max':>9}"]
+    def _line(label,values):
+      values = sorted(values)
+      lines.append(f"{label:<20} {sum(values)/len(values):9.3f} " +
+                   f"{percentile(values,50):9.3f} " +
+                   f"{percentile(values,95):9.3f} {values[-1]:9.3f}")
+    for label,values in self.phases.items():
+      _line(label,values)
+    if self.awake:
+      _line("total",self.awake)
+    return "\n".join(lines)
+
+  # --- cleanup   ------------------------------------------------------------
+
+  def cleanup(self):
+    """ remove temporary root-directory """
+    if self._tmp_root:
+      shutil.rmtree(self.root,ignore_errors=True)
+
+# --- main program   ---------------------------------------------------------
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="DL Wake-Cycle Simulator")
+  parser.add_argument('-c', '--config', default=None,
+                      help="config-file (like src/config.py)")
+  parser.add_argument('-s', '--set', action='append', default=[],
+                      dest='settings', metavar='KEY=VALUE',
+                      help="override configuration variable")
+  parser.add_argument('-n', '--cycles', type=int, default=1000,
+                      help="number of wake-cycles (default: 1000)")
+  parser.add_argument('-p', '--pcb', default="v2",
+                      help="pcb-version, selects pins<pcb>.py (default: v2)")
+  parser.add_argument('-r', '--root', default=None,
+                      help="root-directory for /sd and /saves (default: temp)")
+  parser.add_argument('-l', '--log', default=None,
+                      help="log-target: console or filename (default: none)")
+  parser.add_argument('-g', '--full-gc', action='store_true', default=False,
+                      dest='full_gc',
+                      help="run full garbage-collections (slow)")
+  parser.add_argument('-m', '--max-awake', type=float, default=None,
+                      dest='max_awake',
+                      help="fail if p95 of awake-time exceeds this value")
+
+  args = parser.parse_args()
+  sim = Simulation(config_file=args.config,
+                   settings=dict([parse_setting(s) for s in args.settings]),
+                   pcb=args.pcb,root=args.root,log=args.log,
+                   full_gc=args.full_gc)
+  try:
+    wall = sim.run(args.cycles)
+  finally:
+    sim.cleanup()
+
+  print(sim.summary())
+  print(f"\n{sim.cycles} cycles in {wall:.3f}s " +
+        f"({sim.cycles/wall if wall else 0:.0f} cycles/s), " +
+        f"{simhw.g_stats['probes']} probes " +
+        f"({simhw.g_stats['probe_errors']} failed)")
+
+  p95 = percentile(sorted(sim.awake),95)
+  if args.max_awake is not None and p95 > args.max_awake:
+    print(f"p95 of awake-time {p95:.3f}s exceeds {args.max_awake}s",
+          file=sys.stderr)
+    sys.exit(1)
@@ -0,0 +1,143 @@
+#-----------------------------------------------------------------------------
+# Binary log-format (CSV_FORMAT = "bin").
+#
+# A binary log-file starts with a self-describing header followed by
+# fixed-width records:
+#
+#   header:  magic "DLBN", version (B), unused (B), length of text (H),
+#            text (utf-8, lines of KEY=VALUE):
+#              ID=<logger-id>
+#              DCODE=<dcode of all sensors>
+#              TYPES=<type of every field after ts (see sensor_meta)>
+#              SCALES=<scale factor of every packed field>
+#              CONST=<values of constant fields (type 'c')>
+#              FORMAT=<struct-format of a record>
+#              COLUMNS=<column headings>
+#   records: ts (I, seconds since 1970), packed fields
+#
+# The fields of the id- and dcode-sensors are constant (type 'c') and
+# are only saved in the header. Integers and fixed-point values (types
+# 'i', '1'-'3') are saved as int32 scaled by 10^decimals, floats
+# without fixed number of decimals (type 'g') as float32 and strings as
+# 16 bytes. Missing values are saved as MISSING (int32) or nan (float32).
+#
+# The decoder is tools/bin_log_decode.py.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import time
+import struct
+from sensor_meta import SENSOR_MAP, get_types
+
+MAGIC     = b"DLBN"
+VERSION   = 1
+HDR_FMT   = "<4sBxH"
+HDR_SIZE  = struct.calcsize(HDR_FMT)
+STR_WIDTH = 16
+MISSING   = -2147483648
+
+# --- class BinLayout   ------------------------------------------------------
+
+class BinLayout:
+  """ layout of binary records """
+
+  def __init__(self,config,fields,columns):
+    """ constructor: fields are the fields of a csv-record (without
+    timestamp), columns the column headings of the csv-header.
+    """
+
+    dcode = ""
+    for sensor in config.SENSORS.split(' '):
+      dcode += SENSOR_MAP[sensor.split('(')[0]]
+    self.types  = get_types(dcode,len(fields),static=True)
+    self._fmt   = "<I"
+    self._conv  = []
+    scales      = []
+    consts      = []
+    for t,value in zip(self.types,fields):
+      if t == 'c':
+        consts.append(value)
+        continue
+      if t == 's':
+        self._fmt += f"{STR_WIDTH}s"
+        scales.append(1)
+      elif t == 'g':
+        self._fmt += "f"
+        scales.append(1)
+      else:
+        self._fmt += "i"
+        scales.append(1 if t == 'i' else 10**int(t))
+      self._conv.append((t,scales[-1]))
+    self.size = struct.calcsize(self._fmt)
+
+    text = (f"ID={config.LOGGER_ID}\n" +
+            f"DCODE={dcode}\n" +
+            f"TYPES={self.types}\n" +
+            f"SCALES={','.join([str(s) for s in scales])}\n" +
+            f"CONST={','.join(consts)}\n" +
+            f"FORMAT={self._fmt}\n" +
+            f"COLUMNS={columns.lstrip('#')}\n").encode('utf-8')
+    self.header = struct.pack(HDR_FMT,MAGIC,VERSION,len(text)) + text
+
+  # --- pack a csv-record   --------------------------------------------------
+
+  def pack(self,record):
+    """ pack a csv-record (ts,field1,...). Returns None if the record
+    does not match the layout.
+    """
+
+    fields = record.split(',')
+    ts = fields.pop(0)
+    if len(fields) != len(self.types):
+      return None
+    values = [time.mktime((int(ts[0:4]),int(ts[5:7]),int(ts[8:10]),
+                           int(ts[11:13]),int(ts[14:16]),int(ts[17:19]),
+                           0,-1,-1))]
+    conv = iter(self._conv)
+    for t,value in zip(self.types,fields):
+      if t == 'c':
+        continue
+      t,scale = next(conv)
+      try:
+        if t == 's':
+          values.append(value.encode('utf-8')[:STR_WIDTH])
+        elif t == 'g':
+          values.append(float(value))
+        else:
+          values.append(round(float(value)*scale))
+      except:
+        values.append(float('nan') if t == 'g' else MISSING)
+    return struct.pack(self._fmt,*values)
+
+# --- append records to binary log-file   ------------------------------------
+
+def append(filename,layout,records):
+  """ append csv-records (list of strings) to a binary log-file.
+  Returns the list of records that do not match the layout of the file.
+  """
+
+  try:
+    f = open(filename,"r+b")
+    if f.read(len(layout.header)) != layout.header:
+      f.close()
+      return records
+    # skip partial record (e.g. after a power-loss during write)
+    f.seek(0,2)
+    n = (f.tell()-len(layout.header))//layout.size
+    f.seek(len(layout.header)+n*layout.size)
+  except OSError:
+    f = open(filename,"wb")
+    f.write(layout.header)
+
+  rejected = []
+  with f:
+    for record in records:
+      data = layout.pack(record)
+      if data:
+        f.write(data)
+      else:
+        rejected.append(record)
+  return rejected
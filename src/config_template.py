@@ -93,3 +93,7 @@ LORA_NODE_ADDR        = 1
 #LORA_QOS             = 2      # default: 2, range: 0-7
 #LORA_TX_POWER        = 13     # default: 13, range: 5-23
 #LORA_RECEIVE_TIMEOUT = 5.0
+#LORA_ADR_QOS         = None   # adaptive data rate, e.g. "0 2 4 5"
+#LORA_ADR_SLOT        = 10     # ADR slot length (same as gateway)
+#LORA_DUTY_CYCLE      = 0.01   # default: 0.01 for 868MHz, else 0 (no limit)
+#LORA_DUTY_MAX_DEFER  = 0      # max. wait-time for non-urgent transmits
@@ -0,0 +1,116 @@
+#-----------------------------------------------------------------------------
+# Staging area for csv-records.
+#
+# Records are collected in alarm.sleep_memory (survives deep-sleep) or,
+# if the alarm-module is not available, in a RAM-buffer (survives
+# light-sleep in continuous mode). Layout (little-endian):
+#
+#   magic "DS" (2), version (B), unused (B), seq (I), length (H),
+#   ymd of staged records (10s), ymd with existing csv-file (10s),
+#   count (H), records (length bytes)
+#
+# The length is updated after the record is copied, i.e. a record is
+# only committed with the update of the header. The sequence number
+# identifies a batch of records. It is saved to a marker-file after the
+# batch is written to the csv-file, so a batch is never written twice,
+# even if the system is reset before the staging area is cleared. If the
+# staging area is invalid (e.g. after a power-loss), the sequence number
+# restarts after the number of the marker-file.
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import struct
+
+MAGIC    = b"DS"
+VERSION  = 1
+HDR_FMT  = "<2sBxIH10s10sH"
+HDR_SIZE = struct.calcsize(HDR_FMT)
+RAM_SIZE = 4096
+
+_ram = None
+
+# --- class CSVStaging   -----------------------------------------------------
+
+class CSVStaging:
+  """ staging area for csv-records """
+
+  def __init__(self,marker=None):
+    """ constructor """
+    global _ram
+    try:
+      import alarm
+      self._mem = alarm.sleep_memory
+    except:
+      if not _ram:
+        _ram = bytearray(RAM_SIZE)
+      self._mem = _ram
+
+    (magic,version,self.seq,self.length,ymd,header_ymd,
+     self.count) = struct.unpack_from(HDR_FMT,self._mem,0)
+    if (magic != MAGIC or version != VERSION or
+        self.length > len(self._mem)-HDR_SIZE):
+      self.seq        = self._next_seq(marker)
+      self.length     = 0
+      self.count      = 0
+      self.ymd        = ""
+      self.header_ymd = ""
+      self._write_header()
+    else:
+      self.ymd        = str(ymd,'utf-8').rstrip('\x00')
+      self.header_ymd = str(header_ymd,'utf-8').rstrip('\x00')
+
+  # --- sequence number after the last written batch   ----------------------
+
+  def _next_seq(self,marker):
+    """ return sequence number following the number of the marker-file """
+    try:
+      with open(marker,"rt") as f:
+        return (int(f.readline())+1) & 0xFFFFFFFF
+    except:
+      return 0
+
+  # --- write header (commit)   ----------------------------------------------
+
+  def _write_header(self):
+    """ write header to memory """
+    struct.pack_into(HDR_FMT,self._mem,0,MAGIC,VERSION,self.seq,
+                     self.length,self.ymd.encode('utf-8'),
+                     self.header_ymd.encode('utf-8'),self.count)
+
+  # --- append record   ------------------------------------------------------
+
+  def append(self,ymd,record):
+    """ append a record. Returns False if the staging area is full """
+
+    record = record.encode('utf-8')
+    end = HDR_SIZE+self.length+len(record)
+    if end > len(self._mem):
+      return False
+    self._mem[HDR_SIZE+self.length:end] = record
+    self.length += len(record)
+    self.count  += 1
+    self.ymd     = ymd
+    self._write_header()
+    return True
+
+  # --- return staged records   ----------------------------------------------
+
+  def records(self):
+    """ return staged records """
+    return str(self._mem[HDR_SIZE:HDR_SIZE+self.length],'utf-8')
+
+  # --- clear staging area   -------------------------------------------------
+
+  def clear(self,header_ymd=None):
+    """ clear staging area after a flush and start a new batch """
+
+    self.seq    = (self.seq+1) & 0xFFFFFFFF
+    self.length = 0
+    self.count  = 0
+    self.ymd    = ""
+    if header_ymd is not None:
+      self.header_ymd = header_ymd
+    self._write_header()
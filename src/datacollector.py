@@ -168,11 +168,15 @@ class DataCollector():
     self.csv_header = f"#ID: {g_config.LOGGER_ID}\n#Location: {g_config.LOGGER_LOCATION}\n"
     column_headings = "#ts"
     self._sensors = []
+    self._sensor_names = []
+    self._sensor_init_times = []
 
     # parse sensor specification. Will fail if i2c0 is requested, but not
     # configured
     self._sensor_init_time = 0
+    cache = self._load_sensor_cache()
     for spec in g_config.SENSORS.split(' '):
+      token = spec
       # ignore fully qualified spec for display
       csv_only = True if spec in sensors_ignore else False
       # spec is sensor(addr,bus) or sensor(bus,addr) with bus and/or addr optional
@@ -204,14 +208,17 @@ class DataCollector():
       sensor_module = builtins.__import__("sensors."+sensor,
                                           None,None,[sensor.upper()],0)
       sensor_class = getattr(sensor_module,sensor.upper())
-      _sensor = sensor_class(g_config,i2c,addr,None)
+      _sensor = self._create_sensor(sensor_class,token,i2c,addr,cache)
       _sensor.ignore = csv_only
-      self._sensors.append(_sensor.read)
+      self._sensors.append(_sensor)
+      self._sensor_names.append(sensor)
+      self._sensor_init_times.append(getattr(_sensor,"init_time",0))
       if not csv_only:
         self.formats.extend(_sensor.formats)
       column_headings += f",{_sensor.headers}"
       self._sensor_init_time = max(self._sensor_init_time,
                                    getattr(_sensor,"init_time",0))
+    self._save_sensor_cache(cache)
 
     # insert extended header
     if g_config.CSV_HEADER_EXTENDED:
@@ -221,6 +228,73 @@ class DataCollector():
     # add column headings as last line of csv-header
     self.csv_header += f"{column_headings}"
 
+  # --- load discovery-cache   -----------------------------------------------
+
+  def _load_sensor_cache(self):
+    """ load discovery-cache. The cache is only valid for the current
+    sensor-specification and number of busses """
+
+    self._cache_changed = False
+    if not g_config.SENSORS_CACHE:
+      return None
+    try:
+      import json
+      with open(g_config.SENSORS_CACHE,"rt") as f:
+        cache = json.load(f)
+      if (cache["spec"] == g_config.SENSORS and
+          cache["busses"] == len(self.i2c)):
+        return cache["sensors"]
+    except:
+      pass
+    self._cache_changed = True
+    return {}
+
+  # --- save discovery-cache   -----------------------------------------------
+
+  def _save_sensor_cache(self,cache):
+    """ save discovery-cache if changed """
+
+    if cache is None or not self._cache_changed:
+      return
+    try:
+      import json
+      with open(g_config.SENSORS_CACHE,"wt") as f:
+        json.dump({"spec": g_config.SENSORS,
+                   "busses": len(self.i2c),
+                   "sensors": cache},f)
+      g_logger.print(f"saved discovery-cache to {g_config.SENSORS_CACHE}")
+    except Exception as ex:
+      g_logger.print(f"could not save discovery-cache: {ex}")
+
+  # --- create sensor   ------------------------------------------------------
+
+  def _create_sensor(self,sensor_class,token,i2c,addr,cache):
+    """ create sensor. Probe the cached bus first and fall back to all
+    busses (the cache-entry is invalidated in this case) """
+
+    entry = cache.get(token) if cache else None
+    if entry:
+      bus = entry["bus"]
+      i2c_cached = [None]*len(i2c)
+      if bus >= 0:
+        i2c_cached[bus] = i2c[bus]
+      sensor_class.discovery_hint = entry.get("data",None)
+      try:
+        return sensor_class(g_config,i2c_cached,addr,None)
+      except Exception as ex:
+        g_logger.print(f"{token}: cached discovery failed: {ex}")
+        del cache[token]
+        self._cache_changed = True
+
+    sensor_class.discovery_hint = None
+    _sensor = sensor_class(g_config,i2c,addr,None)
+    bus = getattr(_sensor,"bus_nr",None)
+    if cache is not None and bus is not None:
+      cache[token] = {"bus": bus,
+                      "data": getattr(_sensor,"discovery_data",None)}
+      self._cache_changed = True
+    return _sensor
+
   # --- blink   --------------------------------------------------------------
 
   def blink(self, count=1, blink_time=0.25):
@@ -237,11 +311,12 @@ class DataCollector():
 
     # wait globally for the request init-time, instead of multiple sleeps
     # within the sensor-wrapper
-    if self._sensor_init_time:
+    if self._sensor_init_time and not g_config.SENSORS_CONCURRENT:
       g_logger.print(f"sensor initialization time: {self._sensor_init_time}s ...")
       TimeSleep.light_sleep(duration=self._sensor_init_time)
       g_logger.print("...done")
       self._sensor_init_time = 0
+      g_ts.append((time.monotonic(),"sensor init"))
 
     ts = time.localtime()
     ts_str = f"{ts.tm_year}-{ts.tm_mon:02d}-{ts.tm_mday:02d}T{ts.tm_hour:02d}:{ts.tm_min:02d}:{ts.tm_sec:02d}"
@@ -254,13 +329,62 @@ class DataCollector():
     if g_config.TEST_MODE:
       g_logger.print(f"sensors: free memory before readout: {gc.mem_free()}")
     self.values = []
-    for read_sensor in self._sensors:
-      rec = read_sensor(self.data,self.values)
-      self.record += f",{rec}"
+    if g_config.SENSORS_CONCURRENT:
+      self._read_sensors_concurrent()
+    else:
+      for name,sensor in zip(self._sensor_names,self._sensors):
+        rec = sensor.read(self.data,self.values)
+        self.record += f",{rec}"
+        g_ts.append((time.monotonic(),name))
     if g_config.TEST_MODE:
       g_logger.print(f"sensors: free memory after readout: {gc.mem_free()}")
     gc.collect()
 
+  # --- read sensors concurrently   -------------------------------------------
+
+  def _read_sensors_concurrent(self):
+    """ read sensors concurrently: every sensor is read as soon as its own
+    init-time has passed. Sensors with a read_steps()-method (a generator
+    yielding the time to wait until the next step) are interleaved.
+    Records and values keep the order of the sensors.
+    """
+
+    start   = time.monotonic()
+    n       = len(self._sensors)
+    results = [""]*n
+    values  = [[] for _ in range(n)]
+    tasks   = [[start+self._sensor_init_times[i],i,None] for i in range(n)]
+    self._sensor_init_times = [0]*n           # only once in continuous mode
+    self._sensor_init_time  = 0
+
+    while tasks:
+      # next task: earliest deadline, then order of sensors
+      task = min(tasks)
+      delay = task[0] - time.monotonic()
+      if delay > 0:
+        TimeSleep.light_sleep(duration=delay)
+
+      i     = task[1]
+      steps = task[2]
+      if not steps:
+        sensor = self._sensors[i]
+        if not hasattr(sensor,"read_steps"):
+          results[i] = sensor.read(self.data,values[i])
+          tasks.remove(task)
+          g_ts.append((time.monotonic(),self._sensor_names[i]))
+          continue
+        steps = task[2] = sensor.read_steps(self.data,values[i])
+      try:
+        task[0] = time.monotonic() + next(steps)
+      except StopIteration as ex:
+        results[i] = ex.args[0] if ex.args else ""
+        tasks.remove(task)
+        g_ts.append((time.monotonic(),self._sensor_names[i]))
+
+    for i in range(n):
+      self.record += f",{results[i]}"
+      self.values.extend(values[i])
+
   # --- check if file already exists   --------------------------------------
 
   def file_exists(self, filename):
@@ -296,6 +420,25 @@ class DataCollector():
       task_module = None
       gc.collect()
 
+  # --- flush staged data of tasks   -----------------------------------------
+
+  def flush_tasks(self):
+    """ call flush() of all tasks that support it (before power-off) """
+
+    if not hasattr(g_config,"TASKS"):
+      return
+
+    for task in g_config.TASKS.split(" "):
+      try:
+        task_module = builtins.__import__("tasks."+task,None,None,["run"],0)
+        if hasattr(task_module,"flush"):
+          g_logger.print(f"{task}: flushing")
+          task_module.flush(g_config,self)
+      except Exception as ex:
+        g_logger.print(f"{task}: flush failed: exception: {ex}")
+      task_module = None
+    g_ts.append((time.monotonic(),"flush tasks"))
+
   # --- print timings   ------------------------------------------------------
 
   def print_timings(self):
@@ -310,6 +453,35 @@ class DataCollector():
     g_logger.print(f"{g_ts[-1][0]-g_ts[0][0]:0.3f} (total)")
     g_logger.print(60*"-")
 
+  # --- save timings   -------------------------------------------------------
+
+  def save_timings(self):
+    """ save timings to ring-file and/or csv-file and reset timings """
+    global g_ts
+
+    if g_config.TIMINGS_FILE or g_config.TIMINGS_CSV:
+      entries = [(g_ts[i][1],g_ts[i][0]-g_ts[i-1][0])
+                 for i in range(1,len(g_ts))]
+      total = g_ts[-1][0]-g_ts[0][0]
+      try:
+        import timing_log
+        if g_config.TIMINGS_FILE:
+          timing_log.TimingLog(g_config.TIMINGS_FILE,
+                               g_config.TIMINGS_RECORDS).add(
+                                 time.mktime(self.data["ts"]),total,entries)
+        if g_config.TIMINGS_CSV:
+          ymd = self.data["ts_str"].split("T")[0]
+          y,m,d = ymd.split("-")
+          timing_log.save_csv(
+            g_config.TIMINGS_CSV.format(ID=g_config.LOGGER_ID,
+                                        YMD=ymd,Y=y,M=m,D=d),
+            self.data["ts_str"],g_config.LOGGER_ID,total,entries)
+      except Exception as ex:
+        g_logger.print(f"could not save timings: {ex}")
+
+    g_ts = []
+    g_ts.append((time.monotonic(),None))
+
   # --- read battery   -------------------------------------------------------
 
   def read_battery(self):
@@ -430,6 +602,7 @@ class DataCollector():
       # run tasks after data-collection
       self.run_tasks()
       self.print_timings()
+      self.save_timings()
 
       # special case continuous mode with INTERVAL==0
       if not g_config.STROBE_MODE and g_config.INTERVAL == 0:
@@ -442,6 +615,7 @@ class DataCollector():
       # check for low LiPo
       if self.with_lipo and self.data["battery"] < 3.1:
         # prevent continuous-mode
+        self.flush_tasks()
         break
 
       # special case: elapsed time longer than INTERVAL
@@ -463,6 +637,9 @@ class DataCollector():
       else:
         break
 
+    # power is cut: staged data of tasks would be lost
+    if g_config.HAVE_PM and hasattr(pins,"PIN_DONE"):
+      self.flush_tasks()
     self.shutdown()
 
     # we are only here if
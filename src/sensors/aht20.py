@@ -39,6 +39,7 @@ class AHT20:
         g_logger.print(f"testing aht20 on i2c{nr}")
         self.aht20 = adafruit_ahtx0.AHTx0(bus)
         g_logger.print(f"detected aht20 on i2c{nr}")
+        self.bus_nr = nr
         break
       except Exception as ex:
         g_logger.print(f"exception: {ex}")
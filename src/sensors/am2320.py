@@ -40,6 +40,7 @@ class AM2320:
         g_logger.print(f"testing am2320 on i2c{nr}")
         self.am2320 = adafruit_am2320.AM2320(bus)
         g_logger.print(f"detected am2320 on i2c{nr}")
+        self.bus_nr = nr
         break
       except Exception as ex:
         g_logger.print(f"exception: {ex}")
@@ -35,6 +35,7 @@ class BH1750:
         g_logger.print(f"testing bh1750 on (i2c{nr},{addr})")
         self.bh1750 = adafruit_bh1750.BH1750(bus,0x23 if not addr else addr)
         g_logger.print(f"detected bh1750 on i2c{nr}")
+        self.bus_nr = nr
         break
       except Exception as ex:
         g_logger.print(f"exception: {ex}")
@@ -44,6 +44,7 @@ class BME280:
         self.bme280 = adafruit_bme280.Adafruit_BME280_I2C(
           bus,address=address)
         g_logger.print(f"detected bme280 on (i2c{nr},{address})")
+        self.bus_nr = nr
         break
       except Exception as ex:
         g_logger.print(f"exception: {ex}")
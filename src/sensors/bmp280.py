@@ -43,6 +43,7 @@ class BMP280:
         self.bmp280 = adafruit_bmp280.Adafruit_BMP280_I2C(
           bus,address=address)
         g_logger.print(f"detected bmp280 on (i2c{nr},{address})")
+        self.bus_nr = nr
         break
       except Exception as ex:
         g_logger.print(f"exception: {ex}")
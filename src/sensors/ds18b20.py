@@ -17,7 +17,9 @@
 # This sensor is not an I2C-sensor, but uses the 1-wire protocol.
 #
 # The code scans the bus for all DS18B20 and returns the values
-# sorted according to the ROM-address.
+# sorted according to the ROM-address. With a discovery-cache
+# (SENSORS_CACHE), the ROM-addresses of the last scan are reused and
+# the bus is only checked for a presence pulse.
 
 
 from log_writer import Logger
@@ -32,20 +34,29 @@ import pins
 class DS18B20:
   formats = ["T/18B:", "{0:.1f}°C"]
   headers = 'T/18B °C,'
+  discovery_hint = None     # ROM-addresses (hex) from the discovery-cache
 
   def __init__(self,config,i2c,addr=None,spi=None):
     """ constructor """
 
     self.ignore = False
+    self.bus_nr = -1          # not an I2C-sensor
     ow_bus = OneWireBus(pins.PIN_ONE_WIRE)
-    while True:
-      g_logger.print("scanning for ds18b20")
-      addresses = [d for d in ow_bus.scan() if d.family_code == 0x28 ]
-      if len(addresses):
-        break
-      else:
-        time.sleep(0.05)
+    if self.discovery_hint:
+      # raises an exception without presence pulse: cache is invalidated
+      ow_bus.reset(required=True)
+      addresses = [OneWireAddress(bytearray(bytes.fromhex(rom)))
+                   for rom in self.discovery_hint]
+    else:
+      while True:
+        g_logger.print("scanning for ds18b20")
+        addresses = [d for d in ow_bus.scan() if d.family_code == 0x28 ]
+        if len(addresses):
+          break
+        else:
+          time.sleep(0.05)
     addresses.sort(key=lambda a: a.rom)
+    self.discovery_data = [bytes(a.rom).hex() for a in addresses]
     self.ds18b20 = []
     for address in addresses:
       sn = "-".join(hex(b) for b in address.serial_number)
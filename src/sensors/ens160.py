@@ -64,6 +64,7 @@ class ENS160:
         g_logger.print(f"testing ens160 on i2c{nr}")
         self.ens160 = adafruit_ens160.ENS160(bus,reset=False)
         g_logger.print(f"detected ens160 on i2c{nr}")
+        self.bus_nr = nr
         break
       except Exception as ex:
         g_logger.print(f"exception: {ex}")
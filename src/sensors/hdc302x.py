@@ -41,6 +41,7 @@ class HDC302X:
         g_logger.print(f"testing hdc302x on (i2c{nr},{address})")
         self.hdc302x = adafruit_hdc302x.HDC302x(bus)
         g_logger.print(f"detected hdc302x on (i2c{nr},{address})")
+        self.bus_nr = nr
         break
       except Exception as ex:
         g_logger.print(f"exception: {ex}")
@@ -39,6 +39,7 @@ class HTU31D:
         g_logger.print(f"testing htu31d on i2c{nr}")
         self.htu31d = adafruit_htu31d.HTU31D(bus)
         g_logger.print(f"detected htu31d on i2c{nr}")
+        self.bus_nr = nr
         break
       except Exception as ex:
         g_logger.print(f"exception: {ex}")
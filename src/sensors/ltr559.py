@@ -35,6 +35,7 @@ class LTR559:
         g_logger.print(f"testing ltr559 on i2c{nr}")
         self.ltr559 = Pimoroni_LTR559(bus)
         g_logger.print(f"detected ltr559 on i2c{nr}")
+        self.bus_nr = nr
         break
       except Exception as ex:
         g_logger.print(f"exception: {ex}")
@@ -35,6 +35,7 @@ class MCP9808:
         g_logger.print(f"testing mcp9808 on (i2c{nr},{addr})")
         self.mcp9808 = adafruit_mcp9808.MCP9808(bus,0x18 if not addr else addr)
         g_logger.print(f"detected mcp9808 on i2c{nr}")
+        self.bus_nr = nr
         break
       except Exception as ex:
         g_logger.print(f"exception: {ex}")
@@ -60,6 +60,7 @@ class PMS5003:
         g_logger.print(f"testing pms5003 on i2c{nr}")
         self.pms5003 = PM25_I2C(bus)
         g_logger.print(f"detected pms5003 on i2c{nr}")
+        self.bus_nr = nr
         break
       except Exception as ex:
         g_logger.print(f"exception: {ex}")
@@ -67,6 +68,7 @@ class PMS5003:
       g_logger.print("no pms5003 on I2C detected. Falling back to UART")
       uart = busio.UART(pins.PIN_TX, pins.PIN_RX, baudrate=9600)
       self.pms5003 = PM25_UART(uart,None)
+      self.bus_nr = -1
 
     # dynamically create formats for display...
     self.PROPERTIES = getattr(config,"PMS5003_PROPERTIES",PROPERTIES).split()
@@ -51,6 +51,7 @@ class SCD4X:
         g_logger.print(f"testing {self.product} on i2c{nr}")
         self.scd4x = adafruit_scd4x.SCD4X(bus)
         g_logger.print(f"detected {self.product} on i2c{nr}")
+        self.bus_nr = nr
         break
       except Exception as ex:
         g_logger.print(f"exception: {ex}")
@@ -92,6 +93,11 @@ class SCD4X:
 
   def read(self,data,values):
     """ read sensor values """
+    return TimeSleep.run_steps(self.read_steps(data,values))
+
+  def read_steps(self,data,values):
+    """ read sensor values. This is a generator yielding the time to
+    wait before the next step and returning the csv-values """
 
     # compensate for pressure. Requires a BME280/BMP280 sensor
     if "bme280" in data:
@@ -123,7 +129,7 @@ class SCD4X:
           hum   = round(self.scd4x.relative_humidity,0)
           break
         else:
-          time.sleep(0.2)
+          yield 0.2
 
       # add data to csv-record
       if not self.DISCARD:
@@ -131,8 +137,7 @@ class SCD4X:
 
       # sleep the given time for the next sensor-readout
       if i < self.SAMPLES-1:
-        TimeSleep.light_sleep(
-          duration=max(0,self.INTERVAL-(time.monotonic()-start)))
+        yield max(0,self.INTERVAL-(time.monotonic()-start))
 
     # switch sensor off in strobe mode (or cont. mode with deep-sleep)
     if self._config.STROBE_MODE or self._config.INTERVAL > 60:
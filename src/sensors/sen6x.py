@@ -70,6 +70,7 @@ class SEN6X:
         g_logger.print(f"testing {self.product} on i2c{nr}")
         self.sen6x = adafruit_sen6x.SEN66(bus)
         g_logger.print(f"detected {self.product} on i2c{nr}")
+        self.bus_nr = nr
         break
       except Exception as ex:
         g_logger.print(f"exception: {ex}")
@@ -124,6 +125,11 @@ class SEN6X:
 
   def read(self,data,values):
     """ read sensor values """
+    return TimeSleep.run_steps(self.read_steps(data,values))
+
+  def read_steps(self,data,values):
+    """ read sensor values. This is a generator yielding the time to
+    wait before the next step and returning the csv-values """
 
     # compensate for pressure. Requires a BME280/BMP280 sensor
     if "bme280" in data:
@@ -167,7 +173,7 @@ class SEN6X:
           pn100 = round(sen6x_pc["nc_pm10"],1)
           break
         else:
-          time.sleep(0.2)
+          yield 0.2
 
       # add data to csv-record
       if not self.DISCARD and self.SAMPLES > 1:
@@ -178,8 +184,7 @@ class SEN6X:
 
       # sleep the given time for the next sensor-readout
       if i < self.SAMPLES-1:
-        TimeSleep.light_sleep(
-          duration=max(0,self.INTERVAL-(time.monotonic()-start)))
+        yield max(0,self.INTERVAL-(time.monotonic()-start))
 
     # switch sensor off in strobe mode (or cont. mode with deep-sleep)
     if self._config.STROBE_MODE or self._config.INTERVAL > 60:
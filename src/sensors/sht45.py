@@ -40,6 +40,7 @@ class SHT45:
         g_logger.print(f"testing sht45 on i2c{nr}")
         self.sht45 = adafruit_sht4x.SHT4x(bus)
         g_logger.print(f"detected sht45 on i2c{nr}")
+        self.bus_nr = nr
         break
       except Exception as ex:
         g_logger.print(f"exception: {ex}")
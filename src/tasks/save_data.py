@@ -1,6 +1,14 @@
 #-----------------------------------------------------------------------------
 # Task: save data to sd-card
 #
+# With CSV_STAGING > 0, records are collected in a staging area (see
+# csv_staging.py) and written to the csv-file in batches.
+#
+# With CSV_FORMAT = "bin", records are written to a binary log-file
+# (see bin_log.py). Records that don't match the layout of an existing
+# binary log-file (e.g. after a change of SENSORS) are written to the
+# csv-file.
+#
 # Author: Bernhard Bablok
 #
 # Website: https://github.com/bablokb/cp-datalogger
@@ -9,21 +17,127 @@
 from log_writer import Logger
 g_logger = Logger()
 
-def run(config,app):
-  """ save data to sd-card """
+# --- return name of csv-file   ----------------------------------------------
 
-  if not config.HAVE_SD and config.CSV_FILENAME[:7] != '/saves/':
-    return
-
-  ymd = app.data["ts_str"].split("T")[0]
+def _outfile(config,ymd,ext=None):
+  """ return name of csv-file for the given date, optionally with a
+  different extension """
   y,m,d = ymd.split("-")
   outfile = config.CSV_FILENAME.format(
     ID=config.LOGGER_ID,
     YMD=ymd,Y=y,M=m,D=d)
-  new_csv = not app.file_exists(outfile)
+  if ext:
+    outfile = outfile.rsplit('.',1)[0] + ext
+  return outfile
+
+# --- return name of marker-file   -------------------------------------------
+
+def _marker(config):
+  """ return name of marker-file (in the directory of the csv-files) """
+  return config.CSV_FILENAME.rsplit('/',1)[0] + "/staged.seq"
+
+# --- write records to csv-file   --------------------------------------------
+
+def _write(config,app,ymd,records,header_written=False):
+  """ append records to csv-file and write header for new files """
+
+  if config.CSV_FORMAT == "bin":
+    records = _write_bin(config,app,ymd,records)
+    if not records:
+      return
+
+  outfile = _outfile(config,ymd)
+  new_csv = not header_written and not app.file_exists(outfile)
   app.sd_status = "X"
   with open(outfile, "a") as f:
     if new_csv:
       f.write(f"{app.csv_header}\n")
-    f.write(f"{app.record}\n")
+    f.write(records)
     app.sd_status = "W"
+
+# --- write records to binary log-file   ------------------------------------
+
+def _write_bin(config,app,ymd,records):
+  """ append records to binary log-file, return non-matching records """
+
+  from bin_log import BinLayout, append
+  lines = records.rstrip('\n').split('\n')
+  layout = BinLayout(config,lines[0].split(',')[1:],
+                     app.csv_header.rsplit('\n',1)[-1])
+  app.sd_status = "X"
+  rejected = append(_outfile(config,ymd,".bin"),layout,lines)
+  app.sd_status = "W"
+  if rejected:
+    g_logger.print(f"save_data: {len(rejected)} records don't match " +
+                   "binary layout, writing csv")
+    return "\n".join(rejected) + "\n"
+  return None
+
+# --- flush staged records   -------------------------------------------------
+
+def _flush(config,app,staging):
+  """ write staged records to csv-file and clear staging area """
+
+  if not staging.count:
+    return
+  marker = _marker(config)
+  try:
+    with open(marker,"rt") as f:
+      done = int(f.readline()) == staging.seq
+  except:
+    done = False
+
+  if done:
+    g_logger.print(f"save_data: batch {staging.seq} already written")
+  else:
+    g_logger.print(f"save_data: writing {staging.count} staged records")
+    _write(config,app,staging.ymd,staging.records(),
+           staging.header_ymd == staging.ymd)
+    with open(marker,"wt") as f:
+      f.write(f"{staging.seq}\n")
+  staging.clear(header_ymd=staging.ymd)
+
+# --- save data   ------------------------------------------------------------
+
+def run(config,app):
+  """ save data to sd-card """
+
+  if not config.HAVE_SD and config.CSV_FILENAME[:7] != '/saves/':
+    return
+
+  ymd = app.data["ts_str"].split("T")[0]
+  if not config.CSV_STAGING or config.HAVE_PM:
+    # with power-management, the sleep-memory does not survive
+    _write(config,app,ymd,f"{app.record}\n")
+    return
+
+  from csv_staging import CSVStaging
+  staging = CSVStaging(_marker(config))
+  if staging.count and staging.ymd != ymd:
+    _flush(config,app,staging)             # date rollover
+
+  record = f"{app.record}\n"
+  if not staging.append(ymd,record):
+    _flush(config,app,staging)             # staging area is full
+    if not staging.append(ymd,record):
+      _write(config,app,ymd,record,staging.header_ymd == ymd)
+      return
+  app.sd_status = "S"
+
+  if (staging.count >= config.CSV_STAGING or
+      (config.HAVE_LIPO and
+       app.data["battery"] < config.CSV_STAGING_VBAT)):
+    _flush(config,app,staging)
+
+# --- flush staged data before power-off   -----------------------------------
+
+def flush(config,app):
+  """ write staged records to sd-card """
+
+  if not config.CSV_STAGING or config.HAVE_PM:
+    return
+  if not config.HAVE_SD and config.CSV_FILENAME[:7] != '/saves/':
+    return
+
+  from csv_staging import CSVStaging
+  _flush(config,app,CSVStaging(_marker(config)))
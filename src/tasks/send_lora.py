@@ -12,7 +12,8 @@ from log_writer import Logger
 g_logger = Logger()
 
 import hw_helper
-from lora import LORA
+from lora import LORA, MAX_PAYLOAD, MAX_RECORDS
+from durable_queue import DurableQueue
 import pins
 
 def _get_buffer_file(config):
@@ -25,47 +26,124 @@ def _get_buffer_file(config):
   except:
     return None
 
-def _send_pending(config, lora, buffer_file):
+def _send_record(lora, encoder, record):
+  """ send a single record, encoded if an encoder is available """
+
+  if not encoder:
+    return lora.send_single(record)
+
+  # retry with static fields and full timestamp if the gateway lost sync
+  for full in (False,True):
+    payload,key = encoder.encode(record,full)
+    rc = lora.send_encoded(payload)
+    if rc is None:
+      return False
+    encoder.update(key,rc)
+    if rc:
+      return True
+  return False
+
+def _send_pending(config, lora, queue, encoder=None):
   """ send pending data (failed records from the past)"""
 
   max_failed = getattr(config,"LORA_MAX_FAILED",5)
   g_logger.print(f"send_lora: processing old (failed) records (max: {max_failed})")
-  pending_new = None
-  rc_all = True
-  i = 0
-  with open(buffer_file,"rt") as file:
-    for record in file:
-      if not rc_all or i >= max_failed:
-        # we either already failed or processed enough lines,
-        # so move records to pending_new
-        lora.trace(f"send_lora: saving old record {i}")
-        if not pending_new:
-          pending_new = open(buffer_file+".new","at")
-        pending_new.write(record)
-      else:
-        lora.trace(f"send_lora: sending old record {i}")
-        rc = lora.send_single(record.strip('\n'))
-        rc_all = rc and rc_all
-        if not rc:
-          if i == 0:
-            # failed at the first record, bail out
-            return False
-          elif not pending_new:
-            pending_new = open(buffer_file+".new","at")
-          # keep this record in pending_new
-          pending_new.write(record)
-      i += 1
-
-  # at this stage, lora_tx_pending.csv is processed
-  os.remove(buffer_file)
-  if pending_new:
-    pending_new.flush()
-    pending_new.close()
-    os.rename(buffer_file+".new",buffer_file)
-  os.sync()
-
-  # return send-status
-  return rc_all
+  records = queue.peek(max_failed)
+  for i,record in enumerate(records):
+    lora.trace(f"send_lora: sending old record {i}")
+    if not _send_record(lora, encoder, record):
+      # keep this and all following records
+      queue.commit(i)
+      return False
+  queue.commit(len(records))
+  return True
+
+def _send_multi(config, lora, queue, record):
+  """ send the current record and pending records with M-messages.
+  Returns True if the current record was acknowledged.
+  """
+
+  max_packets = getattr(config,"LORA_MAX_PACKETS",5)
+  g_logger.print(f"send_lora: sending records (max packets: {max_packets})")
+  records = [record]
+  if queue:
+    records.extend(queue.peek(max_packets*MAX_RECORDS))
+
+  # split records into packets (current record first)
+  packets = []
+  batch   = []
+  size    = 2                               # "M,"
+  for rec in records:
+    if batch and (size+1+len(rec) > MAX_PAYLOAD or
+                  len(batch) == MAX_RECORDS):
+      packets.append(batch)
+      if len(packets) == max_packets:
+        batch = []
+        break
+      batch = []
+      size  = 2
+    batch.append(rec)
+    size += len(rec) + (1 if len(batch) > 1 else 0)
+  if batch:
+    packets.append(batch)
+
+  # send packets until the gateway does not respond
+  acked     = False
+  processed = 0                             # processed pending records
+  rejected  = []
+  for nr,batch in enumerate(packets):
+    rc = lora.send_multi(batch)
+    if rc is None:
+      break
+    if nr == 0:
+      acked = rc[0]
+      batch = batch[1:]
+      rc    = rc[1:]
+    processed += len(batch)
+    rejected.extend([rec for rec,ok in zip(batch,rc) if not ok])
+
+  # requeue rejected and the current record, commit processed records
+  if queue:
+    for rec in rejected:
+      queue.append(rec)
+    if not acked:
+      queue.append(record)
+    queue.commit(processed)
+  return acked
+
+def _send(config, app, lora, buffer_file, state_dir):
+  """ send pending and current records, return status of current record """
+
+  queue = DurableQueue(buffer_file) if buffer_file else None
+
+  # send pending and current records with multi-record messages
+  if getattr(config,"LORA_MULTI",False):
+    return _send_multi(config, lora, queue, app.record)
+
+  # encode records (binary)
+  encoder = None
+  if getattr(config,"LORA_CODEC",False):
+    from lora_codec import Encoder
+    encoder = Encoder(config, f"{state_dir}/lora_codec.state"
+                      if state_dir else None)
+
+  # check for pending records
+  if queue and not queue.empty():
+    rc = _send_pending(config, lora, queue, encoder)
+    if not rc:
+      # failed again, append current record without even trying
+      g_logger.print("send_lora: appending current record to pending-buffer")
+      queue.append(app.record)
+      return False
+
+  # try to send current record
+  g_logger.print("send_lora: sending current record")
+  rc = _send_record(lora, encoder, app.record)
+  if not rc and queue:
+    # failed again, append current record
+    g_logger.print("send_lora: appending failed record to pending-buffer")
+    queue.append(app.record)
+  return rc
 
 def run(config,app):
   """ send data using LoRa """
@@ -85,24 +163,19 @@ def run(config,app):
     lora = LORA(config,spi1)
 
 
-  # check for pending records
   buffer_file = _get_buffer_file(config)
-  if buffer_file and app.file_exists(buffer_file):
-    rc = _send_pending(config, lora, buffer_file)
-    if not rc:
-      # failed again, append current record without even trying
-      g_logger.print("send_lora: appending current record to pending-buffer")
-      with open(buffer_file,"at") as file:
-        file.write(f"{app.record}\n")
-      app.lora_status = 'F'
-      return
+  state_dir = buffer_file.rsplit('/',1)[0] if buffer_file else None
 
-  # try to send current record
-  g_logger.print("send_lora: sending current record")
-  rc = lora.send_single(app.record)
+  # adaptive data rate: select QOS-level from history
+  if lora.adr:
+    lora.adr_load(f"{state_dir}/lora_adr.state" if state_dir else None)
+
+  # duty-cycle: restore airtime used before deep-sleep
+  lora.duty_load(f"{state_dir}/lora_duty.state" if state_dir else None)
+
+  rc = _send(config, app, lora, buffer_file, state_dir)
+  lora.duty_save()
   app.lora_status = 'T' if rc else 'F'
-  if not rc:
-    # failed again, append current record
-    g_logger.print("send_lora: appending failed record to pending-buffer")
-    with open(buffer_file,"at") as file:
-      file.write(f"{app.record}\n")
+  if lora.adr and not lora.duty_refused:
+    # no ADR-step if the duty-cycle budget prevented the transmit
+    lora.adr_update(rc)
@@ -1,6 +1,11 @@
 #-----------------------------------------------------------------------------
 # Task: send data using UDP
 #
+# With UDP_BATCH > 0, records are packed into a single datagram (up to
+# UDP_MAX_PAYLOAD bytes) and sent after UDP_BATCH seconds. Batching is only
+# active in continuous mode with light-sleep, since pending records don't
+# survive a deep-sleep.
+#
 # Author: Bernhard Bablok
 #
 # Website: https://github.com/bablokb/cp-datalogger
@@ -11,9 +16,37 @@ g_logger = Logger()
 
 from wifi_impl_builtin import WifiImpl
 from secrets import secrets
+from udp_batch import UDPBatch, MAX_PAYLOAD
+
+_batch = None
+
+# --- check if pending records survive until the next run   ------------------
+
+def _batching(config):
+  """ return True if batching is possible """
+  return (getattr(config,"UDP_BATCH",0) and
+          not config.STROBE_MODE and config.INTERVAL < 61 and
+          not getattr(config,"FORCE_RESET",0))
+
+# --- send data   ------------------------------------------------------------
 
 def run(config,app):
   """ send data using UDP """
-  wifi = WifiImpl()
-  g_logger.print("UDP: sending data...")
-  wifi.sendto(bytes(app.record+'\n',"UTF-8"),secrets.udp_ip,secrets.udp_port)
+  global _batch
+
+  if not _batch:
+    _batch = UDPBatch(WifiImpl(),secrets.udp_ip,secrets.udp_port,
+                      getattr(config,"UDP_MAX_PAYLOAD",MAX_PAYLOAD))
+  _batch.add(app.record)
+  if not _batching(config) or _batch.age() >= config.UDP_BATCH:
+    g_logger.print("UDP: sending data...")
+    _batch.flush()
+
+# --- send pending records before power-off   --------------------------------
+
+def flush(config,app):
+  """ send pending records """
+
+  if _batch and not _batch.empty():
+    g_logger.print("UDP: sending pending data...")
+    _batch.flush()
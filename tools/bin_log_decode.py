@@ -0,0 +1,184 @@
+#!/usr/bin/python3
+#-----------------------------------------------------------------------------
+# Decoder for binary log-files (CSV_FORMAT = "bin").
+#
+# This tool converts binary log-files (see src/bin_log.py) to csv or to
+# NumPy arrays. Conversion to csv only needs the struct-module, NumPy is
+# only necessary for read_arrays().
+#
+# Usage on a computer: see "bin_log_decode.py -h".
+#
+# Usage as a module:
+#
+#   import bin_log_decode
+#   raw = bin_log_decode.read_arrays("log_042_2024-01-09.bin",raw=True)
+#   columns = bin_log_decode.read_arrays("log_042_2024-01-09.bin")
+#   print(columns["ts"],columns["T/AHT °C"])
+#
+# read_arrays(raw=True) maps the file and returns a structured array
+# without copying data (values are scaled integers), read_arrays()
+# returns a dict of columns with scaled values (nan for missing values).
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import time
+import struct
+
+# must match src/bin_log.py
+MAGIC    = b"DLBN"
+HDR_FMT  = "<4sBxH"
+HDR_SIZE = struct.calcsize(HDR_FMT)
+MISSING  = -2147483648
+
+# --- parse header   ---------------------------------------------------------
+
+def parse_header(buffer):
+  """ parse header, return (header-dict,offset of first record) """
+
+  magic,version,length = struct.unpack_from(HDR_FMT,buffer)
+  if magic != MAGIC:
+    raise ValueError("not a binary log-file")
+  text = str(bytes(buffer[HDR_SIZE:HDR_SIZE+length]),'utf-8')
+  header = {}
+  for line in text.split('\n'):
+    if '=' in line:
+      key,value = line.split('=',1)
+      header[key] = value
+  header["VERSION"] = version
+  header["SCALES"]  = [int(s) for s in header["SCALES"].split(',') if s]
+  header["CONST"]   = header["CONST"].split(',') if header["CONST"] else []
+  header["COLUMNS"] = header["COLUMNS"].split(',')
+  header["SIZE"]    = struct.calcsize(header["FORMAT"])
+  return header,HDR_SIZE+length
+
+# --- read records   ---------------------------------------------------------
+
+def read_records(filename):
+  """ return (header,list of unpacked records). Partial records at the
+  end of the file are ignored.
+  """
+
+  with open(filename,"rb") as f:
+    buffer = f.read()
+  header,offset = parse_header(buffer)
+  size = header["SIZE"]
+  n = (len(buffer)-offset)//size
+  records = [struct.unpack_from(header["FORMAT"],buffer,offset+i*size)
+             for i in range(n)]
+  return header,records
+
+# --- convert to csv   -------------------------------------------------------
+
+def _format(value,t,scale):
+  """ format a single value like the datalogger does """
+
+  if t == 's':
+    return str(value.rstrip(b'\x00'),'utf-8')
+  if t == 'g':
+    return "" if value != value else f"{value:.6g}"
+  if value == MISSING:
+    return ""
+  if t == 'i':
+    return str(value)
+  return f"{value/scale:.{t}f}"
+
+def to_csv(header,records):
+  """ yield csv-lines (header line first) """
+
+  yield "#" + ",".join(header["COLUMNS"])
+  types = header["TYPES"]
+  for record in records:
+    ts = time.gmtime(record[0])
+    fields = [f"{ts[0]}-{ts[1]:02d}-{ts[2]:02d}T" +
+              f"{ts[3]:02d}:{ts[4]:02d}:{ts[5]:02d}"]
+    consts = iter(header["CONST"])
+    index  = 0
+    for t in types:
+      if t == 'c':
+        fields.append(next(consts))
+      else:
+        fields.append(_format(record[1+index],t,header["SCALES"][index]))
+        index += 1
+    yield ",".join(fields)
+
+# --- read as NumPy-arrays   -------------------------------------------------
+
+def _dtype(header):
+  """ return structured dtype of a record """
+  import numpy as np
+
+  names = [name for name,t in zip(header["COLUMNS"][1:],header["TYPES"])
+           if t != 'c']
+  types = []
+  count = ""
+  for c in header["FORMAT"][1:]:
+    if c.isdigit():
+      count += c
+      continue
+    types.append({'I': "<u4", 'i': "<i4", 'f': "<f4"}.get(c,f"S{count}"))
+    count = ""
+
+  # names must be unique
+  unique = [header["COLUMNS"][0]]
+  for name in names:
+    candidate, nr = name, 1
+    while candidate in unique:
+      candidate = f"{name}_{nr}"
+      nr += 1
+    unique.append(candidate)
+  return np.dtype(list(zip(unique,types)))
+
+def read_arrays(filename,raw=False):
+  """ map file and return a structured array (raw=True, no copy) or a
+  dict of scaled columns """
+  import mmap
+  import numpy as np
+
+  with open(filename,"rb") as f:
+    buffer = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+  header,offset = parse_header(buffer)
+  dtype = _dtype(header)
+  n = (len(buffer)-offset)//dtype.itemsize
+  arr = np.frombuffer(buffer,dtype=dtype,count=n,offset=offset)
+  if raw:
+    return arr
+
+  columns = {}
+  names = dtype.names
+  columns[names[0]] = arr[names[0]].astype("datetime64[s]")
+  types = [t for t in header["TYPES"] if t != 'c']
+  for name,t,scale in zip(names[1:],types,header["SCALES"]):
+    values = arr[name]
+    if t in "123i":
+      missing = values == MISSING
+      values = values.astype("f8")/scale
+      values[missing] = np.nan
+    columns[name] = values
+  return columns
+
+# --- main program   ---------------------------------------------------------
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description="DL Binary-Log Decoder")
+  parser.add_argument('-o', '--output', default=None,
+                      help="save arrays to the given .npz-file (needs NumPy)")
+  parser.add_argument('infile', nargs='+', help='binary log-file(s)')
+
+  args = parser.parse_args()
+  if args.output:
+    import os
+    import numpy as np
+    arrays = {}
+    for filename in args.infile:
+      columns = read_arrays(filename)
+      arrays[os.path.splitext(os.path.basename(filename))[0]] = (
+        np.rec.fromarrays(list(columns.values()),names=list(columns.keys())))
+    np.savez(args.output,**arrays)
+  else:
+    for filename in args.infile:
+      for line in to_csv(*read_records(filename)):
+        print(line)
@@ -0,0 +1,202 @@
+#!/usr/bin/python3
+#-----------------------------------------------------------------------------
+# Benchmark of the transport codecs of the Notecard library
+# (src.misc/notecard: crc32, cobs, md5).
+#
+# The current implementations are compared with the original byte-wise
+# implementations (reference) for payload sizes from 32 bytes to 64 KB.
+# The row "md5 (native)" compares the pure Python md5 (reference) with
+# hashlib, which is used on firmware with MD5 support.
+# Results are also checked for equality, so the script doubles as a
+# regression test.
+#
+# Usage: see "notecard_codec_bench.py -h".
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import random
+import hashlib
+import importlib.util
+
+SIZES = [32,256,1024,4096,16384,65536]
+EOP   = ord('\n')
+LIB   = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                     "..","src.misc","notecard")
+
+# --- load module without the package (needs hardware libraries)   ----------
+
+def _load(name):
+  """ load a single module of the Notecard library """
+  spec = importlib.util.spec_from_file_location(name,
+                                                os.path.join(LIB,name+".py"))
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+# --- reference implementations (original byte-wise code)   -----------------
+
+_REF_TABLE = [
+  0x00000000, 0x1DB71064, 0x3B6E20C8, 0x26D930AC, 0x76DC4190, 0x6B6B51F4,
+  0x4DB26158, 0x5005713C, 0xEDB88320, 0xF00F9344, 0xD6D6A3E8, 0xCB61B38C,
+  0x9B64C2B0, 0x86D3D2D4, 0xA00AE278, 0xBDBDF21C]
+
+def ref_crc32(data):
+  """ half-byte table CRC32 """
+  crc = ~0
+  for idx in range(len(data)):
+    crc = _REF_TABLE[(crc ^ data[idx]) & 0x0F] ^ ((crc % (1<<32)) >> 4)
+    crc = _REF_TABLE[(crc ^ (data[idx] >> 4)) & 0x0F] ^ ((crc % (1<<32)) >> 4)
+  return ~crc & 0xffffffff
+
+def ref_cobs_encode(data,eop):
+  """ byte-wise COBS encoder """
+  encoded = bytearray(len(data) + 1 + len(data)//254)
+  code = 1
+  idx = 1
+  code_idx = 0
+  for byte in data:
+    if byte != 0:
+      encoded[idx] = byte ^ eop
+      idx += 1
+      code += 1
+    if byte == 0 or code == 0xFF:
+      encoded[code_idx] = code ^ eop
+      code = 1
+      code_idx = idx
+      idx += 1
+  encoded[code_idx] = code ^ eop
+  return encoded[:idx]
+
+def ref_cobs_decode(encoded,eop):
+  """ byte-wise COBS decoder """
+  decoded = bytearray(len(encoded))
+  idx = 0
+  copy = 0
+  code = 0xFF
+  for byte in encoded:
+    if copy != 0:
+      decoded[idx] = byte ^ eop
+      idx += 1
+    else:
+      if code != 0xFF:
+        decoded[idx] = 0
+        idx += 1
+      copy = byte ^ eop
+      code = copy
+      if code == 0:
+        break
+    copy -= 1
+  return decoded[:idx]
+
+_REF_FUNCTIONS = (16*[lambda b, c, d: (b & c) | (~b & d)] +
+                  16*[lambda b, c, d: (d & b) | (~d & c)] +
+                  16*[lambda b, c, d: b ^ c ^ d] +
+                  16*[lambda b, c, d: c ^ (b | ~d)])
+
+_REF_INDEX = (16*[lambda i: i] +
+              16*[lambda i: (5*i + 1)%16] +
+              16*[lambda i: (3*i + 5)%16] +
+              16*[lambda i: (7*i)%16])
+
+def _ref_rotate(x,amount):
+  x &= 0xFFFFFFFF
+  return ((x<<amount) | (x>>(32-amount))) & 0xFFFFFFFF
+
+def ref_md5(message,tables):
+  """ md5 with lambda-based round functions (tables: md5-module) """
+  message = bytearray(message)
+  orig_len_in_bits = (8 * len(message)) & 0xffffffffffffffff
+  message.append(0x80)
+  while len(message)%64 != 56:
+    message.append(0)
+  message += orig_len_in_bits.to_bytes(8, 'little')
+
+  hash_pieces = tables.init_values[:]
+  for chunk_ofst in range(0, len(message), 64):
+    a, b, c, d = hash_pieces
+    chunk = message[chunk_ofst:chunk_ofst+64]
+    for i in range(64):
+      f = _REF_FUNCTIONS[i](b, c, d)
+      g = _REF_INDEX[i](i)
+      to_rotate = (a + f + tables.constants[i] +
+                   int.from_bytes(chunk[4*g:4*g+4], 'little'))
+      new_b = (b + _ref_rotate(to_rotate,
+                               tables.rotate_amounts[i])) & 0xFFFFFFFF
+      a, b, c, d = d, new_b, b, c
+    for i, val in enumerate([a, b, c, d]):
+      hash_pieces[i] += val
+      hash_pieces[i] &= 0xFFFFFFFF
+  raw = sum(x<<(32*i) for i, x in enumerate(hash_pieces)).to_bytes(16,'little')
+  return '{:032x}'.format(int.from_bytes(raw, 'big'))
+
+# --- time a function   ------------------------------------------------------
+
+def _time(func,data,min_time):
+  """ return (result,time per call in µs) """
+  n = 0
+  start = time.perf_counter()
+  while True:
+    result = func(data)
+    n += 1
+    elapsed = time.perf_counter() - start
+    if elapsed >= min_time:
+      return result,1e6*elapsed/n
+
+# --- run benchmark   --------------------------------------------------------
+
+def run(sizes,min_time):
+  """ run benchmark, return True if all results match the reference """
+
+  crc32 = _load("crc32")
+  cobs  = _load("cobs")
+  md5   = _load("md5")
+  cases = [
+    ("crc32",       ref_crc32,          crc32.crc32),
+    ("crc32 (py)",  ref_crc32,          crc32._crc32_py),
+    ("cobs_encode", lambda d: ref_cobs_encode(d,EOP),
+                    lambda d: cobs.cobs_encode(d,EOP)),
+    ("cobs_decode", lambda d: ref_cobs_decode(d,EOP),
+                    lambda d: cobs.cobs_decode(d,EOP)),
+    ("md5 (py)",    lambda d: ref_md5(d,md5), md5.digest),
+    ("md5 (native)", md5.digest, lambda d: hashlib.md5(d).hexdigest()),
+    ]
+
+  ok = True
+  print(f"{'function':<13} {'size':>6} {'ref µs':>11} {'new µs':>11} "
+        f"{'speedup':>8}")
+  random.seed(42)
+  for size in sizes:
+    # json-like payload with some zero bytes
+    data = bytearray(random.choice(b'{}":,0123456789abcdef\x00')
+                     for _ in range(size))
+    encoded = ref_cobs_encode(data,EOP)
+    for name,ref,new in cases:
+      arg = encoded if name == "cobs_decode" else data
+      ref_result,ref_us = _time(ref,arg,min_time)
+      new_result,new_us = _time(new,arg,min_time)
+      if ref_result != new_result:
+        ok = False
+        name += " MISMATCH"
+      print(f"{name:<13} {size:>6} {ref_us:>11.1f} {new_us:>11.1f} "
+            f"{ref_us/new_us:>7.2f}x")
+  return ok
+
+# --- main program   ---------------------------------------------------------
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description="Notecard codec benchmark")
+  parser.add_argument('-t', '--time', type=float, default=0.2,
+                      help="minimal time per measurement in s (0.2)")
+  parser.add_argument('-s', '--sizes', default=None,
+                      help="comma-separated payload sizes (32 B to 64 KB)")
+
+  args = parser.parse_args()
+  sizes = [int(s) for s in args.sizes.split(',')] if args.sizes else SIZES
+  sys.exit(0 if run(sizes,args.time) else 1)
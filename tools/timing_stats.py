@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+#-----------------------------------------------------------------------------
+# Statistics of wake-cycle timings.
+#
+# This tool reads timing ring-files (TIMINGS_FILE) and/or timing
+# csv-files (TIMINGS_CSV) of one or more loggers and prints percentiles
+# of the durations of every phase, sensor and task.
+#
+# Usage on a computer: see "timing_stats.py -h".
+#
+# Usage from the REPL:
+#
+#   from tools import timing_stats
+#   timing_stats.print_stats(timing_stats.read_files(["/sd/timings.bin"]))
+#
+# Author: Bernhard Bablok
+#
+# Website: https://github.com/bablokb/cp-datalogger
+#-----------------------------------------------------------------------------
+
+import struct
+
+# must match src.shared/timing_log.py
+MAGIC       = b"DLTM"
+LABEL_AREA  = 256
+MAX_ENTRIES = 24
+HDR_FMT     = "<4sBBHI"
+REC_FMT     = "<IIIB" + MAX_ENTRIES*"BI"
+HDR_SIZE    = struct.calcsize(HDR_FMT)
+REC_SIZE    = struct.calcsize(REC_FMT)
+
+PERCENTILES = [50, 90, 95, 99]
+
+# --- read ring-file   -------------------------------------------------------
+
+def read_ring(filename):
+  """ return list of (ts,total,[(label,duration),...]) in write order """
+
+  records = []
+  with open(filename,"rb") as f:
+    hdr = f.read(HDR_SIZE+LABEL_AREA)
+    magic,version,n_labels,capacity,seq = struct.unpack_from(HDR_FMT,hdr)
+    if magic != MAGIC:
+      raise ValueError(f"{filename}: not a timing-file")
+    labels = str(hdr[HDR_SIZE:],'utf-8').rstrip('\x00').split("\n")[:n_labels]
+    for nr in range(max(0,seq-capacity),seq):
+      f.seek(HDR_SIZE+LABEL_AREA+(nr % capacity)*REC_SIZE)
+      values = struct.unpack(REC_FMT,f.read(REC_SIZE))
+      rec_seq,ts,total,n = values[:4]
+      if rec_seq != nr:
+        continue                          # not written (yet)
+      entries = []
+      for i in range(n):
+        index,duration = values[4+2*i:6+2*i]
+        label = labels[index] if index < len(labels) else "other"
+        entries.append((label,duration/1000))
+      records.append((ts,total/1000,entries))
+  return records
+
+# --- read csv-file   --------------------------------------------------------
+
+def read_csv(filename):
+  """ return list of (ts,total,[(label,duration),...]) """
+
+  records = []
+  with open(filename,"rt") as f:
+    for line in f:
+      fields = line.rstrip('\r\n').split(',')
+      if len(fields) < 3 or line[0] == '#':
+        continue
+      entries = []
+      for field in fields[3:]:
+        label,_,duration = field.rpartition('=')
+        entries.append((label,float(duration)))
+      records.append((fields[0],float(fields[2]),entries))
+  return records
+
+# --- read files of any type   -----------------------------------------------
+
+def read_files(filenames):
+  """ read ring- and csv-files """
+
+  records = []
+  for filename in filenames:
+    with open(filename,"rb") as f:
+      is_ring = f.read(len(MAGIC)) == MAGIC
+    if is_ring:
+      records.extend(read_ring(filename))
+    else:
+      records.extend(read_csv(filename))
+  return records
+
+# --- statistics   -----------------------------------------------------------
+
+def percentile(values,p):
+  """ nearest-rank percentile of a sorted list """
+  k = int(p/100*len(values)+0.5)
+  return values[max(0,min(len(values)-1,k-1))]
+
+def get_stats(records):
+  """ return list of (label,n,mean,percentiles,max,share) """
+
+  durations = {}
+  totals    = []
+  for _,total,entries in records:
+    totals.append(total)
+    for label,duration in entries:
+      if label not in durations:
+        durations[label] = []
+      durations[label].append(duration)
+  durations["total"] = totals
+
+  sum_total = sum(totals) or 1
+  stats = []
+  for label,values in durations.items():
+    values.sort()
+    stats.append((label,len(values),sum(values)/len(values),
+                  [percentile(values,p) for p in PERCENTILES],
+                  values[-1],100*sum(values)/sum_total))
+  return stats
+
+def print_stats(records,sort=False,csv=False):
+  """ print statistics """
+
+  if not records:
+    print("no records")
+    return
+  stats = get_stats(records)
+  if sort:
+    stats.sort(key=lambda s: s[2],reverse=True)
+
+  pnames = [f"p{p}" for p in PERCENTILES]
+  if csv:
+    print(",".join(["label","n","mean"]+pnames+["max","share"]))
+    for label,n,mean,pvalues,vmax,share in stats:
+      print(",".join([label,str(n),f"{mean:.3f}"] +
+                     [f"{v:.3f}" for v in pvalues] +
+                     [f"{vmax:.3f}",f"{share:.1f}"]))
+    return
+
+  print(f"{'label':<20}{'n':>7}{'mean':>9}" +
+        "".join([f"{p:>9}" for p in pnames]) + f"{'max':>9}{'share':>7}")
+  for label,n,mean,pvalues,vmax,share in stats:
+    print(f"{label:<20}{n:7d}{mean:9.3f}" +
+          "".join([f"{v:9.3f}" for v in pvalues]) +
+          f"{vmax:9.3f}{share:6.1f}%")
+
+# --- main program   ---------------------------------------------------------
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description="DL Timing-Statistics")
+  parser.add_argument('-s', '--sort', action='store_true', default=False,
+                      help="sort by mean duration")
+  parser.add_argument('-c', '--csv', action='store_true', default=False,
+                      help="print results as csv")
+  parser.add_argument('infile', nargs='+',
+                      help='timing-file(s) (binary ring-files or csv)')
+
+  args = parser.parse_args()
+  print_stats(read_files(args.infile),sort=args.sort,csv=args.csv)